@@ -2,7 +2,7 @@
 API URL configuration for Omnipresence.
 """
 from django.urls import path
-from .views import auth
+from .views import audit, auth, participants, presence, profiles, reports, sessions
 
 urlpatterns = [
     # Authentication endpoints
@@ -10,6 +10,30 @@ urlpatterns = [
     path('auth/logout/', auth.logout_view, name='logout'),
     path('auth/me/', auth.me_view, name='me'),
 
+    # Participant endpoints
+    path('participants/search/', participants.participant_search_view, name='participants-search'),
+
+    # Session endpoints
+    path('sessions/now/', sessions.sessions_now_view, name='sessions-now'),
+    path('sessions/<int:session_id>/pack/', sessions.session_pack_view, name='session-pack'),
+
+    # Presence endpoints
+    path('presence/checkin/', presence.checkin_view, name='presence-checkin'),
+    path('presence/changes/', presence.changes_view, name='presence-changes'),
+
+    # Report endpoints
+    path('reports/attendance/', reports.attendance_report_view, name='reports-attendance'),
+    path('reports/absentees/', reports.absentees_view, name='reports-absentees'),
+    path('reports/analytics/', reports.analytics_view, name='reports-analytics'),
+
+    # Admin endpoints
+    path('admin/audit-logs/as-of/', audit.audit_as_of_view, name='admin-audit-as-of'),
+    path('admin/profiles/', profiles.profiles_view, name='admin-profiles'),
+    path(
+        'admin/profiles/<str:profile_id>/', profiles.profile_download_view,
+        name='admin-profile-download',
+    ),
+
     # Other API endpoint modules will be included here:
     # path('participants/', include('app.api.participants.urls')),
     # path('groups/', include('app.api.groups.urls')),
@@ -0,0 +1,97 @@
+"""
+Admin views over the audit trail.
+"""
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+from app.core.permissions import IsAdministrator
+from app.core.query_budget import query_budget
+from app.core.routers import replica_reads
+from app.services.audit_service import SCOPE_COLUMNS, AuditReplayService
+
+
+def _error(message):
+    return Response({'errors': [{'message': message}]}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@query_budget(max_queries=6, max_seconds=1.0)
+@extend_schema(
+    tags=['Admin'],
+    summary='Presence as of a moment',
+    description=(
+        'Marks of a session (per participant) or of a participant (per session) as they stood at '
+        'a given moment, rebuilt from the audit trail. Pass exactly one of session_id and '
+        'participant_id.'
+    ),
+    parameters=[
+        OpenApiParameter(name='session_id', type=int, description='Session to rebuild'),
+        OpenApiParameter(name='participant_id', type=int, description='Participant to rebuild'),
+        OpenApiParameter(
+            name='at', type=str, required=True, description='Moment (ISO 8601 datetime)',
+        ),
+    ],
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'data': {
+                    'type': 'object',
+                    'properties': {
+                        'scope': {'type': 'string'},
+                        'scope_id': {'type': 'integer'},
+                        'at': {'type': 'string'},
+                        'audit_id': {'type': 'integer', 'nullable': True},
+                        'marks': {'type': 'array', 'items': {'type': 'object'}},
+                    }
+                }
+            }
+        }
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAdministrator])
+@replica_reads
+def audit_as_of_view(request):
+    """
+    Rebuild presence marks at a moment.
+
+    Query params:
+        session_id or participant_id: Whose marks to rebuild
+        at: Moment to rebuild them at
+
+    Returns:
+        Marks ordered by participant (session) or session (participant)
+    """
+    params = request.query_params
+    scopes = [scope for scope in SCOPE_COLUMNS if f'{scope}_id' in params]
+    if len(scopes) != 1:
+        return _error('Pass exactly one of session_id and participant_id')
+    scope = scopes[0]
+    try:
+        scope_id = int(params[f'{scope}_id'])
+    except ValueError:
+        return _error(f'{scope}_id must be an integer')
+    try:
+        at = parse_datetime(params.get('at', ''))
+    except ValueError:
+        at = None
+    if at is None:
+        return _error('at is required and must be an ISO 8601 datetime')
+    if timezone.is_naive(at):
+        at = timezone.make_aware(at)
+
+    state = AuditReplayService(request.user.organization).state(scope, scope_id, at)
+    _, key_column = SCOPE_COLUMNS[scope]
+    return Response({
+        'data': {
+            'scope': scope,
+            'scope_id': scope_id,
+            'at': at.isoformat(),
+            'audit_id': state.audit_id,
+            'marks': [{key_column: key, **mark} for key, mark in sorted(state.marks.items())],
+        }
+    })
@@ -9,7 +9,11 @@ from django.contrib.auth import authenticate, login, logout
 from django.utils import timezone
 from drf_spectacular.utils import extend_schema, OpenApiExample
 
+from app.core.caching import conditional_on
+from app.core.query_budget import query_budget
 
+
+@query_budget(max_queries=10, max_seconds=1.0)
 @extend_schema(
     tags=['Authentication'],
     summary='User login',
@@ -114,6 +118,7 @@ def login_view(request):
     }, status=status.HTTP_401_UNAUTHORIZED)
 
 
+@query_budget(max_queries=5, max_seconds=0.25)
 @extend_schema(
     tags=['Authentication'],
     summary='User logout',
@@ -145,6 +150,7 @@ def logout_view(request):
     return Response({'data': {'success': True}})
 
 
+@query_budget(max_queries=3, max_seconds=0.25)
 @extend_schema(
     tags=['Authentication'],
     summary='Get current user',
@@ -178,6 +184,7 @@ def logout_view(request):
         }
     }
 )
+@conditional_on('organization', 'users', per_user=True)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def me_view(request):
@@ -0,0 +1,33 @@
+"""
+Prometheus metrics endpoint.
+"""
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from app.core.metrics import render_prometheus
+
+
+def _is_allowed(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', [])
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Metrics of this worker process in the Prometheus text format.
+
+    Requires ``Authorization: Bearer <METRICS_TOKEN>`` when a token is
+    configured, otherwise a client address in METRICS_ALLOWED_IPS.
+    """
+    if not _is_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
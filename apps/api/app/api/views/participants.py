@@ -0,0 +1,100 @@
+"""
+Participant views.
+"""
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+from app.core.query_budget import query_budget
+from app.core.routers import replica_reads
+from app.services.participant_search_service import ParticipantSearchService
+
+
+@query_budget(max_queries=7, max_seconds=0.25)
+@extend_schema(
+    tags=['Participants'],
+    summary='Search participants',
+    description=(
+        'Ranked prefix search by badge identifier or name, ignoring case and accents. '
+        'Identifier matches rank first, then last-name and first-name matches.'
+    ),
+    parameters=[
+        OpenApiParameter(name='q', type=str, required=True, description='Identifier or name words'),
+        OpenApiParameter(name='limit', type=int, description='Maximum results (max 100)'),
+        OpenApiParameter(name='group_id', type=int, description='Only members of this group'),
+        OpenApiParameter(
+            name='include_inactive', type=bool, description='Include inactive participants',
+        ),
+    ],
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'data': {
+                    'type': 'object',
+                    'properties': {
+                        'results': {
+                            'type': 'array',
+                            'items': {
+                                'type': 'object',
+                                'properties': {
+                                    'id': {'type': 'integer'},
+                                    'identifier': {'type': 'string'},
+                                    'first_name': {'type': 'string'},
+                                    'last_name': {'type': 'string'},
+                                    'is_active': {'type': 'boolean'},
+                                    'score': {'type': 'integer'},
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def participant_search_view(request):
+    """
+    Search participants of the user's organization.
+
+    Query params:
+        q: Search text
+        limit: Maximum number of results
+        group_id: Optional group filter
+        include_inactive: 'true' to include inactive participants
+
+    Returns:
+        Matching participants, best match first
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({
+            'errors': [{'message': 'q is required'}]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = int(request.query_params.get('limit', ParticipantSearchService.DEFAULT_LIMIT))
+        group_id = request.query_params.get('group_id')
+        group_id = int(group_id) if group_id is not None else None
+    except ValueError:
+        return Response({
+            'errors': [{'message': 'limit and group_id must be integers'}]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if limit < 1:
+        return Response({
+            'errors': [{'message': 'limit must be >= 1'}]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    results = ParticipantSearchService(request.user.organization).search(
+        query,
+        limit=limit,
+        group_id=group_id,
+        include_inactive=request.query_params.get('include_inactive') == 'true',
+    )
+    return Response({'data': {'results': results}})
@@ -0,0 +1,202 @@
+"""
+Presence recording views.
+"""
+from django.conf import settings
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
+
+from app.core.permissions import IsFrontlineOrAdministrator
+from app.core.query_budget import query_budget
+from app.models import Session
+from app.services.checkin_service import CheckinService, scan_log
+from app.services.sync_service import ChangeFeedService
+
+
+@query_budget(max_queries=12, max_seconds=0.5)
+@extend_schema(
+    tags=['Presence'],
+    summary='Badge check-in',
+    description='Check in scanned badge/QR identifiers to a session',
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'data': {
+                    'type': 'object',
+                    'properties': {
+                        'results': {
+                            'type': 'array',
+                            'items': {
+                                'type': 'object',
+                                'properties': {
+                                    'identifier': {'type': 'string'},
+                                    'status': {
+                                        'type': 'string',
+                                        'enum': ['checked_in', 'duplicate', 'unknown'],
+                                    },
+                                    'participant': {
+                                        'type': 'object',
+                                        'properties': {
+                                            'id': {'type': 'integer'},
+                                            'name': {'type': 'string'},
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    },
+    examples=[
+        OpenApiExample(
+            'Single scan',
+            value={'session_id': 1, 'identifier': 'BADGE-0001', 'device_id': 'gate-a'},
+        ),
+        OpenApiExample(
+            'Batched scans',
+            value={'session_id': 1, 'identifiers': ['BADGE-0001', 'BADGE-0002']},
+        ),
+    ]
+)
+@api_view(['POST'])
+@permission_classes([IsFrontlineOrAdministrator])
+def checkin_view(request):
+    """
+    Check in one or more scanned identifiers.
+
+    Request body:
+        session_id: Session being scanned into
+        identifier: Single scanned identifier, or
+        identifiers: List of scanned identifiers (at most CHECKIN_MAX_IDENTIFIERS)
+        device_id: Optional scanner device identifier
+
+    Returns:
+        Per-identifier result; writes are flushed to the database in micro-batches
+    """
+    if request.user.organization is None:
+        return Response({
+            'errors': [{'message': 'Check-in requires a user of an organization'}]
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    session_id = request.data.get('session_id')
+    identifiers = request.data.get('identifiers')
+    if identifiers is None and request.data.get('identifier'):
+        identifiers = [request.data.get('identifier')]
+
+    if not session_id or not identifiers:
+        return Response({
+            'errors': [{'message': 'session_id and identifier(s) are required'}]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if not isinstance(identifiers, list) or not all(
+        isinstance(identifier, (str, int)) and not isinstance(identifier, bool)
+        for identifier in identifiers
+    ):
+        return Response({
+            'errors': [{'message': 'identifiers must be a list of strings'}]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    max_identifiers = getattr(settings, 'CHECKIN_MAX_IDENTIFIERS', 500)
+    if len(identifiers) > max_identifiers:
+        return Response({
+            'errors': [{'message': f'At most {max_identifiers} identifiers per request'}]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        index = CheckinService.get_index(int(session_id), request.user.organization.id)
+    except (Session.DoesNotExist, TypeError, ValueError):
+        return Response({
+            'errors': [{'message': 'Session not found'}]
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    if index.is_completed or index.present_state_id is None:
+        return Response({
+            'errors': [{'message': 'Session is not open for check-in'}]
+        }, status=status.HTTP_409_CONFLICT)
+
+    scan_log.ensure_flusher()
+    results = CheckinService().check_in(
+        index,
+        [str(identifier) for identifier in identifiers],
+        user=request.user,
+        device_id=request.data.get('device_id'),
+    )
+    return Response({'data': {'results': results}})
+
+
+@query_budget(max_queries=6, max_seconds=0.5)
+@extend_schema(
+    tags=['Presence'],
+    summary='Presence change feed',
+    description='Presence changes made after a cursor, oldest first, in bounded pages',
+    parameters=[
+        OpenApiParameter(
+            name='cursor', type=int, description='Last change id applied by the device',
+        ),
+        OpenApiParameter(name='limit', type=int, description='Page size (max 1000)'),
+    ],
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'data': {
+                    'type': 'object',
+                    'properties': {
+                        'changes': {
+                            'type': 'array',
+                            'items': {
+                                'type': 'object',
+                                'properties': {
+                                    'id': {'type': 'integer'},
+                                    'action': {'type': 'string'},
+                                    'record_id': {'type': 'integer'},
+                                    'session_id': {'type': 'integer', 'nullable': True},
+                                    'participant_id': {'type': 'integer', 'nullable': True},
+                                    'presence_state': {'type': 'string'},
+                                    'changed_by_id': {'type': 'integer', 'nullable': True},
+                                    'changed_at': {'type': 'string', 'format': 'date-time'},
+                                    'source_device': {'type': 'string', 'nullable': True},
+                                }
+                            }
+                        },
+                        'next_cursor': {'type': 'integer'},
+                        'has_more': {'type': 'boolean'},
+                    }
+                }
+            }
+        }
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def changes_view(request):
+    """
+    Pull presence changes since a cursor.
+
+    Query params:
+        cursor: Last change id applied by the device (default 0)
+        limit: Page size
+
+    Returns:
+        Changes plus the cursor to send on the next poll
+    """
+    try:
+        cursor = int(request.query_params.get('cursor', 0))
+        limit = int(request.query_params.get('limit', ChangeFeedService.DEFAULT_LIMIT))
+    except ValueError:
+        return Response({
+            'errors': [{'message': 'cursor and limit must be integers'}]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if cursor < 0 or limit < 1:
+        return Response({
+            'errors': [{'message': 'cursor must be >= 0 and limit >= 1'}]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    feed = ChangeFeedService(request.user.organization).get_changes(cursor=cursor, limit=limit)
+    return Response({'data': feed})
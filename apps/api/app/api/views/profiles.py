@@ -0,0 +1,88 @@
+"""
+Admin views for stored request profiles.
+"""
+import re
+
+from django.core.files.storage import default_storage
+from django.http import FileResponse
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema
+
+from app.core.permissions import IsAdministrator
+from app.core.profiling import PROFILE_DIR, list_profiles
+from app.core.query_budget import query_budget
+
+PROFILE_ID_PATTERN = re.compile(r'^\d{14}-\d+-[0-9a-f]{8}$')
+
+
+def _organization_filter(user):
+    """Superusers see every profile, administrators those of their organization."""
+    return None if user.is_superuser else user.organization.id
+
+
+@query_budget(max_queries=3, max_seconds=0.25)
+@extend_schema(
+    tags=['Admin'],
+    summary='List request profiles',
+    description='Stored on-demand and slow-request profiles, newest first',
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'data': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'id': {'type': 'string'},
+                            'download_url': {'type': 'string'},
+                        },
+                    },
+                },
+            },
+        },
+    },
+)
+@api_view(['GET'])
+@permission_classes([IsAdministrator])
+def profiles_view(request):
+    """List profile artifacts visible to the current administrator."""
+    profile_ids = list_profiles(_organization_filter(request.user))
+    return Response({
+        'data': [
+            {'id': profile_id, 'download_url': f'/api/admin/profiles/{profile_id}/'}
+            for profile_id in profile_ids
+        ]
+    })
+
+
+@query_budget(max_queries=3, max_seconds=0.25)
+@extend_schema(
+    tags=['Admin'],
+    summary='Download a request profile',
+    description='JSON artifact with sampled stacks, SQL statements and request metadata',
+    responses={200: {'type': 'object'}},
+)
+@api_view(['GET'])
+@permission_classes([IsAdministrator])
+def profile_download_view(request, profile_id):
+    """Download one profile artifact."""
+    organization_id = _organization_filter(request.user)
+    visible = (
+        PROFILE_ID_PATTERN.match(profile_id)
+        and (organization_id is None or profile_id.split('-')[1] == str(organization_id))
+    )
+    path = f'{PROFILE_DIR}/{profile_id}.json'
+    if not visible or not default_storage.exists(path):
+        return Response({
+            'errors': [{'message': 'Profile not found'}]
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    return FileResponse(
+        default_storage.open(path, 'rb'),
+        as_attachment=True,
+        filename=f'profile-{profile_id}.json',
+        content_type='application/json',
+    )
@@ -0,0 +1,287 @@
+"""
+Report views.
+"""
+import json
+from datetime import date
+
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+from app.core.permissions import IsAdministratorOrManager
+from app.core.query_budget import query_budget
+from app.core.routers import replica_reads
+from app.models import Group, Session
+from app.services.analytics_service import AttendanceAnalyticsService
+from app.services.report_service import AbsenteeReportService, AttendanceReportService
+
+# Longest period one analytics request may cover
+MAX_ANALYTICS_DAYS = 400
+
+# Longest period one attendance report may cover
+MAX_REPORT_DAYS = 400
+
+# Absentee rows fetched from the database per round trip
+ABSENTEE_CHUNK = 500
+
+
+def _error(message):
+    return Response({'errors': [{'message': message}]}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@query_budget(max_queries=9, max_seconds=1.0)
+@extend_schema(
+    tags=['Reports'],
+    summary='Attendance report',
+    description=(
+        'Marks per presence state and attendance rate of every participant of a group for a '
+        'period. Reports are cached until a mark in the group changes.'
+    ),
+    parameters=[
+        OpenApiParameter(name='group_id', type=int, required=True, description='Group'),
+        OpenApiParameter(
+            name='date_from', type=str, required=True, description='First day (YYYY-MM-DD)',
+        ),
+        OpenApiParameter(
+            name='date_to', type=str, required=True, description='Last day (YYYY-MM-DD)',
+        ),
+        OpenApiParameter(
+            name='format', type=str, description="Response format: only 'json' is rendered",
+        ),
+    ],
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'data': {
+                    'type': 'object',
+                    'properties': {
+                        'group': {'type': 'object'},
+                        'period': {'type': 'object'},
+                        'summary': {'type': 'object'},
+                        'by_participant': {'type': 'array', 'items': {'type': 'object'}},
+                    }
+                }
+            }
+        }
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAdministratorOrManager])
+@replica_reads
+def attendance_report_view(request):
+    """
+    Get the attendance report of a group.
+
+    Query params:
+        group_id: Group to report on
+        date_from, date_to: Period, inclusive
+        format: Only 'json' (content negotiation rejects other formats)
+
+    Returns:
+        Attendance summary and per-participant counts
+    """
+    params = request.query_params
+    try:
+        group_id = int(params['group_id'])
+    except (KeyError, ValueError):
+        return _error('group_id is required and must be an integer')
+    try:
+        date_from = date.fromisoformat(params.get('date_from', ''))
+        date_to = date.fromisoformat(params.get('date_to', ''))
+    except ValueError:
+        return _error('date_from and date_to are required dates (YYYY-MM-DD)')
+    if date_to < date_from:
+        return _error('date_to must not be before date_from')
+    if (date_to - date_from).days >= MAX_REPORT_DAYS:
+        return _error(f'The period may cover at most {MAX_REPORT_DAYS} days')
+
+    group = Group.scoped.for_organization(request.user.organization).filter(pk=group_id).first()
+    if group is None:
+        return Response({
+            'errors': [{'message': 'Group not found'}]
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    service = AttendanceReportService(request.user.organization)
+    report = service.attendance(group, date_from, date_to)
+    return Response({'data': report})
+
+
+@query_budget(max_queries=7, max_seconds=2.0)
+@extend_schema(
+    tags=['Reports'],
+    summary='Attendance analytics',
+    description=(
+        'Chronically absent participants, consecutive-absence streaks and week-over-week '
+        'attendance rates per group for a period. Results are cached for a few minutes.'
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='date_from', type=str, required=True, description='First day (YYYY-MM-DD)',
+        ),
+        OpenApiParameter(
+            name='date_to', type=str, required=True, description='Last day (YYYY-MM-DD)',
+        ),
+        OpenApiParameter(name='group_id', type=int, description='Only this group'),
+        OpenApiParameter(
+            name='chronic_threshold', type=float, description='Absence rate (default 0.1)',
+        ),
+        OpenApiParameter(
+            name='min_sessions', type=int, description='Sessions needed to be rated (default 5)',
+        ),
+        OpenApiParameter(
+            name='min_streak', type=int, description='Shortest streak reported (default 3)',
+        ),
+    ],
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'data': {
+                    'type': 'object',
+                    'properties': {
+                        'period': {'type': 'object'},
+                        'marks': {'type': 'integer'},
+                        'chronic_absence': {'type': 'array', 'items': {'type': 'object'}},
+                        'streaks': {'type': 'array', 'items': {'type': 'object'}},
+                        'trends': {'type': 'array', 'items': {'type': 'object'}},
+                    }
+                }
+            }
+        }
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAdministratorOrManager])
+@replica_reads
+def analytics_view(request):
+    """
+    Get attendance analytics for a period.
+
+    Query params:
+        date_from, date_to: Period, inclusive
+        group_id: Optional group filter
+        chronic_threshold, min_sessions, min_streak: Optional tuning
+
+    Returns:
+        Chronic absence list, absence streaks and weekly trends
+    """
+    params = request.query_params
+    try:
+        date_from = date.fromisoformat(params.get('date_from', ''))
+        date_to = date.fromisoformat(params.get('date_to', ''))
+    except ValueError:
+        return _error('date_from and date_to are required dates (YYYY-MM-DD)')
+    if date_to < date_from:
+        return _error('date_to must not be before date_from')
+    if (date_to - date_from).days >= MAX_ANALYTICS_DAYS:
+        return _error(f'The period may cover at most {MAX_ANALYTICS_DAYS} days')
+
+    try:
+        group_id = int(params['group_id']) if 'group_id' in params else None
+        chronic_threshold = (
+            float(params['chronic_threshold']) if 'chronic_threshold' in params else None
+        )
+        min_sessions = int(params['min_sessions']) if 'min_sessions' in params else None
+        min_streak = int(params['min_streak']) if 'min_streak' in params else None
+    except ValueError:
+        return _error(
+            'group_id, min_sessions and min_streak must be integers, chronic_threshold a number'
+        )
+
+    result = AttendanceAnalyticsService(request.user.organization).summary(
+        date_from,
+        date_to,
+        group_id=group_id,
+        chronic_threshold=chronic_threshold,
+        min_sessions=min_sessions,
+        min_streak=min_streak,
+    )
+    return Response({'data': result})
+
+
+def _stream_absentees(session, rows):
+    """The absentee response body, written as the rows arrive."""
+    yield '{"data": {"session": %s, "absentees": [' % json.dumps({
+        'id': session.id,
+        'name': session.name,
+        'group_id': session.group_id,
+    })
+    count = 0
+    for row in rows.iterator(chunk_size=ABSENTEE_CHUNK):
+        yield (',' if count else '') + json.dumps(row)
+        count += 1
+    yield '], "count": %d}}' % count
+
+
+@query_budget(max_queries=7, max_seconds=0.5)
+@extend_schema(
+    tags=['Reports'],
+    summary='Session absentees',
+    description=(
+        "Members of the session's group and its active sub-groups who are marked absent or "
+        'excused, or not marked at all (state null). Streamed, ordered by name.'
+    ),
+    parameters=[
+        OpenApiParameter(name='session_id', type=int, required=True, description='Session'),
+    ],
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'data': {
+                    'type': 'object',
+                    'properties': {
+                        'session': {'type': 'object'},
+                        'absentees': {
+                            'type': 'array',
+                            'items': {
+                                'type': 'object',
+                                'properties': {
+                                    'id': {'type': 'integer'},
+                                    'identifier': {'type': 'string'},
+                                    'first_name': {'type': 'string'},
+                                    'last_name': {'type': 'string'},
+                                    'state': {'type': 'string', 'nullable': True},
+                                }
+                            }
+                        },
+                        'count': {'type': 'integer'},
+                    }
+                }
+            }
+        }
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def absentees_view(request):
+    """
+    List the absentees of a session.
+
+    Query params:
+        session_id: Session to report on
+
+    Returns:
+        Streamed absentee list
+    """
+    try:
+        session_id = int(request.query_params['session_id'])
+    except (KeyError, ValueError):
+        return _error('session_id is required and must be an integer')
+
+    sessions = Session.scoped.for_organization(request.user.organization)
+    session = sessions.filter(pk=session_id).first()
+    if session is None:
+        return Response({
+            'errors': [{'message': 'Session not found'}]
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    rows = AbsenteeReportService(request.user.organization).absentees(session)
+    # The body is read after the middleware has reset the shard and primary pin: route now
+    rows = rows.using(rows.db)
+    return StreamingHttpResponse(_stream_absentees(session, rows), content_type='application/json')
@@ -0,0 +1,172 @@
+"""
+Session views.
+"""
+from django.views.decorators.gzip import gzip_page
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+from app.core.query_budget import query_budget
+from app.models import Session
+from app.services.offline_service import SessionPackService
+from app.services.session_service import SessionService
+
+
+SESSION_SUMMARY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'id': {'type': 'integer'},
+        'name': {'type': 'string'},
+        'group_id': {'type': 'integer'},
+        'scheduled_start_at': {'type': 'string', 'format': 'date-time'},
+        'scheduled_end_at': {'type': 'string', 'format': 'date-time'},
+        'actual_start_at': {'type': 'string', 'format': 'date-time', 'nullable': True},
+        'actual_end_at': {'type': 'string', 'format': 'date-time', 'nullable': True},
+        'location': {'type': 'string', 'nullable': True},
+    }
+}
+
+
+@query_budget(max_queries=5, max_seconds=0.25)
+@extend_schema(
+    tags=['Sessions'],
+    summary='Current and upcoming sessions',
+    description="Sessions in progress now and still to come today for the user's organization",
+    parameters=[
+        OpenApiParameter(
+            name='group_id',
+            type=int,
+            many=True,
+            description='Restrict to these groups (repeatable)',
+        ),
+    ],
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'data': {
+                    'type': 'object',
+                    'properties': {
+                        'current': {'type': 'array', 'items': SESSION_SUMMARY_SCHEMA},
+                        'upcoming': {'type': 'array', 'items': SESSION_SUMMARY_SCHEMA},
+                    }
+                }
+            }
+        }
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sessions_now_view(request):
+    """
+    Get the sessions happening now and later today.
+
+    Query params:
+        group_id: Optional group filter, may be repeated
+
+    Returns:
+        Current and upcoming sessions ordered by scheduled start
+    """
+    try:
+        group_ids = [int(value) for value in request.query_params.getlist('group_id')]
+    except ValueError:
+        return Response({
+            'errors': [{'message': 'group_id must be an integer'}]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    sessions = SessionService().get_current_and_upcoming(
+        request.user.organization,
+        group_ids=group_ids,
+    )
+    return Response({'data': sessions})
+
+
+PACK_TABLE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'columns': {'type': 'array', 'items': {'type': 'string'}},
+        'rows': {'type': 'array', 'items': {'type': 'array', 'items': {}}},
+    }
+}
+
+
+@query_budget(max_queries=13, max_seconds=1.0)
+@gzip_page
+@extend_schema(
+    tags=['Sessions'],
+    summary='Offline session pack',
+    description=(
+        'Roster, presence states and current marks of a session as one compressed, '
+        'ETag-versioned payload. Pass `since` to receive only changes after that version.'
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='since',
+            type=int,
+            description='Pack version already held by the device',
+        ),
+    ],
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'data': {
+                    'type': 'object',
+                    'properties': {
+                        'session': SESSION_SUMMARY_SCHEMA,
+                        'version': {'type': 'integer'},
+                        'since': {'type': 'integer', 'nullable': True},
+                        'participants': PACK_TABLE_SCHEMA,
+                        'presence_states': PACK_TABLE_SCHEMA,
+                        'marks': PACK_TABLE_SCHEMA,
+                        'roster_ids': {'type': 'array', 'items': {'type': 'integer'}},
+                        'marked_ids': {'type': 'array', 'items': {'type': 'integer'}},
+                    }
+                }
+            }
+        },
+        304: None,
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def session_pack_view(request, session_id):
+    """
+    Get the offline pack for a session.
+
+    Query params:
+        since: Optional pack version held by the device (delta mode)
+
+    Returns:
+        Full or delta pack; 304 if the device's ETag is still current
+    """
+    try:
+        since = int(request.query_params['since']) if 'since' in request.query_params else None
+    except ValueError:
+        return Response({
+            'errors': [{'message': 'since must be an integer version'}]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # No select_related: organizations live on the catalog database, not the shard
+    session = Session.scoped.for_organization(request.user.organization).filter(
+        pk=session_id,
+    ).first()
+    if session is None:
+        return Response({
+            'errors': [{'message': 'Session not found'}]
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    service = SessionPackService(session)
+    version = service.get_version()
+    # The counts change when a member or a mark is deleted, which moves no watermark
+    etag = f'"pack-{session.id}-{since or 0}-{version.version}-{version.members}-{version.marks}"'
+
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    return Response(
+        {'data': service.build(version.version, since=since)},
+        headers={'ETag': etag},
+    )
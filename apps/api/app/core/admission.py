@@ -0,0 +1,242 @@
+"""
+Admission control for heavy endpoints.
+
+Sync and export requests pass a concurrency gate per endpoint class: at most
+``concurrency`` of them run at once in this worker process, and at most
+``per_organization`` for any one organization. Requests over the limit wait up
+to ``queue_timeout`` seconds for a slot (with at most ``max_queue`` waiting);
+the rest get 503 with ``Retry-After``. Interactive endpoints are not gated, so
+a reconnect storm of bulk syncs cannot push roll-call latency up by taking
+every database connection.
+
+The middleware runs in both handler modes: under WSGI waiting requests block
+their worker thread on a condition; under ASGI they await a future on the
+event loop, so a queued request never holds a thread another request needs to
+release its slot.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .metrics import registry
+from .ratelimit import endpoint_class
+
+decisions = registry.counter(
+    'admission_decisions_total',
+    'Admission decisions for gated endpoints',
+    ['endpoint_class', 'outcome'],
+)
+queue_wait_seconds = registry.histogram(
+    'admission_queue_wait_seconds',
+    'Time gated requests waited for a slot',
+    ['endpoint_class'],
+)
+in_flight = registry.gauge(
+    'admission_in_flight', 'Gated requests currently running', ['endpoint_class']
+)
+queued = registry.gauge(
+    'admission_queued', 'Gated requests currently waiting for a slot', ['endpoint_class']
+)
+
+
+class AdmissionGate:
+    """Bounded concurrency, globally and per organization, with a bounded wait queue."""
+
+    def __init__(self, name, concurrency, per_organization=None, max_queue=0, queue_timeout=0.0):
+        self.name = name
+        self.concurrency = concurrency
+        self.per_organization = per_organization or concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._active_by_organization = Counter()
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self._async_waiters = []  # (event loop, future) of aacquire() calls waiting for a slot
+
+    def _has_slot(self, organization_id):
+        return (
+            self._active < self.concurrency
+            and self._active_by_organization[organization_id] < self.per_organization
+        )
+
+    def _enter(self, organization_id):
+        self._active += 1
+        self._active_by_organization[organization_id] += 1
+        in_flight.inc(endpoint_class=self.name)
+
+    def acquire(self, organization_id):
+        """
+        Take a slot, waiting up to ``queue_timeout``.
+
+        Returns:
+            ``admitted``, ``queued`` (admitted after waiting), ``queue_full`` or ``timeout``
+        """
+        started = time.monotonic()
+        with self._condition:
+            if self._has_slot(organization_id):
+                self._enter(organization_id)
+                return 'admitted'
+            if self._waiting >= self.max_queue:
+                return 'queue_full'
+
+            self._waiting += 1
+            queued.inc(endpoint_class=self.name)
+            try:
+                deadline = started + self.queue_timeout
+                while not self._has_slot(organization_id):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return 'timeout'
+                    self._condition.wait(remaining)
+                self._enter(organization_id)
+                return 'queued'
+            finally:
+                self._waiting -= 1
+                queued.dec(endpoint_class=self.name)
+                queue_wait_seconds.observe(time.monotonic() - started, endpoint_class=self.name)
+
+    async def aacquire(self, organization_id):
+        """``acquire()`` for the async handler: waits on the event loop, not in a thread."""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        with self._condition:
+            if self._has_slot(organization_id):
+                self._enter(organization_id)
+                return 'admitted'
+            if self._waiting >= self.max_queue:
+                return 'queue_full'
+            self._waiting += 1
+            queued.inc(endpoint_class=self.name)
+
+        try:
+            deadline = started + self.queue_timeout
+            while True:
+                with self._condition:
+                    if self._has_slot(organization_id):
+                        self._enter(organization_id)
+                        return 'queued'
+                    wakeup = loop.create_future()
+                    self._async_waiters.append((loop, wakeup))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return 'timeout'
+                try:
+                    await asyncio.wait_for(wakeup, remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condition:
+                self._waiting -= 1
+            queued.dec(endpoint_class=self.name)
+            queue_wait_seconds.observe(time.monotonic() - started, endpoint_class=self.name)
+
+    def release(self, organization_id):
+        with self._condition:
+            self._active -= 1
+            self._active_by_organization[organization_id] -= 1
+            if self._active_by_organization[organization_id] <= 0:
+                del self._active_by_organization[organization_id]
+            in_flight.dec(endpoint_class=self.name)
+            # Waiters may be blocked on different organizations
+            self._condition.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        # Streaming bodies are closed in a worker thread: hand the wakeups to each loop
+        for loop, wakeup in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, wakeup)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionControlMiddleware:
+    """
+    Gate the endpoint classes listed in ADMISSION_LIMITS.
+
+    Runs after RateLimitMiddleware so requests that are over their rate limit
+    never occupy a queue slot. Streaming responses keep their slot until the
+    body has been sent.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.gates = {
+            name: AdmissionGate(name, **limits)
+            for name, limits in getattr(settings, 'ADMISSION_LIMITS', {}).items()
+        }
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        gate = self.gates.get(endpoint_class(request.path))
+        if gate is None:
+            return self.get_response(request)
+
+        organization_id = self._organization_id(request)
+        outcome = gate.acquire(organization_id)
+        decisions.inc(endpoint_class=gate.name, outcome=outcome)
+        if outcome not in ('admitted', 'queued'):
+            return self._busy(gate)
+
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            gate.release(organization_id)
+            raise
+        return self._release_after(response, gate, organization_id)
+
+    async def __acall__(self, request):
+        gate = self.gates.get(endpoint_class(request.path))
+        if gate is None:
+            return await self.get_response(request)
+
+        organization_id = self._organization_id(request)
+        outcome = await gate.aacquire(organization_id)
+        decisions.inc(endpoint_class=gate.name, outcome=outcome)
+        if outcome not in ('admitted', 'queued'):
+            return self._busy(gate)
+
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            gate.release(organization_id)
+            raise
+        return self._release_after(response, gate, organization_id)
+
+    @staticmethod
+    def _organization_id(request):
+        organization = getattr(request, 'organization', None)
+        return organization.pk if organization is not None else None
+
+    @staticmethod
+    def _busy(gate):
+        response = JsonResponse(
+            {'errors': [{'message': 'Server is busy, retry later'}]},
+            status=503,
+        )
+        response['Retry-After'] = str(max(1, math.ceil(gate.queue_timeout)))
+        return response
+
+    @staticmethod
+    def _release_after(response, gate, organization_id):
+        if isinstance(response, StreamingHttpResponse):
+            response._resource_closers.append(lambda: gate.release(organization_id))
+        else:
+            gate.release(organization_id)
+        return response
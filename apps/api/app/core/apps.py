@@ -5,3 +5,10 @@ class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
     verbose_name = 'Omnipresence'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from app.services.checkin_service import exit_on_sigterm
+
+        # Buffered check-in scans are flushed at exit; SIGTERM must not skip that
+        exit_on_sigterm()
@@ -0,0 +1,176 @@
+"""
+Request-level performance instrumentation.
+
+InstrumentationMiddleware records, per view, request latency, SQL query count
+and time (through ``connection.execute_wrapper``) and response sizes. The
+instrumented cache backends count hits and misses. Everything lands in the
+process-local metrics registry served by the ``/metrics`` endpoint.
+
+Set METRICS_SAMPLE_RATE below 1 to measure only a fraction of requests; the
+others only increment the request counter.
+"""
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import connections
+
+from .metrics import registry
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+requests_total = registry.counter(
+    'http_requests_total', 'HTTP requests', ['view', 'method', 'status']
+)
+request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Request latency (sampled)', ['view', 'method']
+)
+response_bytes = registry.histogram(
+    'http_response_size_bytes', 'Response body size (sampled)', ['view'], buckets=SIZE_BUCKETS
+)
+db_queries = registry.histogram(
+    'db_queries_per_request', 'SQL queries per request (sampled)', ['view'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+db_seconds = registry.histogram(
+    'db_query_duration_seconds_per_request', 'SQL time per request (sampled)', ['view']
+)
+cache_requests = registry.counter(
+    'cache_requests_total', 'Cache lookups by result', ['result']
+)
+
+
+class QueryStats:
+    """``execute_wrapper`` that counts queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+@contextmanager
+def wrap_queries(wrapper):
+    """Install ``wrapper`` as ``execute_wrapper`` on every database connection."""
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class InstrumentationMiddleware:
+    """
+    Outermost middleware: measures the whole request, including other middleware.
+
+    Database connections belong to a thread. Under ASGI the request's queries
+    run in its thread-sensitive worker thread (sync views, OrganizationMiddleware),
+    so the query counter is installed on that thread's connections.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self._count(request, self.get_response(request))
+
+        stats = QueryStats()
+        started = time.perf_counter()
+        with wrap_queries(stats):
+            response = self.get_response(request)
+        return self._record(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return self._count(request, await self.get_response(request))
+
+        stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            await sync_to_async(stack.enter_context)(wrap_queries(stats))
+            response = await self.get_response(request)
+        return self._record(request, response, stats, time.perf_counter() - started)
+
+    def _sampled(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    @staticmethod
+    def _count(request, response):
+        requests_total.inc(
+            view=view_label(request), method=request.method, status=response.status_code
+        )
+        return response
+
+    @staticmethod
+    def _record(request, response, stats, elapsed):
+        view = view_label(request)
+        requests_total.inc(view=view, method=request.method, status=response.status_code)
+        request_seconds.observe(elapsed, view=view, method=request.method)
+        db_queries.observe(stats.count, view=view)
+        db_seconds.observe(stats.duration, view=view)
+        if not response.streaming:
+            response_bytes.observe(len(response.content), view=view)
+
+        response['Server-Timing'] = (
+            f"db;dur={stats.duration * 1000:.1f};desc=\"{stats.count} queries\", "
+            f"total;dur={elapsed * 1000:.1f}"
+        )
+        return response
+
+
+class InstrumentedCacheMixin:
+    """Counts hits and misses of ``get``/``get_many``."""
+
+    def get(self, key, default=None, version=None):
+        sentinel = object()
+        value = super().get(key, sentinel, version=version)
+        if value is sentinel:
+            cache_requests.inc(result='miss')
+            return default
+        cache_requests.inc(result='hit')
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version=version)
+        if values:
+            cache_requests.inc(len(values), result='hit')
+        if len(keys) > len(values):
+            cache_requests.inc(len(keys) - len(values), result='miss')
+        return values
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
@@ -0,0 +1,155 @@
+"""
+Process-local metrics.
+
+Counters, gauges and histograms keyed by label values. Everything is kept in
+memory of the current worker process and exported in the Prometheus text
+format by ``render_prometheus()``.
+"""
+import threading
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def samples(self):
+        """Copy of ``{label values: value}``."""
+        with self._lock:
+            return dict(self._values)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {
+                    'buckets': [0] * len(self.buckets),
+                    'count': 0,
+                    'sum': 0.0,
+                }
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['buckets'][position] += 1
+            entry['count'] += 1
+            entry['sum'] += value
+
+    def samples(self):
+        with self._lock:
+            return {
+                key: {**entry, 'buckets': list(entry['buckets'])}
+                for key, entry in self._values.items()
+            }
+
+
+class MetricsRegistry:
+    """Named metrics of this process; creating a metric twice returns the existing one."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labels, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()):
+        return self._get_or_create(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labels, buckets=buckets)
+
+    def collect(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+
+registry = MetricsRegistry()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + '}'
+
+
+def render_prometheus(metrics_registry=None):
+    """Render every metric of a registry in the Prometheus text exposition format."""
+    lines = []
+    for metric in (metrics_registry or registry).collect():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for values, sample in sorted(metric.samples().items()):
+            if metric.kind != 'histogram':
+                lines.append(f"{metric.name}{_format_labels(metric.labels, values)} {sample}")
+                continue
+            # Bucket counts are already cumulative
+            for bound, count in zip(metric.buckets, sample['buckets']):
+                labels = _format_labels(metric.labels, values, [('le', bound)])
+                lines.append(f"{metric.name}_bucket{labels} {count}")
+            labels = _format_labels(metric.labels, values, [('le', '+Inf')])
+            lines.append(f"{metric.name}_bucket{labels} {sample['count']}")
+            labels = _format_labels(metric.labels, values)
+            lines.append(f"{metric.name}_sum{labels} {sample['sum']}")
+            lines.append(f"{metric.name}_count{labels} {sample['count']}")
+    return '\n'.join(lines) + '\n'
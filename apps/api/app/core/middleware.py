@@ -1,13 +1,112 @@
-from django.utils.deprecation import MiddlewareMixin
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 
+from .routers import _pinned_to_primary, replica_aliases
+from .sharding import activate_organization, deactivate_organization
 
-class OrganizationMiddleware(MiddlewareMixin):
+
+class OrganizationMiddleware:
     """
-    Middleware to attach the current user's organization to the request.
+    Middleware to attach the current user's organization to the request
+    and activate its database shard.
+
+    The shard is set and reset around the inner call in one frame: split across
+    process_request/process_response, ASGI runs the two in different contexts
+    and the reset fails. Under ASGI the user and organization are loaded in a
+    worker thread, so the middleware after this one can read them directly.
     """
 
-    def process_request(self, request):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        self._attach_organization(request)
+        # Route tenant queries to the organization's shard
+        token = activate_organization(request.organization.id if request.organization else None)
+        try:
+            return self.get_response(request)
+        finally:
+            deactivate_organization(token)
+
+    async def __acall__(self, request):
+        await sync_to_async(self._attach_organization)(request)
+        token = activate_organization(request.organization.id if request.organization else None)
+        try:
+            return await self.get_response(request)
+        finally:
+            deactivate_organization(token)
+
+    @staticmethod
+    def _attach_organization(request):
         if request.user.is_authenticated:
             request.organization = request.user.organization
         else:
             request.organization = None
+
+
+class ReadYourWritesMiddleware:
+    """
+    Keep a client's reads on the primary database for a short window after it writes.
+
+    Without this, a mark saved on the primary may not yet be visible on a
+    lagging replica when the client immediately re-fetches the roster. The
+    window is carried in a short-lived cookie, so checking it costs no cache
+    or database round trip.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    COOKIE_NAME = 'db_primary_pin'
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        token = _pinned_to_primary.set(self._pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned_to_primary.reset(token)
+        return self._remember_write(request, response)
+
+    async def __acall__(self, request):
+        token = _pinned_to_primary.set(self._pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned_to_primary.reset(token)
+        return self._remember_write(request, response)
+
+    def _pinned(self, request):
+        return (
+            request.method not in self.SAFE_METHODS
+            or self.COOKIE_NAME in request.COOKIES
+        )
+
+    def _remember_write(self, request, response):
+        if request.method not in self.SAFE_METHODS and replica_aliases():
+            response.set_cookie(
+                self.COOKIE_NAME,
+                '1',
+                max_age=getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 5),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,5 @@
+"""
+MySQL backend with a process-wide connection pool.
+
+Use ``'ENGINE': 'app.core.mysql_pool'`` with ``OPTIONS['pool']``.
+"""
@@ -0,0 +1,220 @@
+"""
+mysqlclient backend that borrows connections from a per-process pool.
+
+Django opens a connection on first use in a request and closes it when the
+request finishes (CONN_MAX_AGE=0). This backend turns that open/close into a
+checkout/return, so the TCP handshake, authentication and ``init_command`` are
+paid once per pooled connection instead of once per request. Returning the
+connection at the end of every request also keeps it correct under ASGI, where
+persistent per-thread connections are not reliably cleaned up.
+
+Pool options (``DATABASES[alias]['OPTIONS']['pool']``):
+    max_size: Connections per process and database (default 10)
+    timeout: Seconds to wait for a free connection before failing (default 5)
+    health_check_after: Ping connections idle longer than this before reuse (default 30)
+    max_lifetime: Replace connections older than this, below MySQL's wait_timeout (default 3600)
+"""
+import os
+import threading
+import time
+
+from django.db.backends.mysql import base as mysql_base
+
+from app.core.metrics import registry
+
+Database = mysql_base.Database
+
+checkouts = registry.counter(
+    'db_pool_checkouts_total', 'Connections handed out by the pool', ['alias']
+)
+opened = registry.counter(
+    'db_pool_connections_opened_total', 'New physical connections opened by the pool', ['alias']
+)
+discarded = registry.counter(
+    'db_pool_connections_discarded_total', 'Connections closed instead of being returned', ['alias']
+)
+timeouts = registry.counter(
+    'db_pool_timeouts_total', 'Checkouts that gave up waiting for a free connection', ['alias']
+)
+wait_seconds = registry.histogram(
+    'db_pool_wait_seconds', 'Time spent waiting for a connection at checkout', ['alias']
+)
+in_use = registry.gauge(
+    'db_pool_connections_in_use', 'Connections currently checked out', ['alias']
+)
+
+
+class ConnectionPool:
+    """Bounded LIFO pool of raw mysqlclient connections for one database."""
+
+    def __init__(
+        self, alias, max_size=10, timeout=5.0, health_check_after=30.0, max_lifetime=3600.0,
+    ):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.max_lifetime = max_lifetime
+        self._idle = []  # (connection, created_at, released_at)
+        self._created_at = {}
+        self._open = 0
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _forget(self, connection):
+        """Drop a connection from the pool's accounting. Caller holds the lock."""
+        self._created_at.pop(id(connection), None)
+        self._open -= 1
+        self._condition.notify()
+
+    def checkout(self, connect):
+        """Borrow a connection, opening one with ``connect()`` if none is idle."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        connection = None
+
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._idle:
+                    candidate, created_at, released_at = self._idle.pop()
+                    if now - created_at > self.max_lifetime:
+                        self._close_quietly(candidate)
+                        self._forget(candidate)
+                        continue
+                    connection = candidate
+                    break
+                if connection is not None or self._open < self.max_size:
+                    if connection is None:
+                        self._open += 1  # Reserve the slot before connecting outside the lock
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    timeouts.inc(alias=self.alias)
+                    raise Database.OperationalError(
+                        f"Timed out after {self.timeout}s waiting for a '{self.alias}' connection "
+                        f"({self.max_size} in use)"
+                    )
+                self._condition.wait(remaining)
+
+        if connection is not None and now - released_at > self.health_check_after:
+            try:
+                connection.ping()
+            except Database.Error:
+                self._close_quietly(connection)
+                with self._condition:
+                    self._created_at.pop(id(connection), None)
+                connection = None
+                discarded.inc(alias=self.alias)
+
+        if connection is None:
+            try:
+                connection = connect()
+            except Exception:
+                with self._condition:
+                    self._open -= 1
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self._created_at[id(connection)] = time.monotonic()
+            opened.inc(alias=self.alias)
+
+        checkouts.inc(alias=self.alias)
+        wait_seconds.observe(time.monotonic() - started, alias=self.alias)
+        in_use.inc(alias=self.alias)
+        return connection
+
+    def release(self, connection):
+        """Return a healthy connection to the pool."""
+        in_use.dec(alias=self.alias)
+        with self._condition:
+            created_at = self._created_at.get(id(connection))
+            if created_at is None:
+                # Not ours (e.g. opened before a fork); just close it
+                self._close_quietly(connection)
+                return
+            self._idle.append((connection, created_at, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Close a connection that must not be reused."""
+        in_use.dec(alias=self.alias)
+        discarded.inc(alias=self.alias)
+        self._close_quietly(connection)
+        with self._condition:
+            if id(connection) in self._created_at:
+                self._forget(connection)
+
+    def close_all(self):
+        with self._condition:
+            for connection, _, _ in self._idle:
+                self._close_quietly(connection)
+                self._forget(connection)
+            self._idle = []
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(alias, settings_dict):
+    """
+    Pool for a database, one per process.
+
+    Keyed by the connection settings, so a changed target (e.g. the test DB) gets its own.
+    """
+    global _pools, _pools_pid
+    key = (
+        alias,
+        settings_dict['HOST'],
+        settings_dict['PORT'],
+        settings_dict['NAME'],
+        settings_dict['USER'],
+    )
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            # Forked worker: connections inherited from the parent must not be shared
+            _pools, _pools_pid = {}, os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            options = settings_dict['OPTIONS'].get('pool') or {}
+            pool = _pools[key] = ConnectionPool(alias, **options)
+        return pool
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        return self.pool.checkout(
+            lambda: mysql_base.DatabaseWrapper.get_new_connection(self, conn_params)
+        )
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        reusable = not self.in_atomic_block and (not self.errors_occurred or self.is_usable())
+        if reusable and not self.autocommit:
+            try:
+                connection.rollback()
+            except Database.Error:
+                reusable = False
+        if reusable:
+            self.pool.release(connection)
+        else:
+            self.pool.discard(connection)
@@ -0,0 +1,347 @@
+"""
+On-demand sampling profiler and slow-request capture.
+
+A request is profiled when an administrator sends ``X-Profile: 1`` or when it
+is still running after PROFILING_SLOW_REQUEST_SECONDS. A profile holds the
+sampled call stacks of the request thread (folded, flame-graph ready), the SQL
+statements it ran (without parameters) and request metadata. Profiles are
+stored as JSON artifacts under ``profiles/`` in the default storage and can be
+downloaded from the admin profiles endpoint.
+
+Overhead is capped so this can stay on in production: at most
+PROFILING_MAX_CONCURRENT profiles per process, a sample budget and duration
+limit per profile, a cooldown between slow-request captures and a bounded SQL
+list. Requests that are not profiled only pay for SQL recording while slow
+capture is enabled (one list append per query).
+"""
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = 'profiles'
+MAX_STACK_DEPTH = 64
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def fold_stack(frame):
+    """``module:function:line`` entries from the outermost call to ``frame``, joined by ``;``."""
+    entries = []
+    while frame is not None and len(entries) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', code.co_filename)
+        entries.append(f"{module}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ';'.join(reversed(entries))
+
+
+class StackSampler:
+    """Samples one thread's call stack from a background thread."""
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.interval = _setting('PROFILING_SAMPLE_INTERVAL_SECONDS', 0.005)
+        self.max_samples = _setting('PROFILING_MAX_SAMPLES', 2000)
+        self.max_duration = _setting('PROFILING_MAX_DURATION_SECONDS', 30)
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        deadline = self.started_at + self.max_duration
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            self.stacks[fold_stack(frame)] += 1
+            self.samples += 1
+            if self.samples >= self.max_samples or time.monotonic() >= deadline:
+                return
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+
+class SqlRecorder:
+    """``execute_wrapper`` keeping the first PROFILING_MAX_SQL statements and their time."""
+
+    def __init__(self):
+        self.max_statements = _setting('PROFILING_MAX_SQL', 500)
+        self.statements = []
+        self.total = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.total += 1
+            self.duration += elapsed
+            if len(self.statements) < self.max_statements:
+                self.statements.append((context['connection'].alias, sql, elapsed))
+
+
+class ProfileSlots:
+    """Limits concurrent profiles and spaces out slow-request captures."""
+
+    def __init__(self):
+        self._active = 0
+        self._last_slow_capture = None
+        self._lock = threading.Lock()
+
+    def acquire(self, trigger):
+        with self._lock:
+            if self._active >= _setting('PROFILING_MAX_CONCURRENT', 1):
+                return False
+            if trigger == 'slow':
+                cooldown = _setting('PROFILING_SLOW_CAPTURE_COOLDOWN_SECONDS', 60)
+                now = time.monotonic()
+                if self._last_slow_capture is not None and now - self._last_slow_capture < cooldown:
+                    return False
+                self._last_slow_capture = now
+            self._active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+
+slots = ProfileSlots()
+
+
+class ProfileCapture:
+    """Profiling state of one request."""
+
+    def __init__(self, request, thread_id):
+        self.request = request
+        self.thread_id = thread_id
+        self.started = time.monotonic()
+        self.sql = SqlRecorder()
+        self.sampler = None
+        self.trigger = None
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def start(self, trigger):
+        """Start sampling if a slot is free. Returns True when profiling."""
+        with self._lock:
+            if self.finished or self.sampler is not None or not slots.acquire(trigger):
+                return False
+            self.trigger = trigger
+            self.sampler = StackSampler(self.thread_id)
+            self.sampler.start()
+            return True
+
+    def finish(self, response):
+        """Stop sampling and store the artifact. Returns the profile id, or None."""
+        with self._lock:
+            self.finished = True
+            sampler, self.sampler = self.sampler, None
+        if sampler is None:
+            return None
+        sampler.stop()
+        slots.release()
+
+        user = getattr(self.request, 'user', None)
+        organization = getattr(self.request, 'organization', None)
+        organization_id = organization.pk if organization is not None else 0
+        created_at = timezone.now()
+        profile_id = f"{created_at:%Y%m%d%H%M%S}-{organization_id}-{uuid.uuid4().hex[:8]}"
+
+        artifact = {
+            'id': profile_id,
+            'created_at': created_at.isoformat(),
+            'trigger': self.trigger,
+            'request': {
+                'method': self.request.method,
+                'path': self.request.path,
+                'query_string': self.request.META.get('QUERY_STRING', ''),
+                'status': response.status_code,
+                'duration_ms': round((time.monotonic() - self.started) * 1000, 1),
+                'user_id': user.pk if user is not None and user.is_authenticated else None,
+                'organization_id': organization_id or None,
+            },
+            'sampling': {
+                'interval_ms': sampler.interval * 1000,
+                'samples': sampler.samples,
+                'started_after_ms': round((sampler.started_at - self.started) * 1000, 1),
+            },
+            'stacks': [
+                {'stack': stack, 'samples': count}
+                for stack, count in sampler.stacks.most_common()
+            ],
+            'sql': {
+                'total': self.sql.total,
+                'duration_ms': round(self.sql.duration * 1000, 1),
+                'statements': [
+                    {'alias': alias, 'sql': sql, 'duration_ms': round(elapsed * 1000, 2)}
+                    for alias, sql, elapsed in self.sql.statements
+                ],
+            },
+        }
+        try:
+            save_profile(profile_id, artifact)
+        except Exception:
+            logger.exception("Failed to store profile %s", profile_id)
+            return None
+        return profile_id
+
+
+def save_profile(profile_id, artifact):
+    default_storage.save(
+        f"{PROFILE_DIR}/{profile_id}.json",
+        ContentFile(json.dumps(artifact, default=str).encode()),
+    )
+    # Keep only the newest PROFILING_MAX_ARTIFACTS (ids sort chronologically)
+    _, files = default_storage.listdir(PROFILE_DIR)
+    for name in sorted(files)[:-_setting('PROFILING_MAX_ARTIFACTS', 100)]:
+        default_storage.delete(f"{PROFILE_DIR}/{name}")
+
+
+def list_profiles(organization_id=None):
+    """Stored profile ids, newest first, optionally only those of one organization."""
+    if not default_storage.exists(PROFILE_DIR):
+        return []
+    _, files = default_storage.listdir(PROFILE_DIR)
+    profile_ids = sorted((name[:-5] for name in files if name.endswith('.json')), reverse=True)
+    if organization_id is not None:
+        profile_ids = [
+            profile_id for profile_id in profile_ids
+            if profile_id.split('-')[1] == str(organization_id)
+        ]
+    return profile_ids
+
+
+class SlowRequestWatchdog:
+    """One thread per process that starts sampling requests running past the threshold."""
+
+    def __init__(self):
+        self._captures = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, capture):
+        with self._lock:
+            self._captures[capture.thread_id] = capture
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='profile-watchdog', daemon=True
+                )
+                self._thread.start()
+
+    def unregister(self, capture):
+        with self._lock:
+            self._captures.pop(capture.thread_id, None)
+
+    def _run(self):
+        while True:
+            threshold = _setting('PROFILING_SLOW_REQUEST_SECONDS', 0)
+            time.sleep(min(0.1, threshold / 4) if threshold else 1)
+            if not threshold:
+                continue
+            now = time.monotonic()
+            with self._lock:
+                slow = [c for c in self._captures.values() if now - c.started >= threshold]
+            for capture in slow:
+                capture.start('slow')
+
+
+watchdog = SlowRequestWatchdog()
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests on demand (``X-Profile: 1`` from an administrator) or when slow.
+
+    Must run after OrganizationMiddleware. Profiled responses carry an
+    ``X-Profile-Id`` header naming the stored artifact. Under ASGI a request
+    that may be profiled is run from this request's thread-sensitive worker
+    thread, the one its sync views run in, so that is the thread sampled.
+    """
+
+    HEADER = 'X-Profile'
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _is_admin(request):
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_authenticated and (
+            user.is_superuser or getattr(user, 'role', None) == 'administrator'
+        )
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        requested = request.headers.get(self.HEADER) == '1' and self._is_admin(request)
+        slow_threshold = _setting('PROFILING_SLOW_REQUEST_SECONDS', 0)
+        if not requested and not slow_threshold:
+            return self.get_response(request)
+        return self._profile(request, self.get_response, requested, slow_threshold)
+
+    async def __acall__(self, request):
+        # OrganizationMiddleware has loaded the user already
+        requested = request.headers.get(self.HEADER) == '1' and self._is_admin(request)
+        slow_threshold = _setting('PROFILING_SLOW_REQUEST_SECONDS', 0)
+        if not requested and not slow_threshold:
+            return await self.get_response(request)
+        return await sync_to_async(self._profile)(
+            request, async_to_sync(self.get_response), requested, slow_threshold,
+        )
+
+    @staticmethod
+    def _profile(request, get_response, requested, slow_threshold):
+        capture = ProfileCapture(request, threading.get_ident())
+        busy = requested and not capture.start('header')
+        if slow_threshold:
+            watchdog.register(capture)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(capture.sql))
+                response = get_response(request)
+        finally:
+            watchdog.unregister(capture)
+
+        profile_id = capture.finish(response)
+        if profile_id:
+            response['X-Profile-Id'] = profile_id
+        elif busy:
+            response['X-Profile-Id'] = 'busy'
+        return response
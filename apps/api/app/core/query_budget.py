@@ -0,0 +1,108 @@
+"""
+Query budgets for API endpoints.
+
+Views declare with ``@query_budget`` how many SQL queries one request may run
+and, optionally, how long it may take. The ``check_query_budgets`` command
+requests every API endpoint against a small and a large seeded dataset and
+fails when a request goes over its budget, or when its query count grows with
+the dataset or page size, which is how N+1 patterns show up.
+"""
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more queries, or took longer, than its budget allows."""
+
+
+class QueryBudget:
+    """
+    Per-request limits of a view.
+
+    Args:
+        max_queries: Queries one request may run, across all database aliases
+        max_seconds: Wall-clock time one request may take on the large dataset
+        max_growth: Extra queries allowed on the large dataset compared to the
+            small one; 0 means the count must not depend on data or page size
+    """
+
+    def __init__(self, max_queries, max_seconds=None, max_growth=0):
+        self.max_queries = max_queries
+        self.max_seconds = max_seconds
+        self.max_growth = max_growth
+
+    def violations(self, small, large):
+        """
+        Check the measurements of one endpoint.
+
+        Args:
+            small: QueryCapture of the request against the small dataset
+            large: QueryCapture of the request against the large dataset
+
+        Returns:
+            List of human-readable violations, empty if within budget
+        """
+        problems = []
+        for label, capture in (('small', small), ('large', large)):
+            if capture.count > self.max_queries:
+                problems.append(
+                    f"{capture.count} queries on the {label} dataset (budget {self.max_queries})"
+                )
+        if large.count - small.count > self.max_growth:
+            problems.append(
+                f"query count grows with data or page size: {small.count} -> {large.count}"
+            )
+        if self.max_seconds is not None and large.duration > self.max_seconds:
+            problems.append(
+                f"{large.duration:.3f}s on the large dataset (budget {self.max_seconds}s)"
+            )
+        return problems
+
+    def check(self, small, large):
+        problems = self.violations(small, large)
+        if problems:
+            raise QueryBudgetExceeded('; '.join(problems))
+
+
+def query_budget(max_queries, max_seconds=None, max_growth=0):
+    """Declare the query budget of a view. Use as the outermost decorator."""
+    def decorator(view):
+        view.query_budget = QueryBudget(max_queries, max_seconds, max_growth)
+        return view
+    return decorator
+
+
+def get_query_budget(view):
+    return getattr(view, 'query_budget', None)
+
+
+class QueryCapture:
+    """Records the SQL run on every database connection, and the elapsed time, of a block."""
+
+    def __init__(self):
+        self.statements = []
+        self.duration = 0.0
+        self._stack = None
+        self._started = None
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements.append((context['connection'].alias, sql))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self._started
+        self._stack.close()
+        return False
@@ -0,0 +1,245 @@
+"""
+Per-user and per-organization rate limiting.
+
+Each request takes one token from a user bucket and one from an organization
+bucket of its endpoint class (``default``, or a heavier class such as
+``sync``/``export`` with its own budget). Buckets refill continuously at
+``requests / period``. With Redis configured, all buckets of a request are
+checked and charged by one Lua script, i.e. one round trip shared by every
+worker; otherwise an in-process bucket store is used.
+"""
+import logging
+import math
+import re
+import threading
+import time
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# KEYS: bucket keys. ARGV: capacity and refill rate (tokens/ms) per key.
+# Charges every bucket only if all of them have a token. Returns
+# {allowed, tokens_1, tokens_2, ...} with tokens as strings (Lua floats
+# would be truncated to integers).
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + tonumber(time[2]) / 1000
+local allowed = 1
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+        allowed = 0
+    end
+    levels[i] = tokens
+end
+local result = {allowed}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local tokens = levels[i]
+    if allowed == 1 then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate))
+    result[i + 1] = tostring(tokens)
+end
+return result
+"""
+
+
+class LocalBucketStore:
+    """In-process token buckets; limits are per worker process."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets):
+        now = time.monotonic() * 1000
+        with self._lock:
+            levels = []
+            for key, capacity, rate in buckets:
+                tokens, ts = self._buckets.get(key, (capacity, now))
+                levels.append(min(capacity, tokens + max(0.0, now - ts) * rate))
+            allowed = all(tokens >= 1 for tokens in levels)
+            if allowed:
+                levels = [tokens - 1 for tokens in levels]
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens, now)
+        return allowed, levels
+
+
+class RedisBucketStore:
+    """Token buckets in Redis, checked and charged atomically by a Lua script."""
+
+    def __init__(self, client):
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, buckets):
+        args = []
+        for _, capacity, rate in buckets:
+            args.extend([capacity, rate])
+        result = self._script(keys=[key for key, _, _ in buckets], args=args)
+        return bool(int(result[0])), [float(tokens) for tokens in result[1:]]
+
+
+@lru_cache(maxsize=1)
+def _endpoint_patterns():
+    return [
+        (re.compile(pattern), name)
+        for pattern, name in getattr(settings, 'ENDPOINT_CLASSES', [])
+    ]
+
+
+def endpoint_class(path):
+    """Name of the ENDPOINT_CLASSES entry matching a path, or ``default``."""
+    for pattern, name in _endpoint_patterns():
+        if pattern.search(path):
+            return name
+    return 'default'
+
+
+def client_ip(request):
+    """
+    Address of the client, seen through ``TRUSTED_PROXY_HOPS`` reverse proxies.
+
+    Each proxy appends the address it received the request from to
+    ``X-Forwarded-For``, so the client is that many entries from the right;
+    entries further left are set by the client and cannot be trusted. Falls
+    back to ``X-Real-IP`` and then ``REMOTE_ADDR``.
+    """
+    hops = getattr(settings, 'TRUSTED_PROXY_HOPS', 0)
+    if hops <= 0:
+        return request.META.get('REMOTE_ADDR', '')
+    forwarded = [
+        address.strip()
+        for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+        if address.strip()
+    ]
+    if forwarded:
+        return forwarded[-min(hops, len(forwarded))]
+    return request.META.get('HTTP_X_REAL_IP') or request.META.get('REMOTE_ADDR', '')
+
+
+def get_bucket_store():
+    backend = settings.CACHES['default']['BACKEND']
+    if backend.endswith('RedisCache'):
+        return RedisBucketStore(cache._cache.get_client(write=True))
+    return LocalBucketStore()
+
+
+class RateLimitMiddleware:
+    """
+    Enforce RATE_LIMITS on API requests.
+
+    Adds ``X-RateLimit-Limit``, ``X-RateLimit-Remaining`` and
+    ``X-RateLimit-Reset`` (seconds until the bucket is full again) for the most
+    constrained bucket, and answers 429 with ``Retry-After`` once it is empty.
+    Must run after OrganizationMiddleware. If the bucket store is unavailable
+    requests are let through rather than failing the API. Under ASGI the bucket
+    store is called from a worker thread, off the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.limits = getattr(settings, 'RATE_LIMITS', {})
+        self.path_prefix = getattr(settings, 'RATE_LIMIT_PATH_PREFIX', '/api/')
+        self.store = get_bucket_store()
+
+    def buckets(self, request):
+        """(key, capacity, tokens per ms) for every bucket this request draws from."""
+        name = endpoint_class(request.path)
+        limits = self.limits.get(name) or self.limits.get('default', {})
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            identities = {'user': f"user:{user.pk}"}
+            organization = getattr(request, 'organization', None)
+            if organization is not None:
+                identities['organization'] = f"org:{organization.pk}"
+        else:
+            identities = {'user': f"ip:{client_ip(request)}"}
+
+        buckets = []
+        for scope, identity in identities.items():
+            if scope not in limits:
+                continue
+            requests, period = limits[scope]
+            buckets.append((f"ratelimit:{name}:{identity}", requests, requests / (period * 1000)))
+        return buckets
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not request.path.startswith(self.path_prefix):
+            return self.get_response(request)
+
+        limited, headers = self.take(request)
+        response = self.get_response(request) if limited is None else limited
+        return self._with_headers(response, headers)
+
+    async def __acall__(self, request):
+        if not request.path.startswith(self.path_prefix):
+            return await self.get_response(request)
+
+        limited, headers = await sync_to_async(self.take, thread_sensitive=False)(request)
+        response = await self.get_response(request) if limited is None else limited
+        return self._with_headers(response, headers)
+
+    def take(self, request):
+        """
+        Charge the request's buckets.
+
+        Returns:
+            (429 response or None when allowed, rate limit headers)
+        """
+        buckets = self.buckets(request)
+        if not buckets:
+            return None, {}
+
+        try:
+            allowed, levels = self.store.take(buckets)
+        except Exception:
+            logger.warning("Rate limit store unavailable, allowing request", exc_info=True)
+            return None, {}
+
+        # Report the bucket closest to empty
+        (_, capacity, rate), tokens = min(zip(buckets, levels), key=lambda item: item[1])
+        headers = {
+            'X-RateLimit-Limit': str(capacity),
+            'X-RateLimit-Remaining': str(max(0, math.floor(tokens))),
+            'X-RateLimit-Reset': str(math.ceil((capacity - tokens) / rate / 1000)),
+        }
+        if allowed:
+            return None, headers
+
+        response = JsonResponse(
+            {'errors': [{'message': 'Rate limit exceeded, retry later'}]},
+            status=429,
+        )
+        response['Retry-After'] = str(max(1, math.ceil((1 - tokens) / rate / 1000)))
+        return response, headers
+
+    @staticmethod
+    def _with_headers(response, headers):
+        for header, value in headers.items():
+            response[header] = value
+        return response
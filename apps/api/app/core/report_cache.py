@@ -0,0 +1,149 @@
+"""
+In-process cache for computed reports.
+
+Report keys carry the data versions they were computed from (see
+``presence_scope()``), so a new mark in a group makes the next request miss
+instead of serving stale numbers; superseded entries simply age out.
+
+- Size-aware LRU: entries are weighed by their pickled size and the least
+  recently used ones are evicted once ``REPORT_CACHE_MAX_BYTES`` is exceeded.
+- Single-flight: concurrent requests for the same missing key wait for the
+  first one to compute it instead of all running the same report.
+
+Each worker process has its own cache; versions live in the shared cache, so
+all workers agree on when an entry is stale.
+"""
+import logging
+import pickle
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .caching import bump_version
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+requests_total = registry.counter(
+    'report_cache_requests_total',
+    'Report cache lookups by outcome (hit, miss, wait)',
+    ['report', 'outcome'],
+)
+cache_bytes = registry.gauge('report_cache_bytes', 'Bytes held by the report cache')
+evictions = registry.counter('report_cache_evictions_total', 'Report cache entries evicted')
+
+
+def presence_scope(group_id):
+    """Version scope of the presence data of one group."""
+    return f'presence_group_{group_id}'
+
+
+def bump_presence_versions(organization_id, group_ids):
+    """Invalidate cached reports over the given groups' presence data."""
+    for group_id in set(group_ids):
+        bump_version(organization_id, presence_scope(group_id))
+
+
+class _Flight:
+    """A computation in progress; waiters block on ``done``."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ReportCache:
+    """Size-bounded LRU of report results with per-key single-flight computation."""
+
+    def __init__(self, max_bytes=None, max_entry_bytes=None, wait_timeout=None):
+        self.max_bytes = max_bytes or getattr(settings, 'REPORT_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        # Larger results are returned but not kept, so one huge report cannot flush the rest
+        self.max_entry_bytes = max_entry_bytes or self.max_bytes // 8
+        self.wait_timeout = wait_timeout or getattr(settings, 'REPORT_CACHE_WAIT_SECONDS', 30)
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._flights = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return self._size
+
+    def get_or_compute(self, key, compute, report='report'):
+        """
+        Cached value of ``key``, computing it with ``compute()`` at most once at a time.
+
+        Args:
+            key: Hashable key including the data versions of the result
+            compute: Callable producing the value on a miss
+            report: Report name for the metrics
+
+        Returns:
+            The cached or computed value (shared between callers: do not mutate it)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                requests_total.inc(report=report, outcome='hit')
+                return entry[0]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            requests_total.inc(report=report, outcome='wait')
+            if flight.done.wait(self.wait_timeout):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+            # The leader is stuck; do not queue behind it forever
+            logger.warning(
+                "Report %s still computing after %ss, computing again", report, self.wait_timeout,
+            )
+            return compute()
+
+        requests_total.inc(report=report, outcome='miss')
+        try:
+            flight.value = compute()
+            # Stored before the flight ends, so no request can miss in between
+            self._store(key, flight.value)
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return flight.value
+
+    def _store(self, key, value):
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                evictions.inc()
+            cache_bytes.set(self._size)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            cache_bytes.set(0)
+
+
+report_cache = ReportCache()
@@ -0,0 +1,224 @@
+"""
+Database routers.
+"""
+import contextvars
+import functools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .sharding import (
+    CATALOG_MODELS,
+    OrganizationFrozen,
+    current_organization_id,
+    get_shard,
+    is_tenant_model,
+    shard_aliases,
+    shard_map,
+)
+
+logger = logging.getLogger(__name__)
+
+_pinned_to_primary = contextvars.ContextVar('pinned_to_primary', default=False)
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def is_pinned_to_primary():
+    return _pinned_to_primary.get()
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside this block (e.g. read-modify-write paths)."""
+    token = _pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+def replica_reads_allowed():
+    return _replica_reads.get()
+
+
+@contextmanager
+def use_replicas():
+    """Allow reads inside this block to go to a replica (reports, lists, exports)."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads(view):
+    """
+    Mark a view whose reads may lag the primary by DATABASE_REPLICA_MAX_LAG_SECONDS.
+
+    Apply below ``@permission_classes``: authentication and permission checks
+    run outside the view function and keep reading from the primary.
+    """
+    @functools.wraps(view)
+    def wrapped(*args, **kwargs):
+        with use_replicas():
+            return view(*args, **kwargs)
+    return wrapped
+
+
+def replica_aliases():
+    aliases = getattr(settings, 'DATABASE_REPLICAS', None)
+    if aliases is None:
+        aliases = [alias for alias in settings.DATABASES if alias.startswith('replica')]
+    return list(aliases)
+
+
+class ReplicaLagMonitor:
+    """Caches per-replica health so lag checks cost one query per interval, not per read."""
+
+    def __init__(self):
+        self._status = {}
+        self._lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        interval = getattr(settings, 'DATABASE_REPLICA_CHECK_INTERVAL_SECONDS', 5)
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked_at = self._status.get(alias, (True, None))
+            if checked_at is not None and now - checked_at < interval:
+                return healthy
+            # Record the check time first so concurrent readers don't all probe at once
+            self._status[alias] = (healthy, now)
+
+        healthy = self._check(alias)
+        with self._lock:
+            self._status[alias] = (healthy, now)
+        return healthy
+
+    def _check(self, alias):
+        max_lag = getattr(settings, 'DATABASE_REPLICA_MAX_LAG_SECONDS', 10)
+        try:
+            lag = self.get_lag(alias)
+        except Exception:
+            logger.warning("Replica %s unavailable, reading from primary", alias, exc_info=True)
+            return False
+        if lag is None or lag > max_lag:
+            logger.warning("Replica %s lagging (%s s), reading from primary", alias, lag)
+            return False
+        return True
+
+    @staticmethod
+    def get_lag(alias):
+        """Replication lag in seconds, or None if replication is not running."""
+        connection = connections[alias]
+        if connection.vendor != 'mysql':
+            # Local aliases (e.g. two SQLite names for one file) have no replication
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW REPLICA STATUS')
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            columns = [column[0] for column in cursor.description]
+        return dict(zip(columns, row)).get('Seconds_Behind_Source')
+
+
+lag_monitor = ReplicaLagMonitor()
+
+
+class ReplicaRouter:
+    """
+    Send reads of report, list and export views to healthy replicas, everything else to the primary.
+
+    Only views marked ``@replica_reads`` (or code inside ``use_replicas()``)
+    read from replicas, so authentication, permission checks, roll call and
+    check-in never see stale rows. Even there reads stay on the primary while
+    a request is pinned by ReadYourWritesMiddleware (every non-GET request,
+    and the short window after one), inside ``use_primary()``, or while no
+    replica is within DATABASE_REPLICA_MAX_LAG_SECONDS. Writing does not pin by itself: a pin set
+    here could never be reset and would stick to the thread or command.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in (DEFAULT_DB_ALIAS, *replica_aliases()):
+            return instance._state.db
+        if _pinned_to_primary.get() or not _replica_reads.get():
+            return DEFAULT_DB_ALIAS
+
+        healthy = [alias for alias in replica_aliases() if lag_monitor.is_healthy(alias)]
+        if not healthy:
+            return DEFAULT_DB_ALIAS
+        return random.choice(healthy)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ShardRouter:
+    """
+    Pin tenant queries to the shard of their organization.
+
+    Returns None for organizations on the ``default`` shard (and for catalog
+    models) so ReplicaRouter can still spread those reads across replicas.
+    """
+
+    @staticmethod
+    def _organization_id(hints):
+        instance = hints.get('instance')
+        organization_id = getattr(instance, 'organization_id', None)
+        if organization_id is not None:
+            return organization_id
+        return current_organization_id()
+
+    def db_for_read(self, model, **hints):
+        if not is_tenant_model(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        shard = get_shard(self._organization_id(hints))
+        return None if shard == DEFAULT_DB_ALIAS else shard
+
+    def db_for_write(self, model, **hints):
+        if not is_tenant_model(model):
+            return None
+        organization_id = self._organization_id(hints)
+        if organization_id is None:
+            return None
+        shard, frozen = shard_map.get(organization_id)
+        if frozen:
+            raise OrganizationFrozen(
+                f"Organization {organization_id} is being moved between shards; retry shortly"
+            )
+        return None if shard == DEFAULT_DB_ALIAS else shard
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Tenant rows reference organizations and users on default (db_constraint=False)
+        if is_tenant_model(type(obj1)) != is_tenant_model(type(obj2)) and any(
+            obj._meta.app_label == 'app' and obj._meta.model_name in CATALOG_MODELS
+            for obj in (obj1, obj2)
+        ):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in shard_aliases():
+            return None
+        # Shards only hold tenant tables
+        return app_label == 'app' and model_name not in CATALOG_MODELS
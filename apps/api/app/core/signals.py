@@ -0,0 +1,104 @@
+"""
+Signal handlers keeping derived caches in sync with model changes.
+
+Memberships and presence records get no post_delete receiver: any delete
+receiver makes Django load and signal every row a cascade removes instead of
+deleting them in one statement. Their querysets and ``delete()`` bump the
+versions, and the receivers of the models they cascade from (sessions,
+groups, participants) cover cascades. Bulk writes send no signals either;
+they bump explicitly (``ParticipantQuerySet``, ``GroupMembershipQuerySet``,
+``ScanLog``).
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app.core.caching import bump_version
+from app.core.report_cache import bump_presence_versions
+from app.models import (
+    Group,
+    GroupMembership,
+    Organization,
+    Participant,
+    PresenceRecord,
+    PresenceState,
+    Session,
+    User,
+)
+from app.services.checkin_service import CheckinService
+
+
+@receiver([post_save, post_delete], sender=Session)
+def invalidate_session_schedule(sender, instance, signal, **kwargs):
+    """Drop cached day schedules when a session is created, moved or removed."""
+    bump_version(instance.organization_id, 'sessions')
+    if signal is post_delete:
+        # Its presence records went with it
+        bump_presence_versions(instance.organization_id, [instance.group_id])
+
+
+@receiver([post_save, post_delete], sender=Session)
+def drop_checkin_index(sender, instance, **kwargs):
+    """Rebuild the check-in index after a session is started, ended or removed."""
+    CheckinService.drop_index(instance.id)
+
+
+@receiver([post_save, post_delete], sender=PresenceState)
+def bump_presence_states_version(sender, instance, **kwargs):
+    bump_version(instance.organization_id, 'presence_states')
+
+
+@receiver(post_save, sender=PresenceRecord)
+def bump_presence_version(sender, instance, **kwargs):
+    # Records are usually saved with their session loaded; only look it up otherwise
+    if PresenceRecord.session.is_cached(instance):
+        group_id = instance.session.group_id
+    else:
+        group_id = (
+            Session.objects.filter(pk=instance.session_id)
+            .values_list('group_id', flat=True)
+            .first()
+        )
+    if group_id is not None:
+        bump_presence_versions(instance.organization_id, [group_id])
+
+
+@receiver([post_save, post_delete], sender=Group)
+def bump_groups_version(sender, instance, signal, **kwargs):
+    bump_version(instance.organization_id, 'groups')
+    if signal is post_delete:
+        # Its memberships and its sessions' presence records went with it
+        bump_version(instance.organization_id, 'participants')
+        bump_presence_versions(instance.organization_id, [instance.id])
+
+
+@receiver(post_save, sender=GroupMembership)
+def bump_membership_versions(sender, instance, **kwargs):
+    if GroupMembership.group.is_cached(instance):
+        organization_id = instance.group.organization_id
+    else:
+        organization_id = Group.objects.filter(pk=instance.group_id).values_list(
+            'organization_id', flat=True,
+        ).first()
+    bump_version(organization_id, 'groups')
+    bump_version(organization_id, 'participants')
+
+
+@receiver([post_save, post_delete], sender=Participant)
+def bump_participants_version(sender, instance, signal, **kwargs):
+    bump_version(instance.organization_id, 'participants')
+    if signal is post_delete:
+        # Its memberships went with it; attendance reports also key on 'participants'
+        bump_version(instance.organization_id, 'groups')
+
+
+@receiver([post_save, post_delete], sender=Organization)
+def bump_organization_version(sender, instance, **kwargs):
+    bump_version(instance.id, 'organization')
+
+
+@receiver([post_save, post_delete], sender=User)
+def bump_users_version(sender, instance, update_fields=None, **kwargs):
+    # Login bookkeeping does not change anything clients display
+    if update_fields and set(update_fields) <= {'last_login', 'last_login_at'}:
+        return
+    bump_version(getattr(instance, 'organization_id', None), 'users')
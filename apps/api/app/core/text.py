@@ -0,0 +1,57 @@
+"""
+Text normalization for search and matching.
+"""
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def fold(value):
+    """
+    Accent- and case-fold text to lowercase words separated by single spaces.
+
+    ``"  Zoë  O'Brien-Núñez "`` becomes ``"zoe o brien nunez"``. Letters of
+    other scripts are kept (``"Иван Петров"`` -> ``"иван петров"``), only
+    punctuation and symbols separate words.
+    """
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_WORD.sub(' ', stripped.casefold()).strip()
+
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+
+def soundex(value):
+    """
+    American Soundex code of the letters of ``value`` (``"Robert"`` -> ``"r163"``).
+
+    Names that sound alike share a code, which makes it a cheap blocking key for
+    duplicate detection. Separators are ignored, so ``"O'Brien"`` codes as
+    ``"obrien"``. Returns ``''`` when there are no letters.
+    """
+    letters = ''.join(char for char in fold(value) if char.isalpha())
+    if not letters:
+        return ''
+    code = letters[0]
+    previous = _SOUNDEX_CODES.get(letters[0])
+    for char in letters[1:]:
+        digit = _SOUNDEX_CODES.get(char)
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # 'h' and 'w' do not separate letters with the same code; vowels do
+        if char not in 'hw':
+            previous = digit
+    return code.ljust(4, '0')
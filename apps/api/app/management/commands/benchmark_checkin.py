@@ -0,0 +1,98 @@
+"""
+Benchmark the badge check-in path.
+
+Builds a throwaway event (organization, group, roster, session) inside a
+transaction that is rolled back at the end, then pushes scans through
+CheckinService including the micro-batch flushes.
+
+Usage:
+    python manage.py benchmark_checkin --participants 5000 --target 1000
+"""
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from app.models import Group, GroupMembership, Organization, Participant, Session
+from app.services.checkin_service import CheckinService, ScanLog
+
+
+class Command(BaseCommand):
+    help = 'Measure badge check-in throughput (scans per second) on this node'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participants', type=int, default=5000, help='Roster size')
+        parser.add_argument('--batch-size', type=int, default=200, help='Flush batch size')
+        parser.add_argument('--scan-batch', type=int, default=1, help='Identifiers per request')
+        parser.add_argument('--target', type=float, default=1000.0, help='Required scans/sec')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            result = self._run(options)
+            transaction.set_rollback(True)
+
+        rate = result['scans'] / result['elapsed']
+        self.stdout.write(
+            f"warm index: {result['warm']:.3f}s for {options['participants']} participants"
+        )
+        self.stdout.write(
+            f"{result['scans']} scans in {result['elapsed']:.3f}s "
+            f"({rate:,.0f} scans/sec, flush batch size {options['batch_size']})"
+        )
+        if rate >= options['target']:
+            self.stdout.write(self.style.SUCCESS(f"PASS: >= {options['target']:,.0f} scans/sec"))
+        else:
+            self.stdout.write(self.style.ERROR(f"FAIL: < {options['target']:,.0f} scans/sec"))
+
+    def _run(self, options):
+        suffix = uuid.uuid4().hex[:8]
+        organization = Organization.objects.create(
+            name=f'Benchmark {suffix}',
+            slug=f'benchmark-{suffix}',
+            domain=f'benchmark-{suffix}.invalid',
+            domain_type='events',
+        )
+        group = Group.objects.create(organization=organization, name='Gate A', group_type='other')
+        Participant.objects.bulk_create([
+            Participant(
+                organization=organization,
+                first_name='Attendee',
+                last_name=str(i),
+                identifier=f'BADGE-{i:07d}',
+            )
+            for i in range(options['participants'])
+        ], batch_size=1000)
+        participants = list(Participant.objects.filter(organization=organization))
+        GroupMembership.objects.bulk_create([
+            GroupMembership(group=group, participant=participant)
+            for participant in participants
+        ], batch_size=1000)
+        now = timezone.now()
+        session = Session.objects.create(
+            organization=organization,
+            group=group,
+            name='Benchmark Event',
+            scheduled_start_at=now - timedelta(minutes=5),
+            scheduled_end_at=now + timedelta(hours=2),
+        )
+
+        started = time.perf_counter()
+        index = CheckinService.get_index(session.id, organization.id)
+        warm = time.perf_counter() - started
+
+        log = ScanLog(batch_size=options['batch_size'], flush_interval=3600)
+        service = CheckinService(log=log)
+        identifiers = [participant.identifier for participant in participants]
+        step = max(1, options['scan_batch'])
+
+        started = time.perf_counter()
+        for offset in range(0, len(identifiers), step):
+            service.check_in(index, identifiers[offset:offset + step], device_id='bench')
+        log.flush()
+        elapsed = time.perf_counter() - started
+
+        CheckinService.drop_index(session.id)
+        return {'scans': len(identifiers), 'elapsed': elapsed, 'warm': warm}
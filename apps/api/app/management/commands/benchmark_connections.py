@@ -0,0 +1,94 @@
+"""
+Benchmark per-request database connection overhead.
+
+Replays a minimal request (one query, then Django's end-of-request connection
+handling) against two connections to the same database:
+
+- baseline: a plain backend with CONN_MAX_AGE=0, i.e. connect and disconnect
+  on every request
+- configured: the alias as configured (persistent connections or the pool)
+
+Usage:
+    python manage.py benchmark_connections --requests 500
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
+
+POOLED_ENGINE = 'app.core.mysql_pool'
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request connection overhead with and without connection reuse'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Simulated requests per mode')
+        parser.add_argument('--database', default='default', help='Database alias')
+
+    def _baseline_wrapper(self, alias):
+        settings_dict = connections[alias].settings_dict.copy()
+        settings_dict['OPTIONS'] = {
+            key: value for key, value in settings_dict['OPTIONS'].items() if key != 'pool'
+        }
+        settings_dict['CONN_MAX_AGE'] = 0
+        if settings_dict['ENGINE'] == POOLED_ENGINE:
+            settings_dict['ENGINE'] = 'django.db.backends.mysql'
+        return load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+
+    @staticmethod
+    def _run(wrapper, count):
+        """Time ``count`` request cycles; returns (seconds, physical connects)."""
+        connects = 0
+
+        def on_connect(sender, connection, **kwargs):
+            nonlocal connects
+            if connection is wrapper:
+                connects += 1
+
+        connection_created.connect(on_connect, weak=False)
+        started = time.perf_counter()
+        try:
+            for _ in range(count):
+                with wrapper.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                # What request_finished does for this connection
+                wrapper.close_if_unusable_or_obsolete()
+        finally:
+            elapsed = time.perf_counter() - started
+            connection_created.disconnect(on_connect)
+        return elapsed, connects
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        count = options['requests']
+        configured = connections[alias]
+
+        baseline = self._baseline_wrapper(alias)
+        baseline_time, baseline_connects = self._run(baseline, count)
+        baseline.close()
+
+        configured_time, configured_connects = self._run(configured, count)
+        if configured.settings_dict['ENGINE'] == POOLED_ENGINE:
+            # Every checkout fires connection_created; count physical connects instead
+            from app.core.mysql_pool.base import opened
+            configured_connects = int(opened.get(alias=alias))
+
+        per_request = lambda seconds: seconds / count * 1000  # noqa: E731
+        self.stdout.write(
+            f"baseline (connect per request): {per_request(baseline_time):.3f} ms/request, "
+            f"{baseline_connects} connects"
+        )
+        self.stdout.write(
+            f"configured ({configured.settings_dict['ENGINE']}, "
+            f"CONN_MAX_AGE={configured.settings_dict['CONN_MAX_AGE']}): "
+            f"{per_request(configured_time):.3f} ms/request, "
+            f"{configured_connects} physical connects"
+        )
+        saved = per_request(baseline_time - configured_time)
+        self.stdout.write(self.style.SUCCESS(
+            f"saved {saved:.3f} ms of connection overhead per request"
+        ))
@@ -0,0 +1,217 @@
+"""
+Check every API endpoint against its declared query budget.
+
+Seeds a small and a large organization inside a transaction that is rolled
+back at the end, then requests each endpoint in ``app.api.urls`` for both
+(with a small and a large page size where the endpoint is paged) and fails if:
+
+- a view has no ``@query_budget`` or no request scenario below
+- a request runs more queries than its budget, or takes longer than
+  ``max_seconds`` on the large dataset
+- the query count grows from the small to the large dataset (N+1 patterns)
+
+Requests are made cold (empty caches, no warm check-in index) so cached paths
+cannot hide queries. Caching and rate limiting are switched to private
+in-process backends for the run.
+
+Usage:
+    python manage.py check_query_budgets [--large large] [--repeat 3]
+"""
+import logging
+import statistics
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from app.api.urls import urlpatterns
+from app.core.query_budget import QueryCapture, get_query_budget
+from app.core.report_cache import report_cache
+from app.core.sharding import shard_map
+from app.models import Participant
+from app.services.checkin_service import CheckinService, scan_log
+from app.services.seed_service import DATASET_SIZES, DatasetSeeder
+
+# Page sizes requested from paged endpoints on the small and the large dataset
+PAGE_SIZES = {'small': 5, 'large': 200}
+
+
+def _checkin(dataset, page):
+    session = dataset.current_sessions[0]
+    identifiers = list(
+        Participant.objects.filter(memberships__group_id=session.group_id)
+        .order_by('id').values_list('identifier', flat=True)[:page]
+    )
+    CheckinService.drop_index(session.id)
+    payload = {'session_id': session.id, 'identifiers': identifiers}
+    return 'post', reverse('presence-checkin'), payload
+
+
+# URL name -> function(dataset, page size) returning (method, path, data)
+SCENARIOS = {
+    'login': lambda dataset, page: (
+        'post', reverse('login'), {'email': dataset.user.email, 'password': dataset.password},
+    ),
+    'logout': lambda dataset, page: ('post', reverse('logout'), None),
+    'me': lambda dataset, page: ('get', reverse('me'), None),
+    'participants-search': lambda dataset, page: (
+        'get', reverse('participants-search'), {'q': 'last1', 'limit': page},
+    ),
+    'sessions-now': lambda dataset, page: ('get', reverse('sessions-now'), None),
+    'session-pack': lambda dataset, page: (
+        'get', reverse('session-pack', args=[dataset.sessions[0].id]), None,
+    ),
+    'presence-checkin': _checkin,
+    'presence-changes': lambda dataset, page: (
+        'get', reverse('presence-changes'), {'limit': page},
+    ),
+    'reports-absentees': lambda dataset, page: (
+        'get', reverse('reports-absentees'), {'session_id': dataset.current_sessions[0].id},
+    ),
+    'reports-attendance': lambda dataset, page: (
+        'get', reverse('reports-attendance'), {
+            'group_id': dataset.groups[0].id,
+            'date_from': (timezone.localdate() - timedelta(days=30)).isoformat(),
+            'date_to': timezone.localdate().isoformat(),
+        },
+    ),
+    'reports-analytics': lambda dataset, page: (
+        'get', reverse('reports-analytics'), {
+            'date_from': (timezone.localdate() - timedelta(days=60)).isoformat(),
+            'date_to': timezone.localdate().isoformat(),
+        },
+    ),
+    'admin-audit-as-of': lambda dataset, page: (
+        'get', reverse('admin-audit-as-of'), {
+            'session_id': dataset.sessions[0].id,
+            'at': timezone.now().isoformat(),
+        },
+    ),
+    'admin-profiles': lambda dataset, page: ('get', reverse('admin-profiles'), None),
+    'admin-profile-download': lambda dataset, page: (
+        'get', reverse('admin-profile-download', args=['missing']), None,
+    ),
+}
+
+# Expected response status where it is not 200
+EXPECTED_STATUS = {'admin-profile-download': 404}
+
+CHECK_SETTINGS = {
+    'ALLOWED_HOSTS': ['testserver'],
+    'CACHES': {
+        'default': {
+            'BACKEND': 'app.core.instrumentation.InstrumentedLocMemCache',
+            'LOCATION': 'query-budgets',
+        }
+    },
+    'RATE_LIMITS': {},
+    'PROFILING_SLOW_REQUEST_SECONDS': 0,
+}
+
+
+class Command(BaseCommand):
+    help = 'Fail if an API endpoint exceeds its query budget or its query count scales with data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', default='small', choices=DATASET_SIZES, help='Small dataset')
+        parser.add_argument('--large', default='medium', choices=DATASET_SIZES,
+                            help='Large dataset')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Timed runs per request (median)')
+
+    def handle(self, *args, **options):
+        # Expected 4xx responses would otherwise be logged as warnings
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(**CHECK_SETTINGS), transaction.atomic():
+                failures = self._run(options)
+                transaction.set_rollback(True)
+        finally:
+            request_logger.setLevel(level)
+
+        if failures:
+            raise CommandError(f"{len(failures)} endpoints over their query budget")
+        self.stdout.write(self.style.SUCCESS('All endpoints are within their query budgets'))
+
+    def _run(self, options):
+        seeder = DatasetSeeder(seed=0)
+        datasets = {
+            'small': seeder.seed(options['small']),
+            'large': seeder.seed(options['large']),
+        }
+        client = Client()
+        failures = []
+
+        for pattern in urlpatterns:
+            name = pattern.name
+            budget = get_query_budget(pattern.callback)
+            scenario = SCENARIOS.get(name)
+            if budget is None or scenario is None:
+                missing = (
+                    'a @query_budget' if budget is None else 'a scenario in check_query_budgets'
+                )
+                self.stdout.write(f"FAIL  {name}: no {missing}")
+                failures.append(name)
+                continue
+
+            captures = {
+                label: self._measure(
+                    client, scenario, dataset, PAGE_SIZES[label], options['repeat'],
+                )
+                for label, dataset in datasets.items()
+            }
+            small, large = captures['small'], captures['large']
+            problems = budget.violations(small, large)
+            expected = EXPECTED_STATUS.get(name, 200)
+            for label, capture in captures.items():
+                if capture.status_code != expected:
+                    problems.append(
+                        f"status {capture.status_code} on the {label} dataset (expected {expected})"
+                    )
+            summary = (
+                f"{name}: {small.count} -> {large.count} queries "
+                f"(budget {budget.max_queries}), {large.duration * 1000:.1f}ms"
+            )
+            if problems:
+                self.stdout.write(f"FAIL  {summary}")
+                for problem in problems:
+                    self.stdout.write(f"        {problem}")
+                if options['verbosity'] > 1:
+                    for alias, sql in large.statements:
+                        self.stdout.write(f"        [{alias}] {sql}")
+                failures.append(name)
+            else:
+                self.stdout.write(f"ok    {summary}")
+        return failures
+
+    @staticmethod
+    def _measure(client, scenario, dataset, page, repeat):
+        """Cold requests; returns the capture with the most queries and the median duration."""
+        captures = []
+        for _ in range(max(1, repeat)):
+            cache.clear()
+            report_cache.clear()
+            shard_map.invalidate()
+            method, path, data = scenario(dataset, page)
+            client.force_login(dataset.user)
+            kwargs = {'content_type': 'application/json'} if method == 'post' else {}
+            with QueryCapture() as capture:
+                response = getattr(client, method)(path, data, **kwargs)
+                if response.streaming:
+                    # Streamed bodies run their queries while being read
+                    b''.join(response.streaming_content)
+            capture.status_code = response.status_code
+            # Write buffered check-ins inside the rolled-back transaction
+            scan_log.flush()
+            captures.append(capture)
+
+        worst = max(captures, key=lambda capture: capture.count)
+        worst.duration = statistics.median(capture.duration for capture in captures)
+        return worst
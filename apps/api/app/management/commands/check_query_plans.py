@@ -0,0 +1,190 @@
+"""
+Check that hot tenant queries use the (organization, ...) composite indexes.
+
+Runs EXPLAIN for each query below and fails if the planner picks a different
+index (or none). Run it against a database with realistic data volumes, e.g.
+in CI after seeding, since planners may prefer table scans on tiny tables.
+
+Usage:
+    python manage.py check_query_plans [--organization 1]
+"""
+import json
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from app.models import (
+    AuditLog,
+    Group,
+    Notification,
+    Organization,
+    Participant,
+    ParticipantSearchToken,
+    PresenceRecord,
+    Session,
+    SyncConflict,
+)
+from app.services.report_service import AbsenteeReportService
+
+TEXT_PLAN_PATTERNS = [
+    re.compile(r'USING (?:COVERING )?INDEX (\w+)'),  # SQLite
+    re.compile(r'Index (?:Only )?Scan (?:Backward )?using (\w+)'),  # PostgreSQL
+    re.compile(r'Bitmap Index Scan on (\w+)'),
+]
+
+
+def expected_plans(organization_id):
+    """(description, queryset, index or indexes the query must use)."""
+    now = timezone.now()
+    return [
+        (
+            'active participants',
+            Participant.scoped.for_organization(organization_id).filter(is_active=True),
+            'participants_org_active_idx',
+        ),
+        (
+            'participants by folded identifier',
+            Participant.scoped.for_organization(organization_id).filter(identifier_folded='a1'),
+            'participants_org_ident_idx',
+        ),
+        (
+            'participant name search',
+            ParticipantSearchToken.scoped.for_organization(organization_id)
+            .filter(token__startswith='a'),
+            'search_tokens_org_token_idx',
+        ),
+        (
+            'active groups',
+            Group.scoped.for_organization(organization_id).filter(is_active=True),
+            'groups_org_active_idx',
+        ),
+        (
+            'groups by type',
+            Group.scoped.for_organization(organization_id).filter(group_type='class'),
+            'groups_org_type_idx',
+        ),
+        (
+            'sessions overlapping a window',
+            Session.scoped.overlapping(organization_id, now, now + timedelta(hours=1)),
+            ('sessions_org_window_idx', 'sessions_org_long_idx'),
+        ),
+        (
+            'presence records recorded since',
+            PresenceRecord.scoped.for_organization(organization_id).filter(
+                recorded_at__gte=now - timedelta(days=1)
+            ).order_by('recorded_at'),
+            'records_org_recorded_idx',
+        ),
+        (
+            'latest audit entries',
+            AuditLog.scoped.for_organization(organization_id).order_by('-changed_at')[:50],
+            'audit_org_changed_idx',
+        ),
+        (
+            'presence change feed',
+            AuditLog.scoped.for_organization(organization_id).filter(
+                table_name='presence_records', id__gt=0
+            ).order_by('id')[:500],
+            'audit_org_table_id_idx',
+        ),
+        (
+            # Roster semi-join, then the anti-join probe of each member's mark
+            'absentees of a session',
+            AbsenteeReportService(Organization(pk=organization_id)).absentees(
+                Session(pk=0, group_id=0, organization_id=organization_id)
+            ),
+            (
+                'group_memberships_group_id_participant_id_*',
+                'presence_records_session_id_participant_id_*',
+            ),
+        ),
+        (
+            'as-of replay of a session',
+            AuditLog.scoped.for_organization(organization_id)
+            .filter(session_id=1, id__gt=0).order_by('id'),
+            'audit_org_session_idx',
+        ),
+        (
+            'as-of replay of a participant',
+            AuditLog.scoped.for_organization(organization_id)
+            .filter(participant_id=1, id__gt=0).order_by('id'),
+            'audit_org_participant_idx',
+        ),
+        (
+            'unresolved sync conflicts',
+            SyncConflict.scoped.for_organization(organization_id).filter(resolved_at__isnull=True),
+            'conflicts_org_resolved_idx',
+        ),
+        (
+            'unread notifications of a user',
+            Notification.scoped.for_organization(organization_id).filter(
+                user_id=1, is_read=False
+            ).order_by('-created_at'),
+            'notifications_org_user_idx',
+        ),
+    ]
+
+
+def index_matches(expected, used):
+    """Whether an expected index name (``prefix*`` for generated names) is among ``used``."""
+    if expected.endswith('*'):
+        return any(name.startswith(expected[:-1]) for name in used)
+    return expected in used
+
+
+def used_indexes(queryset):
+    """Names of the indexes the planner chose for a queryset."""
+    connection = connections[queryset.db]
+    if connection.vendor == 'mysql':
+        plan = json.loads(queryset.explain(format='json'))
+        found = set()
+        stack = [plan]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if isinstance(node.get('key'), str):
+                    found.add(node['key'])
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                stack.extend(node)
+        return found
+
+    plan = queryset.explain()
+    found = set()
+    for pattern in TEXT_PLAN_PATTERNS:
+        found.update(pattern.findall(plan))
+    return found
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN hot tenant queries and fail if they miss their composite index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, help='Organization id to plan for')
+
+    def handle(self, *args, **options):
+        organization_id = options['organization']
+        if organization_id is None:
+            organization_id = Organization.objects.values_list('id', flat=True).first() or 1
+
+        failures = []
+        for description, queryset, index_names in expected_plans(organization_id):
+            if isinstance(index_names, str):
+                index_names = (index_names,)
+            indexes = used_indexes(queryset)
+            missing = [name for name in index_names if not index_matches(name, indexes)]
+            if not missing:
+                self.stdout.write(f"ok    {description}: {', '.join(index_names)}")
+            else:
+                chosen = ', '.join(sorted(indexes)) or 'no index'
+                self.stdout.write(
+                    f"FAIL  {description}: expected {', '.join(missing)}, got {chosen}"
+                )
+                failures.append(description)
+
+        if failures:
+            raise CommandError(f"{len(failures)} queries do not use their composite index")
+        self.stdout.write(self.style.SUCCESS('All query plans use their composite indexes'))
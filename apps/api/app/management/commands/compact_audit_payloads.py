@@ -0,0 +1,70 @@
+"""
+Rewrite legacy audit payloads into the compact storage format.
+
+Walks ``audit_logs`` on every database (default and shards) in id order and
+re-encodes rows still holding plain JSON, a chunk per transaction. Safe to
+run while the API is serving traffic and to interrupt: re-runs skip compact
+rows, and ``--after-id`` resumes where a previous run stopped. Run it after
+``snapshot_audit --backfill-keys`` and before the first ``verify_audit_chain``
+to also drop the keys that legacy create entries repeat.
+
+InnoDB only returns freed pages after ``OPTIMIZE TABLE audit_logs``.
+
+Usage:
+    python manage.py compact_audit_payloads [--database <alias>] [--chunk-size 1000] [--sleep 0.05]
+                                            [--after-id 0]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from app.core.sharding import shard_aliases
+from app.services.audit_compaction_service import AuditPayloadCompactor, table_size
+
+
+def _size(value):
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(value) < 1024:
+            return f'{value:.0f} {unit}' if unit == 'B' else f'{value:.1f} {unit}'
+        value /= 1024
+    return f'{value:.1f} GiB'
+
+
+class Command(BaseCommand):
+    help = 'Re-encode legacy audit payloads compactly'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help='Only this database alias')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per transaction')
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to pause between chunks')
+        parser.add_argument('--after-id', type=int, default=0,
+                            help='Resume after this audit log id')
+
+    def handle(self, *args, **options):
+        aliases = shard_aliases()
+        if options['database']:
+            if options['database'] not in aliases:
+                raise CommandError(f"Unknown database {options['database']}")
+            aliases = [options['database']]
+
+        for alias in aliases:
+            before = table_size(alias)
+            result = AuditPayloadCompactor(
+                alias,
+                chunk_size=options['chunk_size'],
+                sleep=options['sleep'],
+                log=self.stdout.write,
+            ).run(after_id=options['after_id'])
+            after = table_size(alias)
+
+            saved = result.bytes_before - result.bytes_after
+            self.stdout.write(self.style.SUCCESS(
+                f"{alias}: {result.rewritten} of {result.rows} rows rewritten, payloads "
+                f"{_size(result.bytes_before)} -> {_size(result.bytes_after)} "
+                f"({_size(saved)} saved), "
+                f"last id {result.last_id}"
+            ))
+            if before and after:
+                self.stdout.write(
+                    f"{alias}: table data {_size(before[0])} -> {_size(after[0])}, "
+                    f"indexes {_size(before[1])} -> {_size(after[1])}"
+                )
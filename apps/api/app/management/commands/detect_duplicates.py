@@ -0,0 +1,47 @@
+"""
+Flag participants that are probably registered twice.
+
+Compares participants changed since the previous run of each organization and
+sends ``data_quality`` notifications to its administrators. Meant to run from
+cron, e.g. nightly.
+
+Usage:
+    python manage.py detect_duplicates [--organization <id>] [--full] [--workers 4]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import Organization
+from app.services.duplicate_service import DuplicateDetectionService
+
+
+class Command(BaseCommand):
+    help = 'Detect likely duplicate participants and notify administrators'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, help='Only this organization')
+        parser.add_argument('--full', action='store_true',
+                            help='Compare every participant, not only those changed since the '
+                                 'last run')
+        parser.add_argument('--workers', type=int, help='Scoring processes (default: one per CPU)')
+        parser.add_argument('--threshold', type=float,
+                            help='Minimum similarity '
+                                 f'(default {DuplicateDetectionService.DEFAULT_THRESHOLD})')
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.order_by('id')
+        if options['organization']:
+            organizations = organizations.filter(pk=options['organization'])
+            if not organizations.exists():
+                raise CommandError(f"Organization {options['organization']} does not exist")
+
+        for organization in organizations:
+            service = DuplicateDetectionService(
+                organization,
+                workers=options['workers'],
+                threshold=options['threshold'],
+                log=lambda message, name=organization.name: self.stdout.write(f'{name}: {message}'),
+            )
+            result = service.run(full=options['full'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{organization.name}: {result.pairs} likely duplicate pairs, {result.notified} new"
+            ))
@@ -0,0 +1,340 @@
+"""
+Concurrent load test of a seeded organization.
+
+Replays bursts against the WSGI application in this process, from a pool of
+threads or forked worker processes (``--mode process``, one database
+connection and one scan buffer per process), so contention on
+``presence_records`` unique keys, ``audit_logs`` inserts and session lookups
+shows up the way it does in production. Actors start together:
+
+- roll-call: teachers check in the whole roster of an in-progress session in
+  device-sized batches (``--teachers``, default 50 at once, like 8:00)
+- reconnect storm: devices download a session pack and page through the change
+  feed from the beginning (``--devices``, e.g. 200 after an outage)
+- reports: managers open monthly attendance reports at the same time
+  (``--managers``); identical concurrent reports are computed once
+
+Reports throughput, p50/p95/p99 latency and the share of rejected (429/503),
+failed and deadlocked operations per operation type. Data is written to the
+database; use a scratch database with data from ``seed_data``.
+
+Usage:
+    python manage.py load_test <organization_id> --teachers 50 --devices 200 --managers 5
+"""
+import json
+import multiprocessing
+import random
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from app.models import Organization, Participant, PresenceRecord
+from app.services.checkin_service import CheckinService, scan_log
+from app.services.seed_service import load_dataset
+
+# MySQL: deadlock found, lock wait timeout exceeded
+DEADLOCK_ERROR_CODES = (1213, 1205)
+DEADLOCK_MARKERS = ('deadlock', 'lock wait timeout', 'database is locked')
+
+
+def classify_error(exc):
+    if isinstance(exc, DatabaseError):
+        code = exc.args[0] if exc.args else None
+        if code in DEADLOCK_ERROR_CODES or any(
+            marker in str(exc).lower() for marker in DEADLOCK_MARKERS
+        ):
+            return 'deadlock'
+    return 'error'
+
+
+class Recorder:
+    """(operation, seconds, outcome) samples of one actor."""
+
+    def __init__(self):
+        self.samples = []
+
+    def call(self, operation, func):
+        started = time.perf_counter()
+        try:
+            response = func()
+        except Exception as exc:
+            self.samples.append((operation, time.perf_counter() - started, classify_error(exc)))
+            return None
+        elapsed = time.perf_counter() - started
+        status_code = getattr(response, 'status_code', 200)
+        if status_code in (429, 503):
+            outcome = 'rejected'
+        elif status_code >= 400:
+            outcome = 'error'
+        else:
+            outcome = 'ok'
+        self.samples.append((operation, elapsed, outcome))
+        return response if outcome == 'ok' else None
+
+
+def _wait(start_at):
+    delay = start_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def roll_call(user_id, session_id, identifiers, batch, think, start_at):
+    recorder = Recorder()
+    client = Client()
+    client.force_login(get_user_model().objects.get(pk=user_id))
+    _wait(start_at)
+    for offset in range(0, len(identifiers), batch):
+        recorder.call('checkin', lambda: client.post(
+            reverse('presence-checkin'),
+            {'session_id': session_id, 'identifiers': identifiers[offset:offset + batch]},
+            content_type='application/json',
+        ))
+        time.sleep(think)
+    recorder.call('checkin-flush', scan_log.flush)
+    return recorder.samples
+
+
+def reconnect(user_id, session_id, page_size, max_pages, start_at):
+    recorder = Recorder()
+    client = Client()
+    client.force_login(get_user_model().objects.get(pk=user_id))
+    _wait(start_at)
+    recorder.call('pack', lambda: client.get(reverse('session-pack', args=[session_id])))
+    cursor = 0
+    for _ in range(max_pages):
+        response = recorder.call('changes', lambda: client.get(
+            reverse('presence-changes'), {'cursor': cursor, 'limit': page_size},
+        ))
+        if response is None:
+            break
+        feed = response.json()['data']
+        cursor = feed['next_cursor']
+        if not feed['has_more']:
+            break
+    return recorder.samples
+
+
+def report(user_id, group_ids, count, date_from, date_to, start_at):
+    recorder = Recorder()
+    client = Client()
+    client.force_login(get_user_model().objects.get(pk=user_id))
+    _wait(start_at)
+    for group_id in group_ids[:count]:
+        recorder.call('report', lambda: client.get(
+            reverse('reports-attendance'),
+            {'group_id': group_id, 'date_from': date_from, 'date_to': date_to},
+        ))
+    return recorder.samples
+
+
+ACTORS = {
+    'roll_call': roll_call,
+    'reconnect': reconnect,
+    'report': report,
+}
+
+
+def run_actor(name, args):
+    """Pool entry point: run one actor and release its database connections."""
+    try:
+        return ACTORS[name](*args)
+    finally:
+        connections.close_all()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+def summarize(samples, wall_seconds):
+    by_operation = defaultdict(list)
+    for operation, elapsed, outcome in samples:
+        by_operation[operation].append((elapsed, outcome))
+
+    summary = {}
+    for operation, entries in sorted(by_operation.items()):
+        latencies = sorted(elapsed for elapsed, outcome in entries if outcome == 'ok')
+        outcomes = defaultdict(int)
+        for _, outcome in entries:
+            outcomes[outcome] += 1
+        total = len(entries)
+        summary[operation] = {
+            'count': total,
+            'throughput_per_second': outcomes['ok'] / wall_seconds if wall_seconds else 0.0,
+            'latency_ms': {
+                'p50': percentile(latencies, 0.50) * 1000,
+                'p95': percentile(latencies, 0.95) * 1000,
+                'p99': percentile(latencies, 0.99) * 1000,
+                'mean': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            },
+            'rejected_rate': outcomes['rejected'] / total,
+            'error_rate': outcomes['error'] / total,
+            'deadlock_rate': outcomes['deadlock'] / total,
+        }
+    return summary
+
+
+class Command(BaseCommand):
+    help = 'Replay concurrent roll-call, reconnect and report bursts and report latency and errors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('organization', type=int, help='Seeded organization to load')
+        parser.add_argument('--teachers', type=int, default=50, help='Concurrent roll calls')
+        parser.add_argument('--devices', type=int, default=0, help='Devices reconnecting at once')
+        parser.add_argument('--managers', type=int, default=0, help='Managers running reports')
+        parser.add_argument('--reports', type=int, default=5, help='Reports per manager')
+        parser.add_argument('--batch', type=int, default=25,
+                            help='Identifiers per check-in request')
+        parser.add_argument('--think-ms', type=int, default=0,
+                            help='Pause between check-in requests')
+        parser.add_argument('--page-size', type=int, default=500, help='Change feed page size')
+        parser.add_argument('--max-pages', type=int, default=20,
+                            help='Change feed pages per device')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--workers', type=int, help='Pool size (default: one per actor)')
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete existing marks of the roll-call sessions first')
+        parser.add_argument('--no-rate-limit', action='store_true', help='Disable rate limiting')
+        parser.add_argument('--output', help='Write the summary as JSON to this file')
+        parser.add_argument('--force', action='store_true', help='Allow running with DEBUG off')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusing to write load-test data with DEBUG off; pass --force')
+
+        organization = Organization.objects.filter(pk=options['organization']).first()
+        if organization is None:
+            raise CommandError(f"Organization {options['organization']} does not exist")
+        dataset = load_dataset(organization)
+        if options['teachers'] and not dataset.current_sessions:
+            raise CommandError('The organization has no session in progress; seed fresh data')
+
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if options['no_rate_limit']:
+            overrides['RATE_LIMITS'] = {}
+        with override_settings(**overrides):
+            actors = self._actors(dataset, options)
+            samples, wall_seconds = self._run(actors, options)
+
+        summary = summarize(samples, wall_seconds)
+        self._print(summary, wall_seconds, len(actors))
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump({
+                    'organization_id': organization.id,
+                    'actors': len(actors),
+                    'mode': options['mode'],
+                    'wall_seconds': wall_seconds,
+                    'operations': summary,
+                }, handle, indent=2)
+            self.stdout.write(f"Summary written to {options['output']}")
+
+    def _actors(self, dataset, options):
+        """(actor name, args) for every simulated client; all start at the same instant."""
+        organization = dataset.organization
+        teachers = self._users(organization, options['teachers'])
+        # Give the pool time to spin up before the burst
+        start_at = time.time() + 2 + (options['teachers'] + options['devices']) * 0.01
+
+        actors = []
+        sessions = dataset.current_sessions
+        for position, user_id in enumerate(teachers):
+            session = sessions[position % len(sessions)]
+            if options['reset']:
+                PresenceRecord.objects.filter(session_id=session.id).delete()
+            CheckinService.drop_index(session.id)
+            identifiers = list(
+                Participant.objects.filter(memberships__group_id=session.group_id)
+                .order_by('last_name', 'id').values_list('identifier', flat=True)
+            )
+            actors.append(('roll_call', (
+                user_id, session.id, identifiers, options['batch'],
+                options['think_ms'] / 1000, start_at,
+            )))
+
+        pack_sessions = sessions or dataset.sessions
+        for position in range(options['devices']):
+            session = pack_sessions[position % len(pack_sessions)]
+            actors.append(('reconnect', (
+                dataset.user.id, session.id, options['page_size'], options['max_pages'], start_at,
+            )))
+
+        group_ids = [group.id for group in dataset.groups]
+        date_to = timezone.localdate()
+        date_from = date_to - timedelta(days=30)
+        for _ in range(options['managers']):
+            actors.append(('report', (
+                dataset.user.id, random.sample(group_ids, len(group_ids)), options['reports'],
+                date_from.isoformat(), date_to.isoformat(), start_at,
+            )))
+        return actors
+
+    @staticmethod
+    def _users(organization, count):
+        """Ids of ``count`` frontline users of the organization, created as needed."""
+        User = get_user_model()
+        existing = list(
+            User.objects.filter(organization=organization, role='frontline', is_active=True)
+            .order_by('id').values_list('id', flat=True)[:count]
+        )
+        suffix = uuid.uuid4().hex[:8]
+        for number in range(count - len(existing)):
+            user = User(
+                username=f'load-{suffix}-{number}@seeded.invalid',
+                email=f'load-{suffix}-{number}@seeded.invalid',
+                role='frontline',
+                organization=organization,
+            )
+            user.set_unusable_password()
+            user.save()
+            existing.append(user.id)
+        return existing
+
+    def _run(self, actors, options):
+        workers = options['workers'] or max(1, len(actors))
+        if options['mode'] == 'process':
+            # Children must not share the parent's sockets
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+            )
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+
+        started = time.time()
+        with pool:
+            futures = [pool.submit(run_actor, name, args) for name, args in actors]
+            samples = [sample for future in futures for sample in future.result()]
+        # Wall time from the burst, not from pool start-up
+        burst_at = min((args[-1] for _, args in actors), default=started)
+        return samples, max(0.001, time.time() - max(started, burst_at))
+
+    def _print(self, summary, wall_seconds, actor_count):
+        self.stdout.write(f"{actor_count} actors, {wall_seconds:.2f}s")
+        self.stdout.write(
+            f"{'operation':<14}{'count':>7}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'rejected':>10}{'errors':>8}{'deadlock':>10}"
+        )
+        for operation, stats in summary.items():
+            latency = stats['latency_ms']
+            self.stdout.write(
+                f"{operation:<14}{stats['count']:>7}{stats['throughput_per_second']:>9.1f}"
+                f"{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+                f"{stats['rejected_rate']:>10.1%}{stats['error_rate']:>8.1%}"
+                f"{stats['deadlock_rate']:>10.1%}"
+            )
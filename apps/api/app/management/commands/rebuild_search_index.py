@@ -0,0 +1,39 @@
+"""
+Rebuild the participant search columns and name tokens.
+
+Needed once after adding search to an existing database, and after changing
+how text is folded. Writes go through in primary-key ordered chunks.
+
+Usage:
+    python manage.py rebuild_search_index [--organization <id>] [--chunk-size 1000]
+"""
+from django.core.management.base import BaseCommand
+
+from app.models import Participant, ParticipantSearchToken
+
+
+class Command(BaseCommand):
+    help = 'Recompute folded identifiers and name tokens used by participant search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, help='Only this organization')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Participants per chunk')
+
+    def handle(self, *args, **options):
+        queryset = Participant.objects.all()
+        if options['organization']:
+            queryset = queryset.for_organization(options['organization'])
+
+        rebuilt = 0
+        last_pk = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:options['chunk_size']])
+            if not chunk:
+                break
+            # bulk_update refolds the identifiers of every row it writes
+            Participant.objects.bulk_update(chunk, ['identifier_folded'])
+            ParticipantSearchToken.rebuild(chunk)
+            rebuilt += len(chunk)
+            last_pk = chunk[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search index for {rebuilt} participants'))
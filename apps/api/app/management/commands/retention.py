@@ -0,0 +1,112 @@
+"""
+Apply data retention and purge deleted organizations.
+
+Without --execute, prints what would be deleted. With it, first purges the
+data of organizations deleted more than RETENTION_DELETION_GRACE_DAYS ago,
+then deletes rows past each organization's retention windows. Deletes run in
+small primary-key ordered chunks; --sleep pauses between chunks and
+--max-minutes bounds the run, which then resumes where it stopped on the next
+one. Meant to run nightly from cron, after verify_audit_chain (audit rows are
+only deleted once sealed).
+
+Usage:
+    python manage.py retention [--execute] [--organization <id>] [--chunk-size 1000] [--sleep 0.05]
+                               [--max-minutes 60]
+    python manage.py retention --delete-organization <id>
+    python manage.py retention --cancel-deletion <id>
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.core.sharding import organization_context
+from app.models import Organization
+from app.services.retention_service import (
+    RetentionError, RetentionService, organizations_due_for_purge,
+)
+
+
+def _summary(counts):
+    return ', '.join(f'{rows} {table}' for table, rows in counts.items() if rows) or 'nothing'
+
+
+class Command(BaseCommand):
+    help = 'Delete data past its retention window and purge deleted organizations'
+
+    def add_arguments(self, parser):
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument('--dry-run', action='store_true',
+                          help='Only report what would be deleted (default)')
+        mode.add_argument('--execute', action='store_true', help='Delete')
+        mode.add_argument('--delete-organization', type=int, metavar='ID',
+                          help='Mark an organization deleted and deactivate its users')
+        mode.add_argument('--cancel-deletion', type=int, metavar='ID',
+                          help='Restore an organization whose data has not been purged yet')
+        parser.add_argument('--organization', type=int, help='Only this organization')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per DELETE')
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to pause between chunks')
+        parser.add_argument('--max-minutes', type=float,
+                            help='Stop after this long; the next run resumes')
+
+    def handle(self, *args, **options):
+        for option, method in (
+            ('delete_organization', 'request_deletion'), ('cancel_deletion', 'cancel_deletion'),
+        ):
+            if options[option]:
+                organization = self._organization(options[option])
+                try:
+                    getattr(RetentionService(organization), method)()
+                except RetentionError as exc:
+                    raise CommandError(str(exc))
+                done = method.replace('_', ' ')
+                self.stdout.write(self.style.SUCCESS(f"{organization.name}: {done} done"))
+                return
+
+        execute = options['execute']
+        deadline = None
+        if options['max_minutes']:
+            deadline = time.monotonic() + options['max_minutes'] * 60
+        due = organizations_due_for_purge()
+        active = Organization.objects.filter(deleted_at__isnull=True).order_by('id')
+        if options['organization']:
+            self._organization(options['organization'])
+            due = due.filter(pk=options['organization'])
+            active = active.filter(pk=options['organization'])
+
+        jobs = [(organization, 'purge') for organization in due]
+        jobs += [(organization, 'apply') for organization in active]
+        if not jobs:
+            self.stdout.write('Nothing to do')
+        for organization, job in jobs:
+            service = RetentionService(
+                organization,
+                chunk_size=options['chunk_size'],
+                sleep=options['sleep'],
+                deadline=deadline,
+                log=lambda message, name=organization.name: self.stdout.write(f'{name}: {message}'),
+            )
+            with organization_context(organization.id):
+                if not execute:
+                    counts = service.preview_purge() if job == 'purge' else service.preview()
+                    self.stdout.write(f"{organization.name}: would {job}: {_summary(counts)}")
+                    continue
+                try:
+                    result = getattr(service, job)()
+                except RetentionError as exc:
+                    self.stderr.write(f"{organization.name}: {exc}")
+                    continue
+            self.stdout.write(self.style.SUCCESS(
+                f"{organization.name}: {job} {'done' if result.finished else 'stopped'}, "
+                f"deleted {_summary(result.deleted)}"
+            ))
+            if not result.finished:
+                self.stdout.write('Time budget used; run again to resume')
+                return
+
+    @staticmethod
+    def _organization(organization_id):
+        try:
+            return Organization.objects.get(pk=organization_id)
+        except Organization.DoesNotExist:
+            raise CommandError(f"Organization {organization_id} does not exist")
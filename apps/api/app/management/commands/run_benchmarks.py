@@ -0,0 +1,284 @@
+"""
+End-to-end benchmarks of the recording, sync, report, export and analytics paths.
+
+Runs each case against a seeded organization (``--organization``, see
+``seed_data``) or a throwaway dataset of ``--size``, inside a transaction that
+is rolled back, and stores the results as JSON so runs can be compared:
+
+- recording: check in a whole in-progress roster through the API in device-sized
+  batches, including the write flush (target 3s)
+- sync: a reconnecting device downloads the session pack and pages through the
+  presence change feed from the beginning (target 30s)
+- report: attendance report of a group over all its sessions, computed and
+  then served from the report cache (target 10s)
+- export: stream every presence record of the organization as CSV
+- analytics: chronic absence, streaks and weekly trends over every seeded
+  session, uncached (target 10s; use ``--size institution`` for 1M records)
+
+Usage:
+    python manage.py run_benchmarks --organization 12 --repeat 3
+    python manage.py run_benchmarks --size xlarge --compare benchmark-results/previous.json
+"""
+import csv
+import io
+import json
+import os
+import platform
+import statistics
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from app.core.query_budget import QueryCapture
+from app.core.report_cache import report_cache
+from app.models import AuditLog, GroupMembership, Organization, Participant, PresenceRecord
+from app.services.analytics_service import AttendanceAnalyticsService
+from app.services.checkin_service import CheckinService, scan_log
+from app.services.seed_service import DATASET_SIZES, DatasetSeeder, load_dataset
+
+# Seconds each case must stay under (from the performance requirements)
+TARGET_SECONDS = {
+    'recording': 3.0,
+    'sync': 30.0,
+    'report': 10.0,
+    'export': None,
+    'analytics': 10.0,
+}
+
+RUN_SETTINGS = {
+    'ALLOWED_HOSTS': ['testserver'],
+    'RATE_LIMITS': {},
+}
+
+
+def _largest_current_session(dataset):
+    if not dataset.current_sessions:
+        raise CommandError('The organization has no session in progress; seed fresh data')
+    sizes = dict(
+        GroupMembership.objects.filter(
+            group_id__in=[session.group_id for session in dataset.current_sessions],
+        ).values_list('group_id').annotate(count=Count('id'))
+    )
+    return max(dataset.current_sessions, key=lambda session: sizes.get(session.group_id, 0))
+
+
+def bench_recording(client, dataset, options):
+    session = _largest_current_session(dataset)
+    identifiers = list(
+        Participant.objects.filter(memberships__group_id=session.group_id)
+        .order_by('last_name', 'id').values_list('identifier', flat=True)
+    )
+    CheckinService.drop_index(session.id)
+    step = options['batch']
+    for offset in range(0, len(identifiers), step):
+        response = client.post(
+            reverse('presence-checkin'),
+            {'session_id': session.id, 'identifiers': identifiers[offset:offset + step]},
+            content_type='application/json',
+        )
+        if response.status_code != 200:
+            raise CommandError(
+                f"check-in failed with {response.status_code}: {response.content[:200]}"
+            )
+    scan_log.flush()
+    return {'marks': len(identifiers), 'requests': -(-len(identifiers) // step)}
+
+
+def bench_sync(client, dataset, options):
+    session = _largest_current_session(dataset)
+    requests = 1
+    payload_bytes = len(client.get(reverse('session-pack', args=[session.id])).content)
+
+    cursor, changes, has_more = 0, 0, True
+    while has_more:
+        response = client.get(reverse('presence-changes'), {'cursor': cursor, 'limit': 1000})
+        requests += 1
+        payload_bytes += len(response.content)
+        feed = response.json()['data']
+        changes += len(feed['changes'])
+        cursor, has_more = feed['next_cursor'], feed['has_more']
+    return {'changes': changes, 'requests': requests, 'bytes': payload_bytes}
+
+
+def bench_report(client, dataset, options):
+    group = dataset.groups[0]
+    params = {
+        'group_id': group.id,
+        'date_from': timezone.localdate(
+            min(session.scheduled_start_at for session in dataset.sessions)
+        ).isoformat(),
+        'date_to': timezone.localdate().isoformat(),
+    }
+    # Time the computation, not a hit left by the previous run
+    report_cache.clear()
+    response = client.get(reverse('reports-attendance'), params)
+    if response.status_code != 200:
+        raise CommandError(f"report failed with {response.status_code}: {response.content[:200]}")
+    started = time.perf_counter()
+    client.get(reverse('reports-attendance'), params)
+    return {
+        'participants': len(response.json()['data']['by_participant']),
+        'cached_seconds': round(time.perf_counter() - started, 4),
+    }
+
+
+def bench_export(client, dataset, options):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    rows = 0
+    queryset = PresenceRecord.scoped.for_organization(dataset.organization).values_list(
+        'session_id', 'participant_id', 'presence_state__code', 'recorded_at', 'recorded_by_id',
+    ).order_by('id')
+    for row in queryset.iterator(chunk_size=2000):
+        writer.writerow(row)
+        rows += 1
+    return {'rows': rows, 'bytes': buffer.tell()}
+
+
+def bench_analytics(client, dataset, options):
+    service = AttendanceAnalyticsService(dataset.organization)
+    date_from = timezone.localdate(min(session.scheduled_start_at for session in dataset.sessions))
+    marks = service.load(date_from, timezone.localdate())
+    started = time.perf_counter()
+    chronic = service.chronic_absence(
+        marks, service.DEFAULT_CHRONIC_THRESHOLD, service.DEFAULT_MIN_SESSIONS,
+    )
+    streaks = service.streaks(marks, service.DEFAULT_MIN_STREAK)
+    trends = service.weekly_trends(marks)
+    return {
+        'marks': len(marks),
+        'compute_seconds': round(time.perf_counter() - started, 3),
+        'chronic': len(chronic),
+        'streaks': len(streaks),
+        'weeks': len(trends),
+    }
+
+
+CASES = {
+    'recording': bench_recording,
+    'sync': bench_sync,
+    'report': bench_report,
+    'export': bench_export,
+    'analytics': bench_analytics,
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark recording, sync, report, export and analytics and store the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, help='Seeded organization to benchmark')
+        parser.add_argument('--size', default='medium', choices=DATASET_SIZES,
+                            help='Throwaway dataset size when no organization is given')
+        parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per case (median reported)')
+        parser.add_argument('--batch', type=int, default=25,
+                            help='Identifiers per check-in request')
+        parser.add_argument('--output', help='Result file (default benchmark-results/<time>.json)')
+        parser.add_argument('--compare', help='Earlier result file to compare against')
+
+    def handle(self, *args, **options):
+        # Keep the background flusher away from the buffered scans: it writes through its
+        # own connection, outside the transaction that is rolled back
+        flush_interval, scan_log.flush_interval = scan_log.flush_interval, 24 * 3600
+        try:
+            with override_settings(**RUN_SETTINGS), transaction.atomic():
+                results = self._run(options)
+                transaction.set_rollback(True)
+        finally:
+            scan_log.flush_interval = flush_interval
+
+        output = options['output'] or os.path.join(
+            'benchmark-results', f"{timezone.now():%Y%m%d%H%M%S}.json"
+        )
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as handle:
+            json.dump(results, handle, indent=2, default=str)
+        self.stdout.write(f"Results written to {output}")
+
+        if options['compare']:
+            self._compare(results, options['compare'])
+
+        failed = [name for name, case in results['cases'].items() if case['passed'] is False]
+        if failed:
+            raise CommandError(f"Over target: {', '.join(failed)}")
+
+    def _run(self, options):
+        if options['organization']:
+            organization = Organization.objects.filter(pk=options['organization']).first()
+            if organization is None:
+                raise CommandError(f"Organization {options['organization']} does not exist")
+            dataset = load_dataset(organization)
+        else:
+            dataset = DatasetSeeder(seed=0).seed(options['size'])
+
+        client = Client()
+        client.force_login(dataset.user)
+        results = {
+            'created_at': timezone.now().isoformat(),
+            'environment': {
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'dataset': self._describe(dataset),
+            'cases': {},
+        }
+
+        for name in options['cases']:
+            durations, queries, metrics = [], 0, {}
+            for _ in range(max(1, options['repeat'])):
+                # Each run starts from the same data
+                with transaction.atomic(), QueryCapture() as capture:
+                    metrics = CASES[name](client, dataset, options)
+                    transaction.set_rollback(True)
+                durations.append(capture.duration)
+                queries = max(queries, capture.count)
+
+            median = statistics.median(durations)
+            target = TARGET_SECONDS.get(name)
+            results['cases'][name] = {
+                'seconds': {'median': median, 'min': min(durations), 'max': max(durations)},
+                'runs': len(durations),
+                'queries': queries,
+                'target_seconds': target,
+                'passed': None if target is None else median <= target,
+                **metrics,
+            }
+            verdict = '' if target is None else (' ok' if median <= target else f' OVER {target}s')
+            details = ', '.join(f"{key} {value}" for key, value in metrics.items())
+            self.stdout.write(
+                f"{name:<10} {median:8.3f}s  {queries:6d} queries  {details}{verdict}"
+            )
+        return results
+
+    @staticmethod
+    def _describe(dataset):
+        organization = dataset.organization
+        return {
+            'organization_id': organization.id,
+            'groups': len(dataset.groups),
+            'participants': Participant.scoped.for_organization(organization).count(),
+            'sessions': len(dataset.sessions),
+            'presence_records': PresenceRecord.scoped.for_organization(organization).count(),
+            'audit_logs': AuditLog.scoped.for_organization(organization).count(),
+        }
+
+    def _compare(self, results, path):
+        with open(path) as handle:
+            previous = json.load(handle)
+        self.stdout.write(f"Compared to {path} ({previous.get('created_at')}):")
+        for name, case in results['cases'].items():
+            before = previous.get('cases', {}).get(name)
+            if not before:
+                continue
+            old, new = before['seconds']['median'], case['seconds']['median']
+            change = (new - old) / old * 100 if old else 0.0
+            self.stdout.write(f"{name:<10} {old:8.3f}s -> {new:8.3f}s ({change:+.1f}%)")
@@ -0,0 +1,70 @@
+"""
+Generate synthetic organizations for benchmarks and load tests.
+
+Each organization gets an administrator, groups with their rosters, one
+session per group and day (the latest in progress now), presence records on
+past sessions and the matching audit trail, all written with bulk inserts.
+Data is committed; use a scratch database.
+
+Usage:
+    python manage.py seed_data --organizations 2 --size xlarge
+    python manage.py seed_data --groups 10 --participants-per-group 500 --sessions-per-group 20
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app.services.seed_service import DATASET_SIZES, DatasetSeeder
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic organizations, rosters, sessions and presence history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organizations', type=int, default=1, help='Organizations to create')
+        parser.add_argument('--size', default='medium', choices=DATASET_SIZES, help='Preset scale')
+        parser.add_argument('--groups', type=int, help='Groups per organization')
+        parser.add_argument('--participants-per-group', type=int, help='Roster size')
+        parser.add_argument('--sessions-per-group', type=int, help='Sessions (days) per group')
+        parser.add_argument('--marked-sessions', type=int,
+                            help='Past sessions per group with marks')
+        parser.add_argument('--changed-fraction', type=float, default=0.1,
+                            help='Share of corrected marks')
+        parser.add_argument('--domain-type', default='education', help='Organization domain type')
+        parser.add_argument('--seed', type=int, help='Random seed for reproducible data')
+        parser.add_argument('--force', action='store_true', help='Allow running with DEBUG off')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusing to write synthetic data with DEBUG off; pass --force')
+
+        scale = [
+            value if override is None else override
+            for value, override in zip(DATASET_SIZES[options['size']], (
+                options['groups'],
+                options['participants_per_group'],
+                options['sessions_per_group'],
+                options['marked_sessions'],
+            ))
+        ]
+        if scale[2] < 1:
+            raise CommandError('--sessions-per-group must be at least 1')
+
+        seeder = DatasetSeeder(seed=options['seed'])
+        for _ in range(options['organizations']):
+            started = time.perf_counter()
+            with transaction.atomic():
+                dataset = seeder.seed(
+                    tuple(scale),
+                    domain_type=options['domain_type'],
+                    changed_fraction=options['changed_fraction'],
+                )
+            self.stdout.write(
+                f"organization {dataset.organization.id}: "
+                f"{scale[0]} groups x {scale[1]} participants, "
+                f"{len(dataset.sessions)} sessions in {time.perf_counter() - started:.1f}s; "
+                f"login {dataset.user.email} / {dataset.password}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Seeded {options['organizations']} organizations"))
@@ -0,0 +1,45 @@
+"""
+Store as-of snapshots of presence history.
+
+Replays the audit trail of every session and participant with at least
+``AUDIT_SNAPSHOT_INTERVAL`` rows since its previous snapshot and stores the
+result, so as-of queries never replay more than that. Meant to run from cron,
+e.g. nightly.
+
+Usage:
+    python manage.py snapshot_audit [--organization <id>] [--min-rows 500] [--backfill-keys]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import Organization
+from app.services.audit_service import AuditReplayService
+
+
+class Command(BaseCommand):
+    help = 'Snapshot presence history for fast as-of queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, help='Only this organization')
+        parser.add_argument('--min-rows', type=int,
+                            help='New audit rows a scope needs for a snapshot '
+                                 '(default AUDIT_SNAPSHOT_INTERVAL)')
+        parser.add_argument('--backfill-keys', action='store_true',
+                            help='First key presence audit rows written before '
+                                 'session_id/participant_id existed')
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.order_by('id')
+        if options['organization']:
+            organizations = organizations.filter(pk=options['organization'])
+            if not organizations.exists():
+                raise CommandError(f"Organization {options['organization']} does not exist")
+
+        for organization in organizations:
+            service = AuditReplayService(
+                organization,
+                log=lambda message, name=organization.name: self.stdout.write(f'{name}: {message}'),
+            )
+            if options['backfill_keys']:
+                service.backfill_keys()
+            stored = service.take_snapshots(min_rows=options['min_rows'])
+            self.stdout.write(self.style.SUCCESS(f"{organization.name}: {stored} snapshots stored"))
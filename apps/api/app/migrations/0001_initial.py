@@ -0,0 +1,405 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:36
+
+import app.models.fields
+import django.contrib.auth.models
+import django.contrib.auth.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Organization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('slug', models.SlugField(unique=True)),
+                ('domain', models.CharField(max_length=255, unique=True)),
+                ('domain_type', models.CharField(choices=[('education', 'Education'), ('hospitality', 'Hospitality'), ('events', 'Events'), ('corporate', 'Corporate')], default='education', help_text='Type of domain for terminology and configuration', max_length=50)),
+                ('settings', models.JSONField(blank=True, default=dict, help_text='Domain-specific settings and terminology mappings')),
+                ('shard', models.CharField(default='default', help_text="Database alias holding this organization's tenant data", max_length=100)),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='When deletion was requested; data is purged after RETENTION_DELETION_GRACE_DAYS', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'organizations',
+            },
+        ),
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('username', models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.', max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='username')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('role', models.CharField(choices=[('frontline', 'Frontline User'), ('administrator', 'Administrator'), ('manager', 'Manager / Viewer'), ('external', 'External Participant')], default='frontline', max_length=50)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_login_at', models.DateTimeField(blank=True, null=True)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+                ('organization', models.ForeignKey(blank=True, help_text='Organization the user belongs to (empty for platform staff)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='users', to='app.organization')),
+            ],
+            options={
+                'verbose_name_plural': 'Users',
+                'db_table': 'users',
+            },
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Group',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=255)),
+                ('group_type', models.CharField(choices=[('class', 'Class'), ('room', 'Room'), ('session_type', 'Session Type'), ('department', 'Department'), ('team', 'Team'), ('other', 'Other')], default='class', help_text='Type of group', max_length=50)),
+                ('extra_data', models.JSONField(blank=True, default=dict, help_text='Domain-specific configuration')),
+                ('is_active', models.BooleanField(default=True)),
+                ('parent', models.ForeignKey(blank=True, help_text='Optional parent group for hierarchy', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='app.group')),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='app.organization')),
+            ],
+            options={
+                'db_table': 'groups',
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('session', 'Session'), ('participant', 'Participant')], help_text='Whether scope_id is a session or a participant', max_length=20)),
+                ('scope_id', models.BigIntegerField(help_text='Session or participant the state belongs to')),
+                ('audit_id', models.BigIntegerField(help_text='Last audit log row included in the state')),
+                ('taken_at', models.DateTimeField(help_text='Latest changed_at of the included rows; the state is valid from then on')),
+                ('state', models.JSONField(default=dict, help_text='Current mark per participant (session scope) or session (participant scope)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the snapshot was stored')),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='audit_snapshots', to='app.organization')),
+            ],
+            options={
+                'verbose_name_plural': 'Audit Snapshots',
+                'db_table': 'audit_snapshots',
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(help_text='Table that was changed', max_length=100)),
+                ('record_id', models.BigIntegerField(help_text='ID of the affected record')),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], help_text='Type of action performed', max_length=20)),
+                ('old_values', app.models.fields.CompactJSONField(blank=True, codes={'email': 'e', 'first_name': 'f', 'identifier': 'i', 'is_active': 'a', 'last_name': 'l', 'name': 'n', 'participant_id': 'P', 'presence_state': 's', 'role': 'r', 'session_id': 'S'}, editable=True, help_text='Previous values (for updates)', null=True)),
+                ('new_values', app.models.fields.CompactJSONField(blank=True, codes={'email': 'e', 'first_name': 'f', 'identifier': 'i', 'is_active': 'a', 'last_name': 'l', 'name': 'n', 'participant_id': 'P', 'presence_state': 's', 'role': 'r', 'session_id': 'S'}, editable=True, help_text='New values', null=True)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When change occurred')),
+                ('source_device', models.CharField(blank=True, help_text='Device identifier', max_length=100, null=True)),
+                ('session_id', models.BigIntegerField(blank=True, help_text='Session of a presence change', null=True)),
+                ('participant_id', models.BigIntegerField(blank=True, help_text='Participant of a presence change', null=True)),
+                ('row_hash', models.CharField(blank=True, default='', editable=False, help_text='Keyed hash of the row, chained per organization by AuditCheckpoint', max_length=64)),
+                ('changed_by', models.ForeignKey(db_constraint=False, help_text='User who made the change', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_logs', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='audit_logs', to='app.organization')),
+            ],
+            options={
+                'verbose_name_plural': 'Audit Logs',
+                'db_table': 'audit_logs',
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_audit_id', models.BigIntegerField(help_text='First audit log row of the segment')),
+                ('last_audit_id', models.BigIntegerField(help_text='Last audit log row of the segment')),
+                ('row_count', models.IntegerField(help_text='Rows in the segment')),
+                ('prev_hash', models.CharField(help_text='chain_hash of the previous checkpoint (empty for the first)', max_length=64)),
+                ('chain_hash', models.CharField(help_text='Hash of prev_hash and the segment row hashes', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the segment was sealed')),
+                ('verified_at', models.DateTimeField(blank=True, help_text='Last successful verification', null=True)),
+                ('pruned_at', models.DateTimeField(blank=True, help_text='When the segment rows were deleted by retention', null=True)),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='audit_checkpoints', to='app.organization')),
+            ],
+            options={
+                'verbose_name_plural': 'Audit Checkpoints',
+                'db_table': 'audit_checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='Participant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('external_id', models.CharField(blank=True, help_text='External system reference (optional)', max_length=100, null=True)),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('identifier', models.CharField(help_text='Student ID, badge number, etc.', max_length=100)),
+                ('identifier_folded', models.CharField(blank=True, default='', editable=False, help_text='Case- and accent-folded identifier for prefix search', max_length=100)),
+                ('date_of_birth', models.DateField(blank=True, null=True)),
+                ('extra_data', models.JSONField(blank=True, default=dict, help_text='Domain-specific additional data')),
+                ('is_active', models.BooleanField(default=True)),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='app.organization')),
+            ],
+            options={
+                'db_table': 'participants',
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('extra_data', models.JSONField(blank=True, default=dict, help_text='Role or section within group')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='app.group')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='app.participant')),
+            ],
+            options={
+                'db_table': 'group_memberships',
+            },
+        ),
+        migrations.CreateModel(
+            name='ParticipantSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('f', 'First name'), ('l', 'Last name')], max_length=1)),
+                ('token', models.CharField(max_length=100)),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.organization')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='app.participant')),
+            ],
+            options={
+                'db_table': 'participant_search_tokens',
+            },
+        ),
+        migrations.CreateModel(
+            name='PresenceState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('domain', models.CharField(choices=[('education', 'Education'), ('hospitality', 'Hospitality'), ('events', 'Events'), ('corporate', 'Corporate')], help_text='Domain this state applies to', max_length=50)),
+                ('code', models.CharField(help_text='State code (e.g., "present", "absent", "late")', max_length=50)),
+                ('label', models.CharField(help_text='Display label for this state', max_length=100)),
+                ('color', models.CharField(default='#00ff00', help_text='Hex color for UI display', max_length=7)),
+                ('sort_order', models.IntegerField(default=0, help_text='Display order')),
+                ('is_default', models.BooleanField(default=False, help_text='Whether this is a default state')),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='app.organization')),
+            ],
+            options={
+                'db_table': 'presence_states',
+            },
+        ),
+        migrations.CreateModel(
+            name='Session',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=255)),
+                ('scheduled_start_at', models.DateTimeField(help_text='Scheduled start time')),
+                ('scheduled_end_at', models.DateTimeField(help_text='Scheduled end time')),
+                ('actual_start_at', models.DateTimeField(blank=True, help_text='Actual start time (when session began)', null=True)),
+                ('actual_end_at', models.DateTimeField(blank=True, help_text='Actual end time (when session ended)', null=True)),
+                ('location', models.CharField(blank=True, help_text='Physical or virtual location', max_length=255, null=True)),
+                ('extra_data', models.JSONField(blank=True, default=dict, help_text='Domain-specific session data')),
+                ('long_end_at', models.DateTimeField(blank=True, editable=False, help_text='Scheduled end of sessions longer than SESSION_LOOKUP_MAX_DURATION_HOURS (set on save)', null=True)),
+                ('group', models.ForeignKey(help_text='Group associated with this session', on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='app.group')),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='app.organization')),
+            ],
+            options={
+                'db_table': 'sessions',
+            },
+        ),
+        migrations.CreateModel(
+            name='PresenceRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True, help_text='When presence was recorded')),
+                ('source_device_id', models.CharField(blank=True, help_text='Device identifier for sync conflicts', max_length=100, null=True)),
+                ('extra_data', models.JSONField(blank=True, default=dict, help_text='Additional notes or metadata')),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='app.organization')),
+                ('participant', models.ForeignKey(help_text='Participant whose presence is recorded', on_delete=django.db.models.deletion.CASCADE, related_name='presence_records', to='app.participant')),
+                ('recorded_by', models.ForeignKey(blank=True, db_constraint=False, help_text='User who recorded this presence', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recorded_presence', to=settings.AUTH_USER_MODEL)),
+                ('presence_state', models.ForeignKey(help_text='Presence state (present, absent, etc.)', on_delete=django.db.models.deletion.PROTECT, to='app.presencestate')),
+                ('session', models.ForeignKey(help_text='Session for this presence record', on_delete=django.db.models.deletion.CASCADE, related_name='presence_records', to='app.session')),
+            ],
+            options={
+                'db_table': 'presence_records',
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncConflict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version_a_data', models.JSONField(help_text='First version with metadata')),
+                ('version_b_data', models.JSONField(help_text='Second version with metadata')),
+                ('resolved_with_id', models.BigIntegerField(blank=True, help_text='ID of chosen resolution', null=True)),
+                ('resolved_at', models.DateTimeField(blank=True, help_text='Resolution timestamp', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When conflict was detected')),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sync_conflicts', to='app.organization')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_conflicts', to='app.participant')),
+                ('resolved_by', models.ForeignKey(db_constraint=False, help_text='User who resolved the conflict', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resolved_conflicts', to=settings.AUTH_USER_MODEL)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_conflicts', to='app.session')),
+            ],
+            options={
+                'verbose_name_plural': 'Sync Conflicts',
+                'db_table': 'sync_conflicts',
+            },
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('absence', 'Absence'), ('conflict', 'Conflict'), ('data_quality', 'Data Quality'), ('system', 'System'), ('info', 'Information')], default='info', help_text='Type of notification', max_length=50)),
+                ('title', models.CharField(help_text='Notification title', max_length=255)),
+                ('message', models.TextField(help_text='Notification message')),
+                ('link', models.CharField(blank=True, help_text='Optional link to related resource', max_length=500, null=True)),
+                ('is_read', models.BooleanField(default=False, help_text='Read status')),
+                ('read_at', models.DateTimeField(blank=True, help_text='When marked as read', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When notification was created')),
+                ('user', models.ForeignKey(db_constraint=False, help_text='Notification recipient', on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='app.organization')),
+            ],
+            options={
+                'verbose_name_plural': 'Notifications',
+                'db_table': 'notifications',
+                'indexes': [models.Index(fields=['organization', 'user', 'is_read', '-created_at'], name='notifications_org_user_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['organization', 'is_active'], name='groups_org_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['organization', 'group_type'], name='groups_org_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['parent_id'], name='groups_parent__919242_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='auditsnapshot',
+            unique_together={('organization', 'scope', 'scope_id', 'audit_id')},
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['table_name', 'record_id'], name='audit_logs_table_n_c2f649_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['changed_by'], name='audit_logs_changed_310180_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['organization', '-changed_at'], name='audit_org_changed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['organization', 'table_name', 'id'], name='audit_org_table_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['organization', 'session_id', 'id'], name='audit_org_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['organization', 'participant_id', 'id'], name='audit_org_participant_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='auditcheckpoint',
+            unique_together={('organization', 'last_audit_id')},
+        ),
+        migrations.AddIndex(
+            model_name='participant',
+            index=models.Index(fields=['organization', 'is_active'], name='participants_org_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participant',
+            index=models.Index(fields=['organization', 'identifier_folded'], name='participants_org_ident_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='participant',
+            unique_together={('organization', 'identifier')},
+        ),
+        migrations.AddIndex(
+            model_name='groupmembership',
+            index=models.Index(fields=['group'], name='group_membe_group_i_227045_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupmembership',
+            index=models.Index(fields=['participant'], name='group_membe_partici_95b3d1_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='groupmembership',
+            unique_together={('group', 'participant')},
+        ),
+        migrations.AddIndex(
+            model_name='participantsearchtoken',
+            index=models.Index(fields=['organization', 'token'], name='search_tokens_org_token_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='presencestate',
+            unique_together={('organization', 'domain', 'code')},
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['group'], name='sessions_group_i_1bcb0e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['organization', 'scheduled_start_at', 'scheduled_end_at'], name='sessions_org_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['organization', 'long_end_at'], name='sessions_org_long_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presencerecord',
+            index=models.Index(fields=['session'], name='presence_re_session_52d3be_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presencerecord',
+            index=models.Index(fields=['participant'], name='presence_re_partici_5d8748_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presencerecord',
+            index=models.Index(fields=['organization', 'recorded_at'], name='records_org_recorded_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='presencerecord',
+            unique_together={('session', 'participant')},
+        ),
+        migrations.AddIndex(
+            model_name='syncconflict',
+            index=models.Index(fields=['session'], name='sync_confli_session_4e49be_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='syncconflict',
+            index=models.Index(fields=['participant'], name='sync_confli_partici_948daf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='syncconflict',
+            index=models.Index(fields=['resolved_with_id'], name='sync_confli_resolve_e54882_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='syncconflict',
+            index=models.Index(fields=['organization', 'resolved_at'], name='conflicts_org_resolved_idx'),
+        ),
+    ]
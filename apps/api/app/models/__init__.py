@@ -1,22 +1,34 @@
-from .base import TimeStampedModel, User
+from .base import (
+    OrganizationScopedManager,
+    OrganizationScopedQuerySet,
+    OrganizationScopeError,
+    TimeStampedModel,
+    User,
+)
 from .organization import Organization
-from .participant import Participant
+from .participant import Participant, ParticipantSearchToken
 from .group import Group, GroupMembership
 from .session import Session
 from .presence import PresenceState, PresenceRecord
-from .audit import AuditLog, SyncConflict, Notification
+from .audit import AuditCheckpoint, AuditLog, AuditSnapshot, SyncConflict, Notification
 
 __all__ = [
+    'OrganizationScopedManager',
+    'OrganizationScopedQuerySet',
+    'OrganizationScopeError',
     'TimeStampedModel',
     'User',
     'Organization',
     'Participant',
+    'ParticipantSearchToken',
     'Group',
     'GroupMembership',
     'Session',
     'PresenceState',
     'PresenceRecord',
     'AuditLog',
+    'AuditCheckpoint',
+    'AuditSnapshot',
     'SyncConflict',
     'Notification',
 ]
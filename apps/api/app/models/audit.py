@@ -1,5 +1,62 @@
+import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+from .base import OrganizationScopedManager, OrganizationScopedQuerySet
+from .fields import CompactJSONField
+
+# Columns covered by AuditLog.row_hash (the id is assigned by the database, after hashing)
+HASH_FIELDS = (
+    'organization_id', 'table_name', 'record_id', 'action', 'changed_by_id', 'old_values',
+    'new_values', 'changed_at', 'source_device', 'session_id', 'participant_id',
+)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Stored codes of common old_values/new_values keys (append only: codes are in stored rows)
+AUDIT_VALUE_CODES = {
+    'presence_state': 's',
+    'session_id': 'S',
+    'participant_id': 'P',
+    'first_name': 'f',
+    'last_name': 'l',
+    'identifier': 'i',
+    'is_active': 'a',
+    'name': 'n',
+    'role': 'r',
+    'email': 'e',
+}
+
+
+def audit_row_hash(values):
+    """
+    Keyed hash of an audit row's content, from a dict of ``HASH_FIELDS``.
+
+    HMAC with ``AUDIT_HASH_KEY``, so rewriting a row together with its hash
+    needs the key as well as database access.
+    """
+    payload = [values[field] for field in HASH_FIELDS]
+    # Microseconds since the epoch: the same before and after a database round trip
+    changed_at = values['changed_at']
+    payload[HASH_FIELDS.index('changed_at')] = (changed_at - EPOCH) // timedelta(microseconds=1)
+    message = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+    key = getattr(settings, 'AUDIT_HASH_KEY', None) or settings.SECRET_KEY
+    return hmac.new(key.encode(), message, hashlib.sha256).hexdigest()
+
+
+class AuditLogQuerySet(OrganizationScopedQuerySet):
+    """Hashes rows on bulk inserts, like ``AuditLog.save()`` does."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.seal()
+        return super().bulk_create(objs, *args, **kwargs)
 
 
 class AuditLog(models.Model):
@@ -14,6 +71,8 @@ class AuditLog(models.Model):
     organization = models.ForeignKey(
         'Organization',
         on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,  # Covered by the (organization, ...) composite indexes
         related_name='audit_logs'
     )
     table_name = models.CharField(
@@ -32,21 +91,26 @@ class AuditLog(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
         null=True,
+        db_constraint=False,
         related_name='audit_logs',
         help_text='User who made the change'
     )
-    old_values = models.JSONField(
+    # Changed fields only, stored compactly (see CompactJSONField)
+    old_values = CompactJSONField(
+        codes=AUDIT_VALUE_CODES,
         null=True,
         blank=True,
         help_text='Previous values (for updates)'
     )
-    new_values = models.JSONField(
+    new_values = CompactJSONField(
+        codes=AUDIT_VALUE_CODES,
         null=True,
         blank=True,
         help_text='New values'
     )
+    # Set before insert (not auto_now_add) so the row hash can cover it
     changed_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         help_text='When change occurred'
     )
     source_device = models.CharField(
@@ -55,15 +119,45 @@ class AuditLog(models.Model):
         blank=True,
         help_text='Device identifier'
     )
+    # Keys of presence changes, copied onto every row (updates included) and kept after
+    # the session or participant is deleted, so histories replay without record lookups
+    session_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text='Session of a presence change'
+    )
+    participant_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text='Participant of a presence change'
+    )
+    row_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        editable=False,
+        help_text='Keyed hash of the row, chained per organization by AuditCheckpoint'
+    )
+
+    objects = AuditLogQuerySet.as_manager()
+    scoped = OrganizationScopedManager.from_queryset(AuditLogQuerySet)()
 
     class Meta:
         db_table = 'audit_logs'
         indexes = [
-            models.Index(fields=['organization']),
             models.Index(fields=['table_name', 'record_id']),
             models.Index(fields=['changed_by']),
-            models.Index(fields=['changed_at']),
-            models.Index(fields=['-changed_at']),  # For sorting by newest first
+            # Organization activity, newest first
+            models.Index(fields=['organization', '-changed_at'], name='audit_org_changed_idx'),
+            # Change feed: "changes since cursor" is a single range scan on id
+            models.Index(
+                fields=['organization', 'table_name', 'id'], name='audit_org_table_id_idx',
+            ),
+            # As-of replay of one session or one participant: a single range scan on id
+            models.Index(fields=['organization', 'session_id', 'id'], name='audit_org_session_idx'),
+            models.Index(
+                fields=['organization', 'participant_id', 'id'], name='audit_org_participant_idx',
+            ),
         ]
         verbose_name_plural = 'Audit Logs'
 
@@ -74,19 +168,150 @@ class AuditLog(models.Model):
         # Prevent updates to audit logs (immutable)
         if self.pk:
             raise ValueError("Audit logs cannot be modified")
+        self.seal()
         super().save(*args, **kwargs)
 
+    def seal(self):
+        """Set ``row_hash`` from the row's content; computed locally, no query."""
+        if self.changed_at is None:
+            self.changed_at = timezone.now()
+        self.row_hash = audit_row_hash({field: getattr(self, field) for field in HASH_FIELDS})
+
     def delete(self, *args, **kwargs):
-        # Prevent deletion of audit logs
+        # Prevent deletion of audit logs; retention removes whole sealed segments (RetentionService)
         raise ValueError("Audit logs cannot be deleted")
 
 
+class AuditSnapshot(models.Model):
+    """Presence state of a session or participant replayed from the audit trail up to one row."""
+
+    SCOPE_CHOICES = [
+        ('session', 'Session'),
+        ('participant', 'Participant'),
+    ]
+
+    organization = models.ForeignKey(
+        'Organization',
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,  # Covered by the unique (organization, ...) index
+        related_name='audit_snapshots'
+    )
+    scope = models.CharField(
+        max_length=20,
+        choices=SCOPE_CHOICES,
+        help_text='Whether scope_id is a session or a participant'
+    )
+    scope_id = models.BigIntegerField(
+        help_text='Session or participant the state belongs to'
+    )
+    audit_id = models.BigIntegerField(
+        help_text='Last audit log row included in the state'
+    )
+    taken_at = models.DateTimeField(
+        help_text='Latest changed_at of the included rows; the state is valid from then on'
+    )
+    state = models.JSONField(
+        default=dict,
+        help_text='Current mark per participant (session scope) or session (participant scope)'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text='When the snapshot was stored'
+    )
+
+    objects = OrganizationScopedQuerySet.as_manager()
+    scoped = OrganizationScopedManager()
+
+    class Meta:
+        db_table = 'audit_snapshots'
+        # Also serves "latest snapshot of a scope before a row" lookups
+        unique_together = [['organization', 'scope', 'scope_id', 'audit_id']]
+        verbose_name_plural = 'Audit Snapshots'
+
+    def __str__(self):
+        return f"{self.scope} {self.scope_id} up to audit row {self.audit_id}"
+
+
+class AuditCheckpoint(models.Model):
+    """
+    One sealed segment of an organization's audit chain.
+
+    ``chain_hash`` is the hash of ``prev_hash`` (the previous checkpoint's
+    ``chain_hash``) and the row hashes of the segment's rows in id order, so
+    editing, removing or inserting a row anywhere before the newest
+    checkpoint breaks the chain from there on. Segments verify independently.
+
+    Segments past the audit retention window are pruned as a whole: their rows
+    are deleted and ``pruned_at`` is set, while the checkpoint stays so later
+    segments still link to it.
+    """
+
+    organization = models.ForeignKey(
+        'Organization',
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,  # Covered by the unique (organization, ...) index
+        related_name='audit_checkpoints'
+    )
+    first_audit_id = models.BigIntegerField(
+        help_text='First audit log row of the segment'
+    )
+    last_audit_id = models.BigIntegerField(
+        help_text='Last audit log row of the segment'
+    )
+    row_count = models.IntegerField(
+        help_text='Rows in the segment'
+    )
+    prev_hash = models.CharField(
+        max_length=64,
+        help_text='chain_hash of the previous checkpoint (empty for the first)'
+    )
+    chain_hash = models.CharField(
+        max_length=64,
+        help_text='Hash of prev_hash and the segment row hashes'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text='When the segment was sealed'
+    )
+    verified_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Last successful verification'
+    )
+    pruned_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='When the segment rows were deleted by retention'
+    )
+
+    objects = OrganizationScopedQuerySet.as_manager()
+    scoped = OrganizationScopedManager()
+
+    class Meta:
+        db_table = 'audit_checkpoints'
+        # Also serves the organization's chain in order
+        unique_together = [['organization', 'last_audit_id']]
+        verbose_name_plural = 'Audit Checkpoints'
+
+    def __str__(self):
+        return f"Audit rows {self.first_audit_id}-{self.last_audit_id} ({self.row_count})"
+
+    @staticmethod
+    def link(prev_hash, segment_digest):
+        """chain_hash of a segment from the previous chain hash and the segment digest."""
+        return hashlib.sha256(f'{prev_hash}:{segment_digest}'.encode()).hexdigest()
+
+
 class SyncConflict(models.Model):
     """Stores conflicting versions from offline sync."""
 
     organization = models.ForeignKey(
         'Organization',
         on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,  # Covered by the (organization, ...) composite indexes
         related_name='sync_conflicts'
     )
     session = models.ForeignKey(
@@ -119,6 +344,7 @@ class SyncConflict(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
         null=True,
+        db_constraint=False,
         related_name='resolved_conflicts',
         help_text='User who resolved the conflict'
     )
@@ -127,14 +353,17 @@ class SyncConflict(models.Model):
         help_text='When conflict was detected'
     )
 
+    objects = OrganizationScopedQuerySet.as_manager()
+    scoped = OrganizationScopedManager()
+
     class Meta:
         db_table = 'sync_conflicts'
         indexes = [
-            models.Index(fields=['organization']),
             models.Index(fields=['session']),
             models.Index(fields=['participant']),
             models.Index(fields=['resolved_with_id']),
-            models.Index(fields=['resolved_at']),  # For filtering unresolved
+            # Unresolved conflicts of an organization
+            models.Index(fields=['organization', 'resolved_at'], name='conflicts_org_resolved_idx'),
         ]
         verbose_name_plural = 'Sync Conflicts'
 
@@ -172,11 +401,14 @@ class Notification(models.Model):
     organization = models.ForeignKey(
         'Organization',
         on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,  # Covered by the (organization, ...) composite indexes
         related_name='notifications'
     )
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name='notifications',
         help_text='Notification recipient'
     )
@@ -213,13 +445,17 @@ class Notification(models.Model):
         help_text='When notification was created'
     )
 
+    objects = OrganizationScopedQuerySet.as_manager()
+    scoped = OrganizationScopedManager()
+
     class Meta:
         db_table = 'notifications'
         indexes = [
-            models.Index(fields=['organization']),
-            models.Index(fields=['user']),
-            models.Index(fields=['is_read']),
-            models.Index(fields=['-created_at']),  # For sorting by newest first
+            # Unread notifications of a user, newest first
+            models.Index(
+                fields=['organization', 'user', 'is_read', '-created_at'],
+                name='notifications_org_user_idx',
+            ),
         ]
         verbose_name_plural = 'Notifications'
 
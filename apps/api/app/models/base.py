@@ -2,6 +2,87 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 
 
+class OrganizationScopeError(Exception):
+    """Raised when a scoped query runs without a tenant filter."""
+
+
+class OrganizationScopedQuerySet(models.QuerySet):
+    """
+    QuerySet for tenant rows.
+
+    ``for_organization()`` applies the tenant filter first so queries match the
+    ``(organization, ...)`` composite indexes. QuerySets obtained from
+    ``OrganizationScopedManager`` refuse to run until it has been applied.
+
+    Enforcement is opt-in: tenant models keep an unenforced ``objects`` and add
+    an enforcing ``scoped`` manager. The default manager also backs related
+    managers, prefetches, the admin and serializers, which are scoped through
+    their parent row rather than ``for_organization()``. New tenant queries
+    should start from ``scoped``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._requires_organization = False
+        self._organization_scoped = False
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._requires_organization = self._requires_organization
+        clone._organization_scoped = self._organization_scoped
+        return clone
+
+    def for_organization(self, organization):
+        """Filter to one organization (instance or id)."""
+        clone = self.filter(organization_id=getattr(organization, 'pk', organization))
+        clone._organization_scoped = True
+        return clone
+
+    def _check_organization_scope(self):
+        if self._requires_organization and not self._organization_scoped:
+            raise OrganizationScopeError(
+                f"{self.model.__name__} query must be filtered with for_organization()"
+            )
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            self._check_organization_scope()
+        super()._fetch_all()
+
+    def iterator(self, *args, **kwargs):
+        self._check_organization_scope()
+        return super().iterator(*args, **kwargs)
+
+    def count(self):
+        self._check_organization_scope()
+        return super().count()
+
+    def exists(self):
+        self._check_organization_scope()
+        return super().exists()
+
+    def aggregate(self, *args, **kwargs):
+        self._check_organization_scope()
+        return super().aggregate(*args, **kwargs)
+
+    def update(self, **kwargs):
+        self._check_organization_scope()
+        return super().update(**kwargs)
+
+    def delete(self):
+        self._check_organization_scope()
+        return super().delete()
+
+
+class OrganizationScopedManager(models.Manager.from_queryset(OrganizationScopedQuerySet)):
+    """Manager whose queries must be narrowed with ``for_organization()`` before they run."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        queryset._requires_organization = True
+        return queryset
+
+
 class TimeStampedModel(models.Model):
     """Base model with organization scoping and timestamps."""
 
@@ -9,10 +90,15 @@ class TimeStampedModel(models.Model):
         'Organization',
         on_delete=models.CASCADE,
         related_name='%(class)ss',
+        db_constraint=False,  # Tenant rows may live on a different shard than the catalog
+        db_index=False,  # Covered by the (organization, ...) composite indexes
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrganizationScopedQuerySet.as_manager()
+    scoped = OrganizationScopedManager()
+
     class Meta:
         abstract = True
 
@@ -27,6 +113,14 @@ class User(AbstractUser):
         ('external', 'External Participant'),
     ]
 
+    organization = models.ForeignKey(
+        'Organization',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='users',
+        help_text='Organization the user belongs to (empty for platform staff)'
+    )
     email = models.EmailField(unique=True)
     role = models.CharField(max_length=50, choices=ROLE_CHOICES, default='frontline')
     is_active = models.BooleanField(default=True)
@@ -0,0 +1,102 @@
+"""
+Custom model fields.
+"""
+import json
+import zlib
+
+from django.db import models
+
+# Leading byte of each stored format; legacy rows hold plain JSON text ('{', '[', 'n', ...)
+COMPACT_FORMAT = b'\x01'
+COMPRESSED_FORMAT = b'\x02'
+ESCAPE = '!'
+
+
+class CompactJSONField(models.BinaryField):
+    """
+    JSON stored compactly in a binary column.
+
+    Top-level object keys listed in ``codes`` are stored as their short code
+    (keys that could be mistaken for a code are escaped), the JSON has no
+    whitespace, and payloads longer than ``compress_above`` bytes are stored
+    zlib-compressed when that is smaller. Values read back are the same
+    Python objects that were written. Plain JSON written before the column
+    used this field is still read; ``compact_audit_payloads`` rewrites it.
+
+    ``codes`` is part of the stored format: only ever add entries.
+    """
+
+    def __init__(self, *args, codes=None, compress_above=256, **kwargs):
+        self.codes = dict(codes or {})
+        self.compress_above = compress_above
+        self._keys = {code: key for key, code in self.codes.items()}
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.codes:
+            kwargs['codes'] = self.codes
+        if self.compress_above != 256:
+            kwargs['compress_above'] = self.compress_above
+        return name, path, args, kwargs
+
+    def encode(self, value):
+        """Stored bytes of a JSON-serializable value."""
+        if isinstance(value, dict):
+            value = {self._encode_key(key): item for key, item in value.items()}
+        data = json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode()
+        if len(data) > self.compress_above:
+            compressed = zlib.compress(data, 6)
+            if len(compressed) < len(data):
+                return COMPRESSED_FORMAT + compressed
+        return COMPACT_FORMAT + data
+
+    def decode(self, data):
+        """Value of stored bytes, compact or legacy JSON."""
+        if isinstance(data, str):
+            return json.loads(data)
+        data = bytes(data)
+        prefix, body = data[:1], data[1:]
+        if prefix == COMPRESSED_FORMAT:
+            body = zlib.decompress(body)
+        elif prefix != COMPACT_FORMAT:
+            return json.loads(data)
+        value = json.loads(body)
+        if isinstance(value, dict):
+            value = {self._decode_key(key): item for key, item in value.items()}
+        return value
+
+    @staticmethod
+    def is_compact(data):
+        return not isinstance(data, str) and bytes(data[:1]) in (COMPACT_FORMAT, COMPRESSED_FORMAT)
+
+    def _encode_key(self, key):
+        code = self.codes.get(key)
+        if code is not None:
+            return code
+        if key in self._keys or key.startswith(ESCAPE):
+            return ESCAPE + key
+        return key
+
+    def _decode_key(self, key):
+        if key.startswith(ESCAPE):
+            return key[len(ESCAPE):]
+        return self._keys.get(key, key)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        return self.encode(value)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return self.decode(value)
+
+    def to_python(self, value):
+        # Already a Python value; BinaryField would base64-decode strings
+        return value
+
+    def value_to_string(self, obj):
+        return json.dumps(self.value_from_object(obj))
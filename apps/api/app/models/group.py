@@ -1,5 +1,14 @@
 from django.db import models
-from .base import TimeStampedModel
+from django.db.models import Count
+from .base import OrganizationScopedManager, OrganizationScopedQuerySet, TimeStampedModel
+
+
+class GroupQuerySet(OrganizationScopedQuerySet):
+    """Group lookups."""
+
+    def with_participant_count(self):
+        """Count members in the same query instead of one COUNT per group."""
+        return self.annotate(_participant_count=Count('memberships'))
 
 
 class Group(TimeStampedModel):
@@ -36,13 +45,15 @@ class Group(TimeStampedModel):
     )
     is_active = models.BooleanField(default=True)
 
+    objects = GroupQuerySet.as_manager()
+    scoped = OrganizationScopedManager.from_queryset(GroupQuerySet)()
+
     class Meta:
         db_table = 'groups'
         indexes = [
-            models.Index(fields=['organization']),
+            models.Index(fields=['organization', 'is_active'], name='groups_org_active_idx'),
+            models.Index(fields=['organization', 'group_type'], name='groups_org_type_idx'),
             models.Index(fields=['parent_id']),
-            models.Index(fields=['group_type']),
-            models.Index(fields=['is_active']),
         ]
 
     def __str__(self):
@@ -51,9 +62,43 @@ class Group(TimeStampedModel):
     @property
     def participant_count(self):
         """Get the number of participants in this group."""
+        if hasattr(self, '_participant_count'):
+            return self._participant_count
         return self.memberships.count()
 
 
+def bump_roster_versions(group_ids, using=None):
+    """Invalidate cached groups and rosters of the organizations owning these groups."""
+    from app.core.caching import bump_version
+
+    organization_ids = Group.objects.using(using).filter(
+        pk__in=set(group_ids),
+    ).values_list('organization_id', flat=True).distinct()
+    for organization_id in organization_ids:
+        bump_version(organization_id, 'groups')
+        bump_version(organization_id, 'participants')
+
+
+class GroupMembershipQuerySet(models.QuerySet):
+    """
+    Bumps the roster versions on bulk writes and deletes, which send no per-row signals.
+
+    Memberships have no post_delete receiver, so deleting a group or participant
+    can remove them without loading each row; those receivers bump instead.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        bump_roster_versions([obj.group_id for obj in created], using=self.db)
+        return created
+
+    def delete(self):
+        group_ids = list(self.values_list('group_id', flat=True).distinct())
+        result = super().delete()
+        bump_roster_versions(group_ids, using=self.db)
+        return result
+
+
 class GroupMembership(models.Model):
     """Many-to-many relationship between participants and groups."""
 
@@ -74,6 +119,8 @@ class GroupMembership(models.Model):
         help_text='Role or section within group'
     )
 
+    objects = GroupMembershipQuerySet.as_manager()
+
     class Meta:
         db_table = 'group_memberships'
         unique_together = [['group', 'participant']]
@@ -84,3 +131,8 @@ class GroupMembership(models.Model):
 
     def __str__(self):
         return f"{self.participant.full_name} in {self.group.name}"
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_roster_versions([self.group_id], using=self._state.db)
+        return result
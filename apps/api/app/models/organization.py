@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models, transaction
 
 
 class Organization(models.Model):
@@ -25,6 +25,16 @@ class Organization(models.Model):
         blank=True,
         help_text='Domain-specific settings and terminology mappings'
     )
+    shard = models.CharField(
+        max_length=100,
+        default='default',
+        help_text='Database alias holding this organization\'s tenant data'
+    )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='When deletion was requested; data is purged after RETENTION_DELETION_GRACE_DAYS'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -33,3 +43,24 @@ class Organization(models.Model):
 
     def __str__(self):
         return self.name
+
+    def update_settings(self, **values):
+        """
+        Write keys of ``settings`` (None removes a key), keeping every other key.
+
+        The row is locked while its settings are read and written back, so
+        concurrent writers of different keys (job checkpoints, watermarks, the
+        shard move freeze) do not overwrite each other.
+        """
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            rows = Organization.objects.using(DEFAULT_DB_ALIAS).filter(pk=self.pk)
+            current = rows.select_for_update().values_list('settings', flat=True).get()
+            org_settings = dict(current or {})
+            for key, value in values.items():
+                if value is None:
+                    org_settings.pop(key, None)
+                else:
+                    org_settings[key] = value
+            rows.update(settings=org_settings)
+        self.settings = org_settings
+        return org_settings
@@ -1,5 +1,47 @@
 from django.db import models
-from .base import TimeStampedModel
+
+from app.core.text import fold
+from .base import OrganizationScopedManager, OrganizationScopedQuerySet, TimeStampedModel
+
+NAME_FIELDS = ('first_name', 'last_name')
+
+
+def bump_participants_versions(participants):
+    """
+    Invalidate cached rosters of the participants' organizations.
+
+    Bulk writes send no signals.
+    """
+    from app.core.caching import bump_version
+
+    for organization_id in {participant.organization_id for participant in participants}:
+        bump_version(organization_id, 'participants')
+
+
+class ParticipantQuerySet(OrganizationScopedQuerySet):
+    """Keeps the search columns, tokens and cached rosters in sync on bulk writes."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.identifier_folded = fold(obj.identifier)[:100]
+        created = super().bulk_create(objs, *args, **kwargs)
+        ParticipantSearchToken.rebuild(created, using=self.db)
+        bump_participants_versions(created)
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if 'identifier' in fields and 'identifier_folded' not in fields:
+            fields.append('identifier_folded')
+        for obj in objs:
+            obj.identifier_folded = fold(obj.identifier)[:100]
+        result = super().bulk_update(objs, fields, *args, **kwargs)
+        if any(field in fields for field in NAME_FIELDS):
+            ParticipantSearchToken.rebuild(objs, using=self.db)
+        bump_participants_versions(objs)
+        return result
 
 
 class Participant(TimeStampedModel):
@@ -17,6 +59,13 @@ class Participant(TimeStampedModel):
         max_length=100,
         help_text='Student ID, badge number, etc.'
     )
+    identifier_folded = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        editable=False,
+        help_text='Case- and accent-folded identifier for prefix search'
+    )
     date_of_birth = models.DateField(null=True, blank=True)
     extra_data = models.JSONField(
         default=dict,
@@ -25,17 +74,117 @@ class Participant(TimeStampedModel):
     )
     is_active = models.BooleanField(default=True)
 
+    objects = ParticipantQuerySet.as_manager()
+    scoped = OrganizationScopedManager.from_queryset(ParticipantQuerySet)()
+
     class Meta:
         db_table = 'participants'
         unique_together = [['organization', 'identifier']]
         indexes = [
-            models.Index(fields=['organization']),
-            models.Index(fields=['is_active']),
+            # (organization, identifier) is covered by the unique constraint
+            models.Index(fields=['organization', 'is_active'], name='participants_org_active_idx'),
+            models.Index(
+                fields=['organization', 'identifier_folded'], name='participants_org_ident_idx',
+            ),
         ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.identifier})"
 
+    def save(self, *args, **kwargs):
+        self.identifier_folded = fold(self.identifier)[:100]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'identifier' in update_fields:
+                update_fields.add('identifier_folded')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        if update_fields is None or update_fields.intersection(NAME_FIELDS):
+            ParticipantSearchToken.rebuild([self], using=self._state.db)
+
+    def search_words(self):
+        """(field code, folded word) pairs indexed for name search."""
+        words = []
+        for code, value in (('l', self.last_name), ('f', self.first_name)):
+            for word in fold(value).split():
+                if (code, word) not in words:
+                    words.append((code, word[:100]))
+        return words
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
+
+
+class ParticipantSearchToken(models.Model):
+    """
+    One folded word of a participant's first or last name.
+
+    Lets name search match any word of a name (``"nunez"`` finds
+    "O'Brien-Núñez") with a range scan on ``(organization, token)``.
+    """
+
+    FIELD_CHOICES = [
+        ('f', 'First name'),
+        ('l', 'Last name'),
+    ]
+
+    organization = models.ForeignKey(
+        'Organization',
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,  # Covered by the (organization, token) index
+        related_name='+',
+    )
+    participant = models.ForeignKey(
+        Participant,
+        on_delete=models.CASCADE,
+        related_name='search_tokens',
+    )
+    field = models.CharField(max_length=1, choices=FIELD_CHOICES)
+    token = models.CharField(max_length=100)
+
+    objects = OrganizationScopedQuerySet.as_manager()
+    scoped = OrganizationScopedManager()
+
+    class Meta:
+        db_table = 'participant_search_tokens'
+        indexes = [
+            models.Index(fields=['organization', 'token'], name='search_tokens_org_token_idx'),
+        ]
+
+    @classmethod
+    def rebuild(cls, participants, using=None):
+        """Replace the tokens of saved participants."""
+        participants = list(participants)
+        if not participants:
+            return
+        if participants[0].pk is None:
+            # Bulk inserts on MySQL do not return ids; look them up by the unique key
+            ids = {
+                (organization_id, identifier): pk
+                for pk, organization_id, identifier in Participant.objects.using(using).filter(
+                    organization_id__in={p.organization_id for p in participants},
+                    identifier__in=[p.identifier for p in participants],
+                ).values_list('id', 'organization_id', 'identifier')
+            }
+            for participant in participants:
+                participant.pk = ids.get((participant.organization_id, participant.identifier))
+
+        participants = [participant for participant in participants if participant.pk is not None]
+        manager = cls.objects.using(using)
+        manager.filter(participant_id__in=[participant.pk for participant in participants]).delete()
+        manager.bulk_create(
+            [
+                cls(
+                    organization_id=participant.organization_id,
+                    participant_id=participant.pk,
+                    field=field,
+                    token=token,
+                )
+                for participant in participants
+                for field, token in participant.search_words()
+            ],
+            batch_size=1000,
+        )
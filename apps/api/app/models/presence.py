@@ -1,5 +1,5 @@
 from django.db import models
-from .base import TimeStampedModel
+from .base import OrganizationScopedManager, OrganizationScopedQuerySet, TimeStampedModel
 
 
 class PresenceState(TimeStampedModel):
@@ -39,13 +39,13 @@ class PresenceState(TimeStampedModel):
         help_text='Whether this is a default state'
     )
 
+    # Codes that count as absence in reports (absent for any reason)
+    ABSENT_CODES = ('absent', 'excused')
+
     class Meta:
         db_table = 'presence_states'
+        # Also serves (organization, domain) lookups
         unique_together = [['organization', 'domain', 'code']]
-        indexes = [
-            models.Index(fields=['organization']),
-            models.Index(fields=['domain']),
-        ]
 
     def __str__(self):
         return f"{self.label} ({self.code})"
@@ -105,6 +105,36 @@ class PresenceState(TimeStampedModel):
         return states
 
 
+def bump_record_versions(session_ids, using=None):
+    """Invalidate cached reports over the groups of these sessions."""
+    from app.core.report_cache import bump_presence_versions
+    from .session import Session
+
+    groups = {}
+    for organization_id, group_id in Session.objects.using(using).filter(
+        pk__in=set(session_ids),
+    ).values_list('organization_id', 'group_id'):
+        groups.setdefault(organization_id, []).append(group_id)
+    for organization_id, group_ids in groups.items():
+        bump_presence_versions(organization_id, group_ids)
+
+
+class PresenceRecordQuerySet(OrganizationScopedQuerySet):
+    """
+    Bumps the presence versions on deletes, which send no per-row signals.
+
+    Records have no post_delete receiver, so deleting a session or participant
+    can remove them without loading each row; those receivers bump instead.
+    Bulk writes bump themselves (ScanLog).
+    """
+
+    def delete(self):
+        session_ids = list(self.values_list('session_id', flat=True).distinct())
+        result = super().delete()
+        bump_record_versions(session_ids, using=self.db)
+        return result
+
+
 class PresenceRecord(TimeStampedModel):
     """Attendance record linking participant to session with status."""
 
@@ -133,6 +163,7 @@ class PresenceRecord(TimeStampedModel):
         'User',
         on_delete=models.SET_NULL,
         null=True,
+        db_constraint=False,
         blank=True,
         related_name='recorded_presence',
         help_text='User who recorded this presence'
@@ -149,22 +180,30 @@ class PresenceRecord(TimeStampedModel):
         help_text='Additional notes or metadata'
     )
 
+    objects = PresenceRecordQuerySet.as_manager()
+    scoped = OrganizationScopedManager.from_queryset(PresenceRecordQuerySet)()
+
     class Meta:
         db_table = 'presence_records'
         unique_together = [['session', 'participant']]
         indexes = [
-            models.Index(fields=['organization']),
             models.Index(fields=['session']),
             models.Index(fields=['participant']),
-            models.Index(fields=['recorded_at']),
+            models.Index(fields=['organization', 'recorded_at'], name='records_org_recorded_idx'),
         ]
 
     def __str__(self):
         return f"{self.participant.full_name} - {self.session.name} - {self.presence_state.label}"
 
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_record_versions([self.session_id], using=self._state.db)
+        return result
+
     def save(self, *args, **kwargs):
         # Trigger audit log on create/update
         from .audit import AuditLog
+        from django.db import router
         from django.utils import timezone
 
         is_new = self.pk is None
@@ -172,7 +211,10 @@ class PresenceRecord(TimeStampedModel):
 
         if not is_new:
             try:
-                old_record = PresenceRecord.objects.get(pk=self.pk)
+                # Read the previous state from the write database, never a lagging replica
+                old_record = PresenceRecord.objects.using(
+                    router.db_for_write(PresenceRecord, instance=self)
+                ).get(pk=self.pk)
                 old_state = old_record.presence_state
             except PresenceRecord.DoesNotExist:
                 pass
@@ -187,11 +229,9 @@ class PresenceRecord(TimeStampedModel):
                 record_id=self.pk,
                 action='create',
                 changed_by=self.recorded_by,
-                new_values={
-                    'session_id': self.session_id,
-                    'participant_id': self.participant_id,
-                    'presence_state': self.presence_state.code
-                },
+                session_id=self.session_id,
+                participant_id=self.participant_id,
+                new_values={'presence_state': self.presence_state.code},
                 changed_at=timezone.now(),
                 source_device=self.source_device_id
             )
@@ -202,6 +242,8 @@ class PresenceRecord(TimeStampedModel):
                 record_id=self.pk,
                 action='update',
                 changed_by=self.recorded_by,
+                session_id=self.session_id,
+                participant_id=self.participant_id,
                 old_values={'presence_state': old_state.code},
                 new_values={'presence_state': self.presence_state.code},
                 changed_at=timezone.now(),
@@ -1,5 +1,51 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
-from .base import TimeStampedModel
+from django.db.models import Count, Q
+from .base import OrganizationScopedManager, OrganizationScopedQuerySet, TimeStampedModel
+
+
+def max_lookup_duration():
+    """Sessions scheduled for longer than this also store their end in ``long_end_at``."""
+    return timedelta(hours=getattr(settings, 'SESSION_LOOKUP_MAX_DURATION_HOURS', 24))
+
+
+class SessionQuerySet(OrganizationScopedQuerySet):
+    """Time-window lookups for sessions."""
+
+    def overlapping(self, organization, start, end):
+        """
+        Sessions of an organization whose scheduled window overlaps [start, end).
+
+        The lower bound on ``scheduled_start_at`` keeps the lookup a bounded range
+        scan on the ``(organization, scheduled_start_at, scheduled_end_at)`` index.
+        Sessions longer than that bound (rare) are found by a range scan on
+        their ``(organization, long_end_at)`` index.
+        """
+        # Each branch a complete conjunction, so the planner can range-scan both indexes
+        return self.for_organization(organization).filter(
+            Q(
+                scheduled_start_at__gte=start - max_lookup_duration(),
+                scheduled_start_at__lt=end,
+                scheduled_end_at__gt=start,
+            )
+            | Q(long_end_at__gt=start, scheduled_start_at__lt=end)
+        )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.set_long_end_at()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if {'scheduled_start_at', 'scheduled_end_at'} & set(fields):
+            for obj in objs:
+                obj.set_long_end_at()
+            fields = [*fields, 'long_end_at']
+        return super().bulk_update(objs, fields, *args, **kwargs)
 
 
 class Session(TimeStampedModel):
@@ -35,18 +81,50 @@ class Session(TimeStampedModel):
         blank=True,
         help_text='Domain-specific session data'
     )
+    long_end_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text=(
+            'Scheduled end of sessions longer than SESSION_LOOKUP_MAX_DURATION_HOURS '
+            '(set on save)'
+        )
+    )
+
+    objects = SessionQuerySet.as_manager()
+    scoped = OrganizationScopedManager.from_queryset(SessionQuerySet)()
 
     class Meta:
         db_table = 'sessions'
         indexes = [
-            models.Index(fields=['organization']),
             models.Index(fields=['group']),
-            models.Index(fields=['scheduled_start_at']),
+            # Time-window lookups ("sessions happening now / today")
+            models.Index(
+                fields=['organization', 'scheduled_start_at', 'scheduled_end_at'],
+                name='sessions_org_window_idx',
+            ),
+            # Sessions too long for the bounded window scan
+            models.Index(
+                fields=['organization', 'long_end_at'],
+                name='sessions_org_long_idx',
+            ),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.scheduled_start_at.strftime('%Y-%m-%d %H:%M')})"
 
+    def set_long_end_at(self):
+        is_long = self.scheduled_end_at - self.scheduled_start_at > max_lookup_duration()
+        self.long_end_at = self.scheduled_end_at if is_long else None
+
+    def save(self, *args, **kwargs):
+        self.set_long_end_at()
+        update_fields = kwargs.get('update_fields')
+        schedule_fields = {'scheduled_start_at', 'scheduled_end_at'}
+        if update_fields is not None and schedule_fields & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'long_end_at'}
+        super().save(*args, **kwargs)
+
     @property
     def is_in_progress(self):
         """Check if session is currently in progress."""
@@ -71,14 +149,12 @@ class Session(TimeStampedModel):
     @property
     def presence_stats(self):
         """Get presence statistics for this session."""
-        records = self.presence_records.all()
-        total = records.count()
-        if total == 0:
-            return {'total': 0, 'present': 0, 'absent': 0}
-
-        present = records.filter(presence_state__code='present').count()
+        stats = self.presence_records.aggregate(
+            total=Count('id'),
+            present=Count('id', filter=Q(presence_state__code='present')),
+        )
         return {
-            'total': total,
-            'present': present,
-            'absent': total - present
+            'total': stats['total'],
+            'present': stats['present'],
+            'absent': stats['total'] - stats['present']
         }
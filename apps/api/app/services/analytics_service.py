@@ -0,0 +1,278 @@
+"""
+Attendance analytics: chronic absence, absence streaks and weekly trends.
+
+One streamed query loads every mark of the period into a compact structured
+NumPy array (participant, group, session start, day, absent flag, about 30
+bytes per mark); the metrics are then computed with sorting, ``bincount`` and
+run-length operations instead of per-participant queries or loops.
+
+Results are cached per organization, period and parameters. Roster and
+presence-state changes invalidate them through the organization version
+counters; newly recorded marks show up after ``ANALYTICS_CACHE_SECONDS``.
+"""
+import hashlib
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from app.core.caching import get_versions
+from app.models import PresenceRecord, PresenceState, Session
+
+MARK_DTYPE = np.dtype([
+    ('participant', np.int64),
+    ('group', np.int64),
+    ('started', np.float64),  # Session start, epoch seconds
+    ('day', np.int32),  # Session date ordinal in the current time zone
+    ('absent', np.bool_),
+])
+
+VERSION_SCOPES = ('groups', 'participants', 'presence_states')
+
+
+def _runs(values, boundaries):
+    """Run ids and run lengths of ``values`` where a new run also starts at ``boundaries``."""
+    starts = np.ones(len(values), dtype=bool)
+    starts[1:] = (values[1:] != values[:-1]) | boundaries[1:]
+    run_ids = np.cumsum(starts) - 1
+    return run_ids, np.bincount(run_ids), starts
+
+
+class AttendanceAnalyticsService:
+    """Attendance metrics over a date range for one organization."""
+
+    DEFAULT_CHRONIC_THRESHOLD = 0.1
+    DEFAULT_MIN_SESSIONS = 5
+    DEFAULT_MIN_STREAK = 3
+    FETCH_CHUNK = 10000
+
+    def __init__(self, organization):
+        self.organization = organization
+
+    def load(self, date_from, date_to, group_id=None):
+        """
+        Marks of sessions scheduled between two dates (inclusive) as a MARK_DTYPE array.
+
+        Sessions of the period are read first (one row each); the marks then come
+        from a single streamed query of integer columns that go straight into an
+        array and are joined to their session with a binary search.
+        """
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime.combine(date_from, time.min), tz)
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min), tz)
+        absent_states = np.array(
+            PresenceState.scoped.for_organization(self.organization)
+            .filter(code__in=PresenceState.ABSENT_CODES).values_list('id', flat=True),
+            dtype=np.int64,
+        )
+
+        sessions = (
+            Session.scoped.for_organization(self.organization)
+            .filter(scheduled_start_at__gte=start, scheduled_start_at__lt=end)
+        )
+        if group_id is not None:
+            sessions = sessions.filter(group_id=group_id)
+        session_rows = np.array(
+            [
+                (pk, group, started.timestamp(), timezone.localtime(started, tz).date().toordinal())
+                for pk, group, started in sessions.values_list(
+                    'id', 'group_id', 'scheduled_start_at',
+                )
+            ],
+            dtype=[
+                ('id', np.int64), ('group', np.int64), ('started', np.float64), ('day', np.int32),
+            ],
+        )
+        session_rows.sort(order='id')
+
+        records = (
+            PresenceRecord.scoped.for_organization(self.organization)
+            .filter(session__scheduled_start_at__gte=start, session__scheduled_start_at__lt=end)
+            .values_list('participant_id', 'session_id', 'presence_state_id')
+        )
+        if group_id is not None:
+            records = records.filter(session__group_id=group_id)
+        raw = np.fromiter(
+            records.iterator(chunk_size=self.FETCH_CHUNK),
+            dtype=[('participant', np.int64), ('session', np.int64), ('state', np.int64)],
+        )
+
+        # Marks of sessions moved into the period after the first query are dropped
+        if len(session_rows):
+            position = np.minimum(
+                np.searchsorted(session_rows['id'], raw['session']), len(session_rows) - 1,
+            )
+            found = session_rows['id'][position] == raw['session']
+        else:
+            position = np.zeros(len(raw), dtype=np.intp)
+            found = np.zeros(len(raw), dtype=bool)
+        raw, position = raw[found], position[found]
+
+        marks = np.empty(len(raw), dtype=MARK_DTYPE)
+        marks['participant'] = raw['participant']
+        marks['group'] = session_rows['group'][position]
+        marks['started'] = session_rows['started'][position]
+        marks['day'] = session_rows['day'][position]
+        marks['absent'] = np.isin(raw['state'], absent_states)
+        return marks
+
+    def summary(self, date_from, date_to, group_id=None, chronic_threshold=None,
+                min_sessions=None, min_streak=None, use_cache=True):
+        """
+        Chronic absence, absence streaks and weekly trends, cached.
+
+        Args:
+            date_from: First day of the period
+            date_to: Last day of the period (inclusive)
+            group_id: Only sessions of this group
+            chronic_threshold: Absence rate from which a participant is chronically absent
+            min_sessions: Marked sessions a participant needs to be rated
+            min_streak: Shortest consecutive-absence streak reported
+            use_cache: Read and store the cached result
+
+        Returns:
+            Dict with ``period``, ``chronic_absence``, ``streaks`` and ``trends``
+        """
+        params = {
+            'chronic_threshold': (
+                self.DEFAULT_CHRONIC_THRESHOLD if chronic_threshold is None else chronic_threshold
+            ),
+            'min_sessions': self.DEFAULT_MIN_SESSIONS if min_sessions is None else min_sessions,
+            'min_streak': self.DEFAULT_MIN_STREAK if min_streak is None else min_streak,
+        }
+        key = self._cache_key(date_from, date_to, group_id, params)
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        marks = self.load(date_from, date_to, group_id=group_id)
+        result = {
+            'period': {'from': date_from.isoformat(), 'to': date_to.isoformat()},
+            'marks': int(len(marks)),
+            'chronic_absence': self.chronic_absence(
+                marks, params['chronic_threshold'], params['min_sessions'],
+            ),
+            'streaks': self.streaks(marks, params['min_streak']),
+            'trends': self.weekly_trends(marks),
+        }
+        if use_cache:
+            cache.set(key, result, timeout=getattr(settings, 'ANALYTICS_CACHE_SECONDS', 300))
+        return result
+
+    def _cache_key(self, date_from, date_to, group_id, params):
+        versions, _ = get_versions(self.organization.id, VERSION_SCOPES)
+        parts = [
+            str(self.organization.id), date_from.isoformat(), date_to.isoformat(), str(group_id),
+            *(f'{name}={value}' for name, value in sorted(params.items())),
+            *(str(version) for version in versions),
+        ]
+        digest = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+        return f'attendance_analytics_{self.organization.id}_{digest}'
+
+    @staticmethod
+    def _pairs(marks):
+        """Index of each mark's (group, participant) pair, and the pairs' groups and members."""
+        # Ids fit in 32 bits: one int64 key per pair sorts far faster than 2-column rows
+        keys, inverse = np.unique(
+            (marks['group'] << 32) | marks['participant'], return_inverse=True,
+        )
+        return inverse.reshape(-1), keys >> 32, keys & 0xFFFFFFFF
+
+    def chronic_absence(self, marks, threshold, min_sessions):
+        """Participants absent from at least ``threshold`` of their group's marked sessions."""
+        if not len(marks):
+            return []
+        inverse, groups, participants = self._pairs(marks)
+        sessions = np.bincount(inverse)
+        absences = np.bincount(inverse, weights=marks['absent']).astype(np.int64)
+        rates = absences / sessions
+
+        chronic = np.flatnonzero((sessions >= min_sessions) & (rates >= threshold))
+        chronic = chronic[np.lexsort((participants[chronic], -rates[chronic]))]
+        return [
+            {
+                'group_id': group,
+                'participant_id': participant,
+                'sessions': count,
+                'absences': absent,
+                'absence_rate': round(rate, 4),
+            }
+            for group, participant, count, absent, rate in zip(
+                groups[chronic].tolist(), participants[chronic].tolist(),
+                sessions[chronic].tolist(),
+                absences[chronic].tolist(), rates[chronic].tolist(),
+            )
+        ]
+
+    def streaks(self, marks, min_streak):
+        """Longest and current runs of consecutive absences per participant and group."""
+        if not len(marks):
+            return []
+        inverse, groups, participants = self._pairs(marks)
+        order = np.lexsort((marks['started'], inverse))
+        pair = inverse[order]
+        absent = marks['absent'][order]
+
+        new_pair = np.ones(len(pair), dtype=bool)
+        new_pair[1:] = pair[1:] != pair[:-1]
+        run_ids, lengths, starts = _runs(absent, new_pair)
+        run_pair = pair[starts]
+        run_absent = absent[starts]
+
+        longest = np.zeros(len(groups), dtype=np.int64)
+        np.maximum.at(longest, run_pair[run_absent], lengths[run_absent])
+        # The last run of each pair is the current one
+        last_run = run_ids[np.r_[np.flatnonzero(new_pair)[1:] - 1, len(pair) - 1]]
+        current = np.where(run_absent[last_run], lengths[last_run], 0)
+
+        reported = np.flatnonzero(longest >= min_streak)
+        reported = reported[
+            np.lexsort((participants[reported], -longest[reported], -current[reported]))
+        ]
+        return [
+            {
+                'group_id': group,
+                'participant_id': participant,
+                'longest': run,
+                'current': running,
+            }
+            for group, participant, run, running in zip(
+                groups[reported].tolist(), participants[reported].tolist(),
+                longest[reported].tolist(), current[reported].tolist(),
+            )
+        ]
+
+    def weekly_trends(self, marks):
+        """Attendance rate per group and week (Monday first), with the change from last week."""
+        if not len(marks):
+            return []
+        # date.toordinal() is 1 for Monday 0001-01-01
+        weeks = (marks['day'].astype(np.int64) - 1) // 7
+        keys, inverse = np.unique((marks['group'] << 32) | weeks, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        groups, weeks = keys >> 32, keys & 0xFFFFFFFF
+        totals = np.bincount(inverse)
+        attended = totals - np.bincount(inverse, weights=marks['absent']).astype(np.int64)
+        rates = attended / totals
+
+        # Keys are sorted by group then week: the previous row is the week before if it is adjacent
+        follows = np.zeros(len(keys), dtype=bool)
+        follows[1:] = (groups[1:] == groups[:-1]) & (weeks[1:] == weeks[:-1] + 1)
+        change = np.full(len(keys), np.nan)
+        change[1:][follows[1:]] = rates[1:][follows[1:]] - rates[:-1][follows[1:]]
+
+        return [
+            {
+                'group_id': group,
+                'week_start': date.fromordinal(week * 7 + 1).isoformat(),
+                'marks': total,
+                'attendance_rate': round(rate, 4),
+                'change': None if np.isnan(delta) else round(delta, 4),
+            }
+            for group, week, total, rate, delta in zip(
+                groups.tolist(), weeks.tolist(), totals.tolist(), rates.tolist(), change.tolist(),
+            )
+        ]
@@ -0,0 +1,327 @@
+"""
+Tamper-evident audit chain.
+
+Each ``AuditLog`` row carries ``row_hash``, a keyed hash of its content
+computed in the process that writes it (no extra query on the write path).
+Rows are chained afterwards: sealing cuts an organization's settled rows into
+segments of ``AUDIT_CHECKPOINT_ROWS`` and stores an ``AuditCheckpoint`` per
+segment whose ``chain_hash`` covers the previous checkpoint and the row hashes
+in id order. Verification then:
+
+1. checks that every checkpoint links to the one before it (one query),
+2. recomputes each row's hash from its content and each segment's digest
+   (except for segments pruned by retention, whose rows are gone).
+
+Segments are independent once their ``prev_hash`` is stored, so step 2 runs in
+a process pool across organizations and segments. Runs are incremental: only
+new rows and checkpoints never verified (or verified before ``recheck_before``)
+are read.
+
+Only rows written before hashing existed may lack a hash: those below the
+organization's first hashed row, and only until its first segment is sealed.
+Their hashes are filled in when they are sealed. Any other blank hash is
+reported like an edited row, since filling it would accept whatever the row
+now says.
+
+Rows are sealed once no open transaction can still commit lower ids next to
+them, ``AUDIT_SETTLE_SECONDS`` after the oldest open write transaction started.
+Until then, changing or deleting them goes unnoticed, so the command runs every
+few minutes.
+"""
+import hashlib
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from app.core.sharding import get_shard, organization_context, organizations_being_moved
+from app.models import AuditCheckpoint, AuditLog, Notification, User
+from app.models.audit import HASH_FIELDS, audit_row_hash
+from app.services.sync_service import oldest_write_transaction_age
+
+SegmentDigest = namedtuple(
+    'SegmentDigest', 'organization_id checkpoint_id first_id last_id row_count digest mismatched'
+)
+ChainFailure = namedtuple('ChainFailure', 'organization_id first_id last_id reason')
+VerificationResult = namedtuple('VerificationResult', 'segments rows sealed failures')
+
+FETCH_CHUNK = 2000
+
+
+def digest_segment(organization_id, checkpoint_id, first_id, last_id, legacy_before=0):
+    """
+    Verify the row hashes of one segment and digest them in id order.
+
+    Pool entry point. Rows below ``legacy_before`` were written before hashing
+    existed and get their missing hash stored instead of being reported.
+
+    Returns:
+        SegmentDigest with the ids of rows whose content does not match their hash
+    """
+    digest = hashlib.sha256()
+    row_count, mismatched, missing = 0, [], {}
+    with organization_context(organization_id):
+        rows = (
+            AuditLog.scoped.for_organization(organization_id)
+            .filter(id__gte=first_id, id__lte=last_id)
+            .order_by('id')
+            .values('id', 'row_hash', *HASH_FIELDS)
+        )
+        for row in rows.iterator(chunk_size=FETCH_CHUNK):
+            expected = audit_row_hash(row)
+            stored = row['row_hash']
+            if not stored and row['id'] < legacy_before:
+                missing[row['id']] = stored = expected
+            elif stored != expected:
+                mismatched.append(row['id'])
+            digest.update(stored.encode())
+            row_count += 1
+
+        ids = list(missing)
+        for start in range(0, len(ids), 1000):
+            chunk = ids[start:start + 1000]
+            AuditLog.objects.filter(id__in=chunk).update(
+                row_hash=Case(*(
+                    When(id=audit_id, then=Value(missing[audit_id])) for audit_id in chunk
+                )),
+            )
+    return SegmentDigest(
+        organization_id, checkpoint_id, first_id, last_id,
+        row_count, digest.hexdigest(), mismatched,
+    )
+
+
+def _digest(job):
+    try:
+        return digest_segment(*job)
+    finally:
+        connections.close_all()
+
+
+class AuditChainService:
+    """Seals and verifies the audit chains of a set of organizations."""
+
+    def __init__(self, organizations, workers=None, segment_rows=None, log=None):
+        self.organizations = list(organizations)
+        self.workers = workers or multiprocessing.cpu_count()
+        self.segment_rows = segment_rows or getattr(settings, 'AUDIT_CHECKPOINT_ROWS', 10000)
+        self.log = log or (lambda message: None)
+
+    def run(self, full=False, recheck_before=None):
+        """
+        Verify stored checkpoints and seal the rows written since the last one.
+
+        Args:
+            full: Re-verify every checkpoint, not only unverified ones
+            recheck_before: Also re-verify checkpoints last verified before this time
+
+        Returns:
+            VerificationResult; ``failures`` lists broken links and tampered segments
+        """
+        failures, jobs, chains, in_flight = [], [], {}, {}
+        settle = getattr(settings, 'AUDIT_SETTLE_SECONDS', 60)
+        moving = organizations_being_moved()
+        for organization in self.organizations:
+            with organization_context(organization.id):
+                checkpoints = list(
+                    AuditCheckpoint.scoped.for_organization(organization).order_by('last_audit_id')
+                )
+                failures.extend(self._check_links(organization.id, checkpoints))
+                for checkpoint in checkpoints:
+                    if checkpoint.pruned_at is not None:
+                        # Rows removed by retention; the checkpoint still anchors the links
+                        continue
+                    due = full or checkpoint.verified_at is None or (
+                        recheck_before is not None and checkpoint.verified_at < recheck_before
+                    )
+                    if due:
+                        jobs.append((
+                            organization.id, checkpoint.id,
+                            checkpoint.first_audit_id, checkpoint.last_audit_id,
+                        ))
+                last_id = checkpoints[-1].last_audit_id if checkpoints else 0
+                if organization.id in moving:
+                    # Sealing fills row hashes in place, which a shard move would not copy
+                    self.log(f"organization {organization.id}: being moved, sealing skipped")
+                    new_segments = []
+                else:
+                    # Open transactions can still commit rows below ids already written
+                    alias = get_shard(organization.id)
+                    if alias not in in_flight:
+                        in_flight[alias] = oldest_write_transaction_age(alias)
+                    settled_before = timezone.now() - timedelta(seconds=settle + in_flight[alias])
+                    new_segments = self._new_segments(organization.id, last_id, settled_before)
+                # Once a segment is sealed, every later row was hashed when written
+                legacy_before = 0
+                if new_segments and not checkpoints:
+                    legacy_before = self._legacy_before(organization.id)
+                jobs.extend(
+                    (organization.id, None, first_id, last_id, legacy_before)
+                    for first_id, last_id in new_segments
+                )
+                chains[organization.id] = checkpoints
+
+        self.log(f"{len(jobs)} segments to digest")
+        digests = self._digest_all(jobs)
+
+        rows = sealed = 0
+        verified = {}
+        by_checkpoint = {
+            checkpoint.id: checkpoint
+            for checkpoints in chains.values() for checkpoint in checkpoints
+        }
+        new_by_organization = {}
+        for result in digests:
+            rows += result.row_count
+            if result.mismatched:
+                failures.append(ChainFailure(
+                    result.organization_id, result.first_id, result.last_id,
+                    f"{len(result.mismatched)} rows do not match their hash, "
+                    f"first {result.mismatched[0]}",
+                ))
+            if result.checkpoint_id is None:
+                new_by_organization.setdefault(result.organization_id, []).append(result)
+                continue
+            checkpoint = by_checkpoint[result.checkpoint_id]
+            if (
+                result.row_count != checkpoint.row_count
+                or checkpoint.chain_hash != AuditCheckpoint.link(
+                    checkpoint.prev_hash, result.digest,
+                )
+            ):
+                failures.append(ChainFailure(
+                    result.organization_id, result.first_id, result.last_id,
+                    f"segment changed: {result.row_count} rows, {checkpoint.row_count} sealed",
+                ))
+            elif not result.mismatched:
+                verified.setdefault(result.organization_id, []).append(checkpoint.pk)
+
+        for organization_id, checkpoint_ids in verified.items():
+            with organization_context(organization_id):
+                AuditCheckpoint.objects.filter(pk__in=checkpoint_ids).update(
+                    verified_at=timezone.now(),
+                )
+
+        failed = {failure.organization_id for failure in failures}
+        for organization_id, results in new_by_organization.items():
+            # Never extend a chain that failed verification; fix or investigate it first
+            if organization_id in failed:
+                continue
+            sealed += self._seal(organization_id, chains[organization_id], results)
+
+        if failures:
+            self._notify(failures)
+        return VerificationResult(len(digests), rows, sealed, failures)
+
+    @staticmethod
+    def _check_links(organization_id, checkpoints):
+        failures = []
+        prev_hash, prev_last = '', 0
+        for checkpoint in checkpoints:
+            if checkpoint.prev_hash != prev_hash or checkpoint.first_audit_id <= prev_last:
+                failures.append(ChainFailure(
+                    organization_id, checkpoint.first_audit_id, checkpoint.last_audit_id,
+                    'checkpoint does not link to the previous one',
+                ))
+            prev_hash, prev_last = checkpoint.chain_hash, checkpoint.last_audit_id
+        return failures
+
+    @staticmethod
+    def _legacy_before(organization_id):
+        """Id of the organization's first hashed row; rows below it predate hashing."""
+        rows = (
+            AuditLog.scoped.for_organization(organization_id)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        first_hashed = rows.exclude(row_hash='').first()
+        if first_hashed is not None:
+            return first_hashed
+        last = rows.reverse().first()
+        return (last or 0) + 1
+
+    def _new_segments(self, organization_id, after, settled_before):
+        """(first id, last id) of unsealed settled rows, ``segment_rows`` rows each."""
+        segments, first_id, count, previous = [], None, 0, None
+        rows = (
+            AuditLog.scoped.for_organization(organization_id)
+            .filter(id__gt=after)
+            .order_by('id')
+            .values_list('id', 'changed_at')
+        )
+        for audit_id, changed_at in rows.iterator(chunk_size=FETCH_CHUNK * 5):
+            if changed_at >= settled_before:
+                break
+            if first_id is None:
+                first_id = audit_id
+            previous = audit_id
+            count += 1
+            if count == self.segment_rows:
+                segments.append((first_id, previous))
+                first_id, count = None, 0
+        if first_id is not None:
+            segments.append((first_id, previous))
+        return segments
+
+    def _digest_all(self, jobs):
+        if len(jobs) <= 1 or self.workers == 1:
+            return [digest_segment(*job) for job in jobs]
+        # Each worker opens its own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('fork'),
+        ) as pool:
+            return list(pool.map(_digest, jobs))
+
+    def _seal(self, organization_id, checkpoints, results):
+        prev_hash = checkpoints[-1].chain_hash if checkpoints else ''
+        new = []
+        for result in sorted(results, key=lambda result: result.first_id):
+            if result.mismatched:
+                break
+            chain_hash = AuditCheckpoint.link(prev_hash, result.digest)
+            new.append(AuditCheckpoint(
+                organization_id=organization_id,
+                first_audit_id=result.first_id,
+                last_audit_id=result.last_id,
+                row_count=result.row_count,
+                prev_hash=prev_hash,
+                chain_hash=chain_hash,
+                verified_at=timezone.now(),
+            ))
+            prev_hash = chain_hash
+        with organization_context(organization_id):
+            AuditCheckpoint.objects.bulk_create(new)
+        self.log(f"organization {organization_id}: {len(new)} segments sealed")
+        return len(new)
+
+    @staticmethod
+    def _notify(failures):
+        """A system notification per failing organization to its administrators."""
+        by_organization = {}
+        for failure in failures:
+            by_organization.setdefault(failure.organization_id, []).append(failure)
+        for organization_id, organization_failures in by_organization.items():
+            message = '; '.join(
+                f"rows {failure.first_id}-{failure.last_id}: {failure.reason}"
+                for failure in organization_failures[:10]
+            )
+            recipients = User.objects.filter(
+                organization_id=organization_id, role='administrator', is_active=True,
+            ).values_list('id', flat=True)
+            with organization_context(organization_id):
+                Notification.objects.bulk_create([
+                    Notification(
+                        organization_id=organization_id,
+                        user_id=user_id,
+                        notification_type='system',
+                        title='Audit trail verification failed',
+                        message=message,
+                    )
+                    for user_id in recipients
+                ])
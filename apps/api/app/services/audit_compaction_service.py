@@ -0,0 +1,157 @@
+"""
+Background rewrite of audit payloads into the compact storage format.
+
+Rows written before ``old_values``/``new_values`` became ``CompactJSONField``
+hold plain JSON text. The compactor walks ``audit_logs`` of one database in
+primary-key order, re-encodes those rows in small transactions and skips rows
+that are already compact, so it can be stopped and restarted at any time
+(``--after-id`` resumes without re-reading). Rows of organizations that are
+being moved between shards are left for a later run.
+
+Legacy create entries also repeat ``session_id``/``participant_id``, which now
+live in their own columns. They are dropped from rows that are keyed and not
+yet hashed into the audit chain; hashed rows are only re-encoded, which keeps
+their decoded values, and so their hashes, unchanged.
+"""
+import time
+from collections import namedtuple
+
+from django.db import connections, transaction
+
+from app.core.sharding import organizations_being_moved
+from app.models import AuditLog
+
+CompactionResult = namedtuple('CompactionResult', 'rows rewritten bytes_before bytes_after last_id')
+
+KEY_COLUMNS = ('session_id', 'participant_id')
+
+
+def table_size(alias, table=None):
+    """(data bytes, index bytes) of a table, or None where the backend does not report them."""
+    table = table or AuditLog._meta.db_table
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT data_length, index_length FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+            row = cursor.fetchone()
+            return (int(row[0]), int(row[1])) if row else None
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s', [table])
+                data = cursor.fetchone()[0] or 0
+                cursor.execute(
+                    'SELECT SUM(pgsize) FROM dbstat WHERE name IN '
+                    '(SELECT name FROM sqlite_master WHERE type = %s AND tbl_name = %s)',
+                    ['index', table],
+                )
+                return int(data), int(cursor.fetchone()[0] or 0)
+            except Exception:
+                # SQLite built without the dbstat table
+                return None
+    return None
+
+
+class AuditPayloadCompactor:
+    """Re-encodes the legacy audit payloads of one database."""
+
+    def __init__(self, alias, chunk_size=1000, sleep=0.0, log=None):
+        self.alias = alias
+        self.chunk_size = chunk_size
+        self.sleep = sleep
+        self.log = log or (lambda message: None)
+        self.old_field = AuditLog._meta.get_field('old_values')
+        self.new_field = AuditLog._meta.get_field('new_values')
+
+    def run(self, after_id=0, limit=None):
+        """
+        Rewrite legacy rows with an id above ``after_id``.
+
+        Args:
+            after_id: Resume after this audit log id
+            limit: Stop after reading this many rows
+
+        Returns:
+            CompactionResult; byte counts cover the payloads of rewritten rows
+        """
+        connection = connections[self.alias]
+        table = connection.ops.quote_name(AuditLog._meta.db_table)
+        select = (
+            f'SELECT id, organization_id, session_id, participant_id, row_hash, '
+            f'old_values, new_values '
+            f'FROM {table} '
+            f'WHERE id > %s ORDER BY id LIMIT %s'
+        )
+        update = f'UPDATE {table} SET old_values = %s, new_values = %s WHERE id = %s'
+
+        rows = rewritten = skipped = bytes_before = bytes_after = 0
+        last_id = after_id
+        while limit is None or rows < limit:
+            with connection.cursor() as cursor:
+                cursor.execute(select, [last_id, self.chunk_size])
+                chunk = cursor.fetchall()
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            rows += len(chunk)
+
+            updates = []
+            moving = organizations_being_moved()
+            for row in chunk:
+                audit_id, organization_id, session_id, participant_id, row_hash = row[:5]
+                old_raw, new_raw = row[5:]
+                if not self._is_legacy(old_raw) and not self._is_legacy(new_raw):
+                    continue
+                if organization_id in moving:
+                    skipped += 1
+                    continue
+                old_values = self._decode(self.old_field, old_raw)
+                new_values = self._decode(self.new_field, new_raw)
+                if not row_hash and session_id is not None and isinstance(new_values, dict):
+                    keys = {'session_id': session_id, 'participant_id': participant_id}
+                    new_values = {
+                        key: value for key, value in new_values.items()
+                        if key not in KEY_COLUMNS or value != keys[key]
+                    }
+                old_data = self._encode(self.old_field, old_values)
+                new_data = self._encode(self.new_field, new_values)
+                bytes_before += self._size(old_raw) + self._size(new_raw)
+                bytes_after += self._size(old_data) + self._size(new_data)
+                updates.append((old_data, new_data, audit_id))
+
+            if updates:
+                with transaction.atomic(using=self.alias), connection.cursor() as cursor:
+                    cursor.executemany(update, updates)
+                rewritten += len(updates)
+            self.log(
+                f"{self.alias}: read up to id {last_id}, {rewritten} rewritten"
+                + (
+                    f", {skipped} of organizations being moved left for a later run"
+                    if skipped else ''
+                )
+            )
+            if self.sleep:
+                time.sleep(self.sleep)
+
+        return CompactionResult(rows, rewritten, bytes_before, bytes_after, last_id)
+
+    @staticmethod
+    def _is_legacy(data):
+        return data is not None and not AuditLog._meta.get_field('new_values').is_compact(data)
+
+    @staticmethod
+    def _decode(field, data):
+        return None if data is None else field.decode(data)
+
+    @staticmethod
+    def _encode(field, value):
+        return None if value is None else field.encode(value)
+
+    @staticmethod
+    def _size(data):
+        if data is None:
+            return 0
+        return len(data.encode()) if isinstance(data, str) else len(data)
@@ -0,0 +1,279 @@
+"""
+As-of reconstruction of presence state from the audit trail.
+
+Every presence change in ``audit_logs`` carries its session and participant
+(``session_id``/``participant_id`` columns), so the history of one session or
+one participant is a single ordered range scan on the
+``(organization, session_id, id)`` or ``(organization, participant_id, id)``
+index. Replaying it up to a moment gives the marks as they stood then.
+
+Long histories start from the latest ``AuditSnapshot`` taken before that
+moment and only replay the rows after it. ``take_snapshots()`` (run by the
+``snapshot_audit`` command from cron) stores a new snapshot for every session
+and participant with at least ``AUDIT_SNAPSHOT_INTERVAL`` rows since its
+previous one.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from app.core.sharding import organizations_being_moved
+from app.models import AuditLog, AuditSnapshot, PresenceRecord
+
+AsOfState = namedtuple('AsOfState', 'marks audit_id snapshot_id replayed')
+
+# Scope -> (column the history is filtered on, column the marks are keyed by)
+SCOPE_COLUMNS = {
+    'session': ('session_id', 'participant_id'),
+    'participant': ('participant_id', 'session_id'),
+}
+
+REPLAY_FIELDS = (
+    'id', 'action', 'record_id', 'session_id', 'participant_id',
+    'new_values', 'changed_by_id', 'changed_at', 'source_device',
+)
+
+
+class AuditReplayService:
+    """Marks of a session or participant at any moment, replayed from ``audit_logs``."""
+
+    TABLE_NAME = 'presence_records'
+    FETCH_CHUNK = 2000
+    SETTINGS_KEY = 'audit_snapshots'
+    # Rows newer than this may still gain lower-id neighbours from open transactions
+    SETTLE_TIME = timedelta(hours=1)
+
+    def __init__(self, organization, log=None):
+        self.organization = organization
+        self.log = log or (lambda message: None)
+
+    def session_state(self, session_id, at):
+        """Marks of a session at ``at``, keyed by participant id."""
+        return self.state('session', session_id, at)
+
+    def participant_state(self, participant_id, at):
+        """Marks of a participant at ``at``, keyed by session id."""
+        return self.state('participant', participant_id, at)
+
+    def state(self, scope, scope_id, at, use_snapshots=True):
+        """
+        Replay one scope's history up to a moment.
+
+        Args:
+            scope: 'session' or 'participant'
+            scope_id: Session or participant id
+            at: Aware datetime; changes recorded after it are ignored
+            use_snapshots: Start from the latest snapshot taken before ``at``
+
+        Returns:
+            AsOfState with ``marks`` ({key id: mark dict}), the last ``audit_id``
+            applied, the snapshot started from and the number of rows replayed
+        """
+        snapshot = None
+        if use_snapshots:
+            snapshot = (
+                AuditSnapshot.scoped.for_organization(self.organization)
+                .filter(scope=scope, scope_id=scope_id, taken_at__lte=at)
+                .order_by('-audit_id')
+                .first()
+            )
+        marks = self._load(snapshot)
+        after = snapshot.audit_id if snapshot else 0
+        last_id, replayed, _ = self._replay(
+            scope, marks, self._history(scope, scope_id, after).filter(changed_at__lte=at),
+        )
+        return AsOfState(
+            marks=marks,
+            audit_id=last_id or (snapshot.audit_id if snapshot else None),
+            snapshot_id=snapshot.id if snapshot else None,
+            replayed=replayed,
+        )
+
+    def _history(self, scope, scope_id, after):
+        column, _ = SCOPE_COLUMNS[scope]
+        # Only presence changes carry the key columns, so no table_name filter is needed
+        return (
+            AuditLog.scoped.for_organization(self.organization)
+            .filter(**{column: scope_id}, id__gt=after)
+            .order_by('id')
+            .values(*REPLAY_FIELDS)
+        )
+
+    @staticmethod
+    def _load(snapshot):
+        if snapshot is None:
+            return {}
+        return {int(key): mark for key, mark in snapshot.state.items()}
+
+    def _replay(self, scope, marks, rows, stop_at=None):
+        """
+        Apply rows to ``marks`` in id order.
+
+        Stops at the first row changed at or after ``stop_at``.
+
+        Returns:
+            Tuple of (last applied audit id, rows applied, latest changed_at applied)
+        """
+        _, key_column = SCOPE_COLUMNS[scope]
+        last_id, replayed, latest = None, 0, None
+        for row in rows.iterator(chunk_size=self.FETCH_CHUNK):
+            if stop_at is not None and row['changed_at'] >= stop_at:
+                break
+            key = row[key_column]
+            if row['action'] == 'delete':
+                marks.pop(key, None)
+            else:
+                marks[key] = {
+                    'presence_state': (row['new_values'] or {}).get('presence_state'),
+                    'record_id': row['record_id'],
+                    'changed_at': row['changed_at'].isoformat(),
+                    'changed_by_id': row['changed_by_id'],
+                    'source_device': row['source_device'],
+                }
+            last_id = row['id']
+            replayed += 1
+            latest = row['changed_at'] if latest is None else max(latest, row['changed_at'])
+        return last_id, replayed, latest
+
+    def take_snapshot(self, scope, scope_id, min_rows, settled_before):
+        """
+        Store a snapshot of a scope if at least ``min_rows`` settled rows follow its latest one.
+
+        Returns:
+            The new AuditSnapshot, or None
+        """
+        snapshots = AuditSnapshot.scoped.for_organization(self.organization).filter(
+            scope=scope, scope_id=scope_id,
+        )
+        previous = snapshots.order_by('-audit_id').first()
+        after = previous.audit_id if previous else 0
+        history = self._history(scope, scope_id, after)
+        if history.filter(changed_at__lt=settled_before).count() < min_rows:
+            return None
+
+        marks = self._load(previous)
+        last_id, replayed, latest = self._replay(scope, marks, history, stop_at=settled_before)
+        if replayed < min_rows:
+            return None
+        return AuditSnapshot.objects.create(
+            organization_id=self.organization.id,
+            scope=scope,
+            scope_id=scope_id,
+            audit_id=last_id,
+            taken_at=max(latest, previous.taken_at) if previous else latest,
+            state={str(key): mark for key, mark in marks.items()},
+        )
+
+    def take_snapshots(self, min_rows=None):
+        """
+        Snapshot every session and participant with enough new history.
+
+        Candidates are the scopes with audit rows since the previous run (the
+        watermark in ``organization.settings['audit_snapshots']``).
+
+        Returns:
+            Number of snapshots stored
+        """
+        min_rows = min_rows or getattr(settings, 'AUDIT_SNAPSHOT_INTERVAL', 500)
+        settled_before = timezone.now() - self.SETTLE_TIME
+        state = (self.organization.settings or {}).get(self.SETTINGS_KEY, {})
+        checked_until = state.get('checked_until', 0)
+
+        rows = AuditLog.scoped.for_organization(self.organization).filter(
+            table_name=self.TABLE_NAME,
+            id__gt=checked_until,
+            changed_at__lt=settled_before,
+        )
+        watermark = rows.order_by('-id').values_list('id', flat=True).first()
+        if watermark is None:
+            return 0
+
+        stored = 0
+        for scope, (column, _) in SCOPE_COLUMNS.items():
+            candidates = list(
+                rows.filter(id__lte=watermark, **{f'{column}__isnull': False})
+                .order_by(column).values_list(column, flat=True).distinct()
+            )
+            # take_snapshot() counts from the scope's previous snapshot, not from the watermark
+            created = sum(
+                self.take_snapshot(scope, scope_id, min_rows, settled_before) is not None
+                for scope_id in candidates
+            )
+            self.log(f"{scope}: {len(candidates)} with new history, {created} snapshots")
+            stored += created
+
+        self.organization.update_settings(**{self.SETTINGS_KEY: {'checked_until': watermark}})
+        return stored
+
+    def backfill_keys(self, chunk_size=1000):
+        """
+        Fill ``session_id``/``participant_id`` of presence audit rows written before the
+        columns existed.
+
+        Rows already hashed into the audit chain are left alone, so run this
+        before the first ``verify_audit_chain``. Stops early while the
+        organization is being moved between shards.
+
+        Returns:
+            Number of rows updated
+        """
+        updated = 0
+        last_id = 0
+        while True:
+            if self.organization.id in organizations_being_moved():
+                self.log(
+                    'organization is being moved between shards, stopping; run again afterwards'
+                )
+                return updated
+            rows = list(
+                AuditLog.scoped.for_organization(self.organization)
+                .filter(
+                    table_name=self.TABLE_NAME, session_id__isnull=True, row_hash='',
+                    id__gt=last_id,
+                )
+                .order_by('id')
+                .values_list('id', 'record_id', 'new_values')[:chunk_size]
+            )
+            if not rows:
+                return updated
+            last_id = rows[-1][0]
+
+            keys = {
+                record_id: (values['session_id'], values['participant_id'])
+                for _, record_id, values in rows
+                if values and 'session_id' in values
+            }
+            missing = {record_id for _, record_id, _ in rows} - set(keys)
+            if missing:
+                keys.update(
+                    (record_id, (session_id, participant_id))
+                    for record_id, session_id, participant_id in PresenceRecord.objects.filter(
+                        id__in=missing,
+                    ).values_list('id', 'session_id', 'participant_id')
+                )
+            missing -= set(keys)
+            if missing:
+                # Records deleted since: their create row still names the keys
+                creates = AuditLog.scoped.for_organization(self.organization).filter(
+                    table_name=self.TABLE_NAME, record_id__in=missing, action='create',
+                ).values_list('record_id', 'session_id', 'participant_id', 'new_values')
+                for record_id, session_id, participant_id, values in creates:
+                    if session_id is not None:
+                        keys[record_id] = (session_id, participant_id)
+                    elif values and 'session_id' in values:
+                        keys[record_id] = (values['session_id'], values['participant_id'])
+
+            if keys:
+                # One UPDATE per chunk; rows of records without known keys stay unkeyed
+                updated += AuditLog.objects.filter(
+                    id__in=[audit_id for audit_id, record_id, _ in rows if record_id in keys],
+                ).update(
+                    session_id=Case(*(When(record_id=record_id, then=Value(session_id))
+                                      for record_id, (session_id, _) in keys.items())),
+                    participant_id=Case(*(When(record_id=record_id, then=Value(participant_id))
+                                          for record_id, (_, participant_id) in keys.items())),
+                )
+            self.log(f"{updated} audit rows keyed")
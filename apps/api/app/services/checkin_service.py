@@ -0,0 +1,483 @@
+"""
+High-throughput badge/QR check-in.
+
+Gate scanners resolve a badge ``identifier`` against a warm in-memory index of
+the session roster, append the scan to an in-process log and return
+immediately. The log is written to the database in micro-batches (one bulk
+upsert plus one bulk audit insert per session), either when the batch fills up
+or when the oldest buffered scan reaches the flush interval.
+
+A session whose batch fails is retried on later flushes; after
+``CHECKIN_FLUSH_MAX_ATTEMPTS`` failures its scans are written to the
+dead-letter store (``checkin-dead-letters/`` in the default storage) for
+replay, and its index is dropped so the roster is re-read from the database.
+Flush errors are logged, never raised into the scanning request.
+
+Scans are acknowledged once buffered. Buffered scans are flushed when the
+process exits normally, including on SIGTERM (``exit_on_sigterm()``), so
+restarts and deploys do not lose them; a crash or SIGKILL loses at most the
+scans of the last ``CHECKIN_FLUSH_INTERVAL_SECONDS`` (or ``CHECKIN_BATCH_SIZE``
+scans) of that worker.
+"""
+import atexit
+import json
+import logging
+import signal
+import threading
+import time
+from collections import OrderedDict, defaultdict, namedtuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, router, transaction
+from django.utils import timezone
+
+from app.core.report_cache import bump_presence_versions
+from app.core.routers import use_primary
+from app.core.sharding import organization_context
+from app.models import AuditLog, GroupMembership, Participant, PresenceRecord, PresenceState
+
+logger = logging.getLogger(__name__)
+
+CHECKIN_STATE_CODE = 'present'
+DEAD_LETTER_DIR = 'checkin-dead-letters'
+
+Scan = namedtuple('Scan', [
+    'session_id',
+    'organization_id',
+    'group_id',
+    'participant_id',
+    'presence_state_id',
+    'recorded_by_id',
+    'source_device_id',
+    'scanned_at',
+])
+
+
+class CheckinIndex:
+    """Hash index from badge identifier to participant for one session."""
+
+    def __init__(self, session):
+        self.session_id = session.id
+        self.organization_id = session.organization_id
+        self.group_id = session.group_id
+        self.is_completed = session.is_completed
+        self.built_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        organization = session.organization
+        states = PresenceState.get_default_states(organization, organization.domain_type)
+        self.state_codes = {state.id: state.code for state in states}
+        self.present_state_id = next(
+            (state.id for state in states if state.code == CHECKIN_STATE_CODE),
+            None,
+        )
+
+        # identifier -> (participant_id, full_name)
+        self.participants = {}
+        rows = GroupMembership.objects.filter(
+            group_id=self.group_id,
+            participant__is_active=True,
+        ).values_list(
+            'participant__identifier',
+            'participant_id',
+            'participant__first_name',
+            'participant__last_name',
+        )
+        for identifier, participant_id, first_name, last_name in rows:
+            self.participants[identifier] = (participant_id, f"{first_name} {last_name}".strip())
+
+        self.checked_in = set(
+            PresenceRecord.objects.filter(
+                session_id=self.session_id,
+                presence_state_id=self.present_state_id,
+            ).values_list('participant_id', flat=True)
+        )
+
+    def resolve(self, identifier):
+        """
+        Look up a badge identifier.
+
+        Misses fall back to a single database lookup so participants added to
+        the group after the index was warmed can still check in.
+        """
+        entry = self.participants.get(identifier)
+        if entry is not None:
+            return entry
+
+        row = Participant.scoped.for_organization(self.organization_id).filter(
+            identifier=identifier,
+            is_active=True,
+            memberships__group_id=self.group_id,
+        ).values_list('id', 'first_name', 'last_name').first()
+        if row is None:
+            return None
+
+        participant_id, first_name, last_name = row
+        entry = (participant_id, f"{first_name} {last_name}".strip())
+        self.participants[identifier] = entry
+        return entry
+
+    def mark(self, participant_id):
+        """Mark a participant as checked in. Returns False for repeat scans."""
+        with self._lock:
+            if participant_id in self.checked_in:
+                return False
+            self.checked_in.add(participant_id)
+            return True
+
+
+class ScanLog:
+    """In-process append-only buffer of scans, flushed to the database in batches."""
+
+    def __init__(self, batch_size=None, flush_interval=None):
+        self.batch_size = batch_size or getattr(settings, 'CHECKIN_BATCH_SIZE', 200)
+        self.flush_interval = flush_interval or getattr(
+            settings, 'CHECKIN_FLUSH_INTERVAL_SECONDS', 1.0
+        )
+        self.max_attempts = getattr(settings, 'CHECKIN_FLUSH_MAX_ATTEMPTS', 5)
+        self._scans = []
+        self._attempts = defaultdict(int)  # session id -> consecutive failed flushes
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._flush_at_exit = False
+
+    def __len__(self):
+        return len(self._scans)
+
+    def append(self, scan):
+        with self._lock:
+            if not self._scans:
+                self._oldest = time.monotonic()
+            self._scans.append(scan)
+
+    def is_due(self):
+        if not self._scans:
+            return False
+        return (
+            len(self._scans) >= self.batch_size
+            or time.monotonic() - self._oldest >= self.flush_interval
+        )
+
+    def flush_if_due(self):
+        if self.is_due():
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """
+        Write all buffered scans, one transaction per session.
+
+        A failing session does not hold back the others: its scans are put
+        back for the next flush, or dead-lettered once they have failed
+        ``max_attempts`` times. Never raises.
+
+        Returns:
+            Number of scans written
+        """
+        with self._flush_lock:
+            with self._lock:
+                scans, self._scans = self._scans, []
+                self._oldest = None
+            if not scans:
+                return 0
+
+            by_session = defaultdict(dict)
+            for scan in scans:
+                by_session[scan.session_id].setdefault(scan.participant_id, scan)
+
+            written, retry = 0, []
+            for session_id, session_scans in by_session.items():
+                try:
+                    self._write_session_batch(session_scans)
+                except Exception:
+                    self._attempts[session_id] += 1
+                    attempts = self._attempts[session_id]
+                    logger.warning(
+                        "Failed to flush %d check-in scans of session %s (attempt %d of %d)",
+                        len(session_scans), session_id, attempts, self.max_attempts, exc_info=True,
+                    )
+                    if attempts < self.max_attempts:
+                        retry.extend(session_scans.values())
+                    else:
+                        self._dead_letter(session_id, list(session_scans.values()))
+                        del self._attempts[session_id]
+                    continue
+                self._attempts.pop(session_id, None)
+                written += len(session_scans)
+
+            if retry:
+                with self._lock:
+                    self._scans[:0] = retry
+                    self._oldest = time.monotonic()
+            return written
+
+    def _dead_letter(self, session_id, scans):
+        """Store scans that keep failing so they can be replayed, and forget them in the index."""
+        logger.error(
+            "Moving %d check-in scans of session %s to the dead-letter store",
+            len(scans), session_id,
+        )
+        name = f"{DEAD_LETTER_DIR}/{timezone.now():%Y%m%dT%H%M%S%f}-{session_id}.json"
+        try:
+            default_storage.save(name, ContentFile(json.dumps(
+                [scan._asdict() for scan in scans], default=str,
+            ).encode()))
+        except Exception:
+            logger.exception("Failed to store dead-lettered check-in scans: %r", scans)
+        # The index counts these participants as checked in; rebuild it from the database
+        CheckinService.drop_index(session_id)
+
+    def _write_session_batch(self, scans):
+        """Upsert presence records and audit logs for one session's scans."""
+        first = next(iter(scans.values()))
+        session_id = first.session_id
+        present_state_id = first.presence_state_id
+        participant_ids = list(scans)
+
+        # Flushes may run on the background thread, outside any request: activate the
+        # organization's shard and read existing marks from the primary explicitly.
+        with (
+            organization_context(first.organization_id),
+            use_primary(),
+            transaction.atomic(using=router.db_for_write(PresenceRecord)),
+        ):
+            existing = {
+                participant_id: (record_id, state_id)
+                for record_id, participant_id, state_id in PresenceRecord.objects.filter(
+                    session_id=session_id,
+                    participant_id__in=participant_ids,
+                ).values_list('id', 'participant_id', 'presence_state_id')
+            }
+
+            PresenceRecord.objects.bulk_create(
+                [
+                    PresenceRecord(
+                        organization_id=scan.organization_id,
+                        session_id=session_id,
+                        participant_id=scan.participant_id,
+                        presence_state_id=present_state_id,
+                        recorded_by_id=scan.recorded_by_id,
+                        source_device_id=scan.source_device_id,
+                    )
+                    for scan in scans.values()
+                    if scan.participant_id not in existing
+                ],
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+
+            changed = defaultdict(list)
+            for participant_id, (record_id, state_id) in existing.items():
+                if state_id != present_state_id:
+                    scan = scans[participant_id]
+                    changed[(scan.recorded_by_id, scan.source_device_id)].append(record_id)
+            for (recorded_by_id, source_device_id), record_ids in changed.items():
+                PresenceRecord.objects.filter(id__in=record_ids).update(
+                    presence_state_id=present_state_id,
+                    recorded_by_id=recorded_by_id,
+                    source_device_id=source_device_id,
+                    updated_at=timezone.now(),
+                )
+
+            created_ids = dict(
+                PresenceRecord.objects.filter(
+                    session_id=session_id,
+                    participant_id__in=[pid for pid in participant_ids if pid not in existing],
+                ).values_list('participant_id', 'id')
+            ) if len(existing) < len(participant_ids) else {}
+
+            old_state_ids = {state_id for _, state_id in existing.values()}
+            state_codes = dict(
+                PresenceState.objects.filter(
+                    id__in=old_state_ids | {present_state_id},
+                ).values_list('id', 'code')
+            )
+            present_code = state_codes.get(present_state_id, CHECKIN_STATE_CODE)
+
+            audit_logs = []
+            for participant_id, record_id in created_ids.items():
+                scan = scans[participant_id]
+                audit_logs.append(AuditLog(
+                    organization_id=scan.organization_id,
+                    table_name='presence_records',
+                    record_id=record_id,
+                    action='create',
+                    changed_by_id=scan.recorded_by_id,
+                    session_id=session_id,
+                    participant_id=participant_id,
+                    new_values={'presence_state': present_code},
+                    source_device=scan.source_device_id,
+                ))
+            for participant_id, (record_id, state_id) in existing.items():
+                if state_id == present_state_id:
+                    continue
+                scan = scans[participant_id]
+                audit_logs.append(AuditLog(
+                    organization_id=scan.organization_id,
+                    table_name='presence_records',
+                    record_id=record_id,
+                    action='update',
+                    changed_by_id=scan.recorded_by_id,
+                    session_id=session_id,
+                    participant_id=participant_id,
+                    old_values={'presence_state': state_codes.get(state_id)},
+                    new_values={'presence_state': present_code},
+                    source_device=scan.source_device_id,
+                ))
+            AuditLog.objects.bulk_create(audit_logs, batch_size=self.batch_size)
+
+        # Cached reports over this group's marks are stale once the batch is committed
+        bump_presence_versions(first.organization_id, [first.group_id])
+
+    def ensure_flusher(self):
+        """
+        Start a daemon thread that flushes scans left behind when traffic stops.
+
+        Also flushes the log when the process exits normally.
+        """
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            if not self._flush_at_exit:
+                atexit.register(self.flush)
+                self._flush_at_exit = True
+            self._flusher = threading.Thread(
+                target=self._run_flusher,
+                name='checkin-scan-flusher',
+                daemon=True,
+            )
+            self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                close_old_connections()
+                self.flush_if_due()
+            except Exception:
+                logger.exception("Failed to flush check-in scans")
+
+
+def _exit(signum, frame):
+    raise SystemExit(128 + signum)
+
+
+def exit_on_sigterm():
+    """
+    Make SIGTERM exit normally, running exit hooks, when nothing else handles it.
+
+    The default action kills the process without flushing buffered scans.
+    Servers with their own graceful shutdown (gunicorn, uvicorn) keep their
+    handler. Signal handlers can only be installed from the main thread.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) is signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, _exit)
+
+
+class CheckinService:
+    """Resolve badge scans and record check-ins for a session."""
+
+    _indexes = OrderedDict()
+    _indexes_lock = threading.Lock()
+
+    def __init__(self, log=None):
+        self.log = log if log is not None else scan_log  # An empty ScanLog is falsy
+
+    @classmethod
+    def get_index(cls, session_id, organization_id):
+        """
+        Get the warm index for a session of an organization.
+
+        Built on first use and again after expiry.
+
+        Raises:
+            Session.DoesNotExist: The session does not exist in this organization
+        """
+        from app.models import Session
+
+        ttl = getattr(settings, 'CHECKIN_INDEX_TTL_SECONDS', 300)
+        max_sessions = getattr(settings, 'CHECKIN_INDEX_MAX_SESSIONS', 64)
+
+        with cls._indexes_lock:
+            index = cls._indexes.get(session_id)
+            if index is not None and time.monotonic() - index.built_at < ttl:
+                if index.organization_id != organization_id:
+                    raise Session.DoesNotExist
+                cls._indexes.move_to_end(session_id)
+                return index
+
+        # Scoped lookup: another organization's roster is never loaded
+        session = Session.scoped.for_organization(organization_id).get(pk=session_id)
+        index = CheckinIndex(session)
+
+        with cls._indexes_lock:
+            cls._indexes[session_id] = index
+            cls._indexes.move_to_end(session_id)
+            while len(cls._indexes) > max_sessions:
+                cls._indexes.popitem(last=False)
+        return index
+
+    @classmethod
+    def drop_index(cls, session_id):
+        with cls._indexes_lock:
+            cls._indexes.pop(session_id, None)
+
+    def check_in(self, index, identifiers, user=None, device_id=None):
+        """
+        Check in a batch of scanned identifiers.
+
+        Args:
+            index: CheckinIndex of the session being scanned into
+            identifiers: Scanned badge identifiers
+            user: User operating the gate
+            device_id: Scanner device identifier
+
+        Returns:
+            One result dict per identifier with status ``checked_in``,
+            ``duplicate`` or ``unknown``
+        """
+        scanned_at = timezone.now()
+        recorded_by_id = user.id if user is not None else None
+        results = []
+
+        for identifier in identifiers:
+            entry = index.resolve(identifier)
+            if entry is None:
+                results.append({'identifier': identifier, 'status': 'unknown'})
+                continue
+
+            participant_id, name = entry
+            if index.mark(participant_id):
+                self.log.append(Scan(
+                    session_id=index.session_id,
+                    organization_id=index.organization_id,
+                    group_id=index.group_id,
+                    participant_id=participant_id,
+                    presence_state_id=index.present_state_id,
+                    recorded_by_id=recorded_by_id,
+                    source_device_id=device_id,
+                    scanned_at=scanned_at,
+                ))
+                status = 'checked_in'
+            else:
+                status = 'duplicate'
+
+            results.append({
+                'identifier': identifier,
+                'status': status,
+                'participant': {'id': participant_id, 'name': name},
+            })
+
+        self.log.flush_if_due()
+        return results
+
+
+scan_log = ScanLog()
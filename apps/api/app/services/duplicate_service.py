@@ -0,0 +1,289 @@
+"""
+Duplicate participant detection.
+
+Finds participants that are probably the same person registered twice (a new
+identifier, a typo in the name) without comparing every pair of an
+organization:
+
+1. Blocking: each participant gets a few cheap keys — Soundex of the last name
+   plus first initial, the same with first and last swapped, and the date of
+   birth. Only participants sharing a key are compared.
+2. Scoring: within a block, names become character-bigram vectors and one
+   matrix product gives the cosine similarity of every changed participant
+   against the whole block. Known, different dates of birth rule a pair out;
+   equal ones raise the score.
+3. Blocks are scored in a process pool; likely pairs become ``data_quality``
+   notifications for the organization's administrators.
+
+Runs are incremental: only participants changed since the last run (the
+watermark in ``organization.settings['duplicate_detection']``) are compared,
+against everyone in their blocks.
+"""
+import multiprocessing
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from app.core.text import fold, soundex
+from app.models import Notification, Participant, User
+
+DuplicateScanResult = namedtuple(
+    'DuplicateScanResult', 'participants changed blocks comparisons pairs notified'
+)
+
+# Rows of a block compared against it at once, bounding the similarity matrix
+CHANGED_CHUNK = 512
+
+
+def blocking_keys(first_name, last_name, date_of_birth):
+    """Keys under which a participant is compared with others."""
+    first, last = fold(first_name), fold(last_name)
+    keys = []
+    # Unprefixed, so swapped first and last names land in the same block
+    if last:
+        keys.append(f'n:{soundex(last)}:{first[:1]}')
+    if first:
+        keys.append(f'n:{soundex(first)}:{last[:1]}')
+    if date_of_birth:
+        keys.append(f'd:{date_of_birth.isoformat()}')
+    return keys
+
+
+def name_key(first_name, last_name):
+    """Folded name words in sorted order, so word order does not matter."""
+    return ' '.join(sorted(fold(f'{first_name} {last_name}').split()))
+
+
+def _bigram_matrix(names):
+    """Row-normalized character-bigram counts, one row per name."""
+    vocabulary = {}
+    rows, columns = [], []
+    for row, name in enumerate(names):
+        padded = f' {name} '
+        for position in range(len(padded) - 1):
+            rows.append(row)
+            columns.append(vocabulary.setdefault(padded[position:position + 2], len(vocabulary)))
+    matrix = np.zeros((len(names), max(1, len(vocabulary))), dtype=np.float32)
+    np.add.at(matrix, (rows, columns), 1)
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1
+    return matrix / norms[:, None]
+
+
+def score_block(ids, names, dobs, changed, threshold, dob_bonus):
+    """
+    Similar pairs in one block.
+
+    Args:
+        ids: Participant ids
+        names: ``name_key()`` of each participant
+        dobs: Date of birth ordinals, -1 when unknown
+        changed: Which participants changed since the last run
+        threshold: Minimum similarity of a reported pair
+        dob_bonus: Added to the similarity when both dates of birth are equal
+
+    Returns:
+        List of ``(lower id, higher id, similarity)``
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    dobs = np.asarray(dobs, dtype=np.int64)
+    matrix = _bigram_matrix(names)
+    changed_rows = np.flatnonzero(changed)
+    changed_mask = np.asarray(changed, dtype=bool)
+
+    pairs = []
+    for start in range(0, len(changed_rows), CHANGED_CHUNK):
+        rows = changed_rows[start:start + CHANGED_CHUNK]
+        similarity = matrix[rows] @ matrix.T
+
+        row_dobs = dobs[rows][:, None]
+        known = (row_dobs >= 0) & (dobs[None, :] >= 0)
+        similarity = np.where(known & (row_dobs != dobs[None, :]), 0.0, similarity)
+        similarity = np.where(
+            known & (row_dobs == dobs[None, :]), similarity + dob_bonus, similarity,
+        )
+
+        row_ids = ids[rows][:, None]
+        # Not against itself, and pairs of two changed participants only once
+        similarity[row_ids == ids[None, :]] = 0.0
+        similarity[changed_mask[None, :] & (row_ids > ids[None, :])] = 0.0
+
+        for row, column in np.argwhere(similarity >= threshold):
+            first, second = int(ids[rows[row]]), int(ids[column])
+            score = min(1.0, float(similarity[row, column]))
+            pairs.append((min(first, second), max(first, second), score))
+    return pairs
+
+
+def score_blocks(blocks, threshold, dob_bonus):
+    """Pool entry point: score a batch of blocks."""
+    return [pair for block in blocks for pair in score_block(*block, threshold, dob_bonus)]
+
+
+class DuplicateDetectionService:
+    """Incremental duplicate participant detection for one organization."""
+
+    SETTINGS_KEY = 'duplicate_detection'
+    DEFAULT_THRESHOLD = 0.85
+    DOB_BONUS = 0.1
+    # Comparisons per pool task; small jobs are scored in this process
+    BATCH_COMPARISONS = 200_000
+
+    def __init__(self, organization, workers=None, threshold=None, log=None):
+        self.organization = organization
+        self.workers = workers
+        self.threshold = threshold if threshold is not None else self.DEFAULT_THRESHOLD
+        self.log = log or (lambda message: None)
+
+    def run(self, full=False):
+        """
+        Compare participants changed since the last run and notify about likely duplicates.
+
+        Args:
+            full: Ignore the watermark and compare every participant
+
+        Returns:
+            DuplicateScanResult
+        """
+        started_at = timezone.now()
+        since = None if full else self._watermark()
+
+        participants = {}
+        blocks = defaultdict(list)
+        changed = set()
+        rows = (
+            Participant.scoped.for_organization(self.organization)
+            .filter(is_active=True)
+            .values_list(
+                'id', 'first_name', 'last_name', 'identifier', 'date_of_birth', 'updated_at',
+            )
+        )
+        for pk, first_name, last_name, identifier, date_of_birth, updated_at in rows.iterator(
+            chunk_size=5000,
+        ):
+            participants[pk] = (first_name, last_name, identifier, date_of_birth)
+            if since is None or updated_at >= since:
+                changed.add(pk)
+            for key in blocking_keys(first_name, last_name, date_of_birth):
+                blocks[key].append(pk)
+
+        work = [
+            members for members in blocks.values()
+            if len(members) > 1 and changed.intersection(members)
+        ]
+        comparisons = sum(len(members) * len(changed.intersection(members)) for members in work)
+        self.log(
+            f"{len(participants)} participants, {len(changed)} changed, "
+            f"{len(work)} blocks, {comparisons} comparisons"
+        )
+
+        scores = {}
+        for first, second, similarity in self._score(work, participants, changed):
+            scores[(first, second)] = max(similarity, scores.get((first, second), 0.0))
+
+        notified = self._notify(scores, participants)
+        self._set_watermark(started_at, len(scores))
+        return DuplicateScanResult(
+            participants=len(participants),
+            changed=len(changed),
+            blocks=len(work),
+            comparisons=comparisons,
+            pairs=len(scores),
+            notified=notified,
+        )
+
+    def _score(self, work, participants, changed):
+        batches, batch, size = [], [], 0
+        for members in work:
+            batch.append((
+                members,
+                [name_key(participants[pk][0], participants[pk][1]) for pk in members],
+                [participants[pk][3].toordinal() if participants[pk][3] else -1 for pk in members],
+                [pk in changed for pk in members],
+            ))
+            size += len(members) * sum(pk in changed for pk in members)
+            if size >= self.BATCH_COMPARISONS:
+                batches.append(batch)
+                batch, size = [], 0
+        if batch:
+            batches.append(batch)
+
+        if len(batches) <= 1 or self.workers == 1:
+            return [
+                pair for batch in batches
+                for pair in score_blocks(batch, self.threshold, self.DOB_BONUS)
+            ]
+
+        # Workers only compute; they must not share the parent's database sockets
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('fork'),
+        ) as pool:
+            futures = [
+                pool.submit(score_blocks, batch, self.threshold, self.DOB_BONUS)
+                for batch in batches
+            ]
+            return [pair for future in futures for pair in future.result()]
+
+    @staticmethod
+    def link(first, second):
+        return f'/participants/{first}/?duplicate_of={second}'
+
+    def _notify(self, scores, participants):
+        """One notification per new pair and administrator. Returns the number of new pairs."""
+        links = {self.link(first, second): (first, second) for first, second in scores}
+        existing = set()
+        link_list = list(links)
+        for start in range(0, len(link_list), 500):
+            existing.update(
+                Notification.scoped.for_organization(self.organization)
+                .filter(notification_type='data_quality', link__in=link_list[start:start + 500])
+                .values_list('link', flat=True)
+            )
+        new = [link for link in link_list if link not in existing]
+        if not new:
+            return 0
+
+        recipients = list(
+            User.objects.filter(
+                organization=self.organization, role='administrator', is_active=True,
+            )
+            .values_list('id', flat=True)
+        )
+        notifications = []
+        for link in new:
+            first, second = links[link]
+            first_name, last_name, identifier, _ = participants[first]
+            other_first, other_last, other_identifier, _ = participants[second]
+            message = (
+                f"{first_name} {last_name} ({identifier}) and {other_first} {other_last} "
+                f"({other_identifier}) may be the same person "
+                f"(similarity {scores[(first, second)]:.0%})."
+            )
+            notifications.extend(
+                Notification(
+                    organization_id=self.organization.id,
+                    user_id=user_id,
+                    notification_type='data_quality',
+                    title='Possible duplicate participant',
+                    message=message,
+                    link=link,
+                )
+                for user_id in recipients
+            )
+        Notification.objects.bulk_create(notifications, batch_size=1000)
+        return len(new)
+
+    def _watermark(self):
+        state = (self.organization.settings or {}).get(self.SETTINGS_KEY, {})
+        return parse_datetime(state['checked_until']) if state.get('checked_until') else None
+
+    def _set_watermark(self, checked_until, pairs):
+        self.organization.update_settings(**{self.SETTINGS_KEY: {
+            'checked_until': checked_until.isoformat(),
+            'pairs': pairs,
+        }})
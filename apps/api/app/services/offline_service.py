@@ -0,0 +1,144 @@
+"""
+Offline session packs.
+
+A session pack is everything a device needs to run roll call for one session
+without connectivity: the roster, the organization's presence states and the
+marks recorded so far. Packs are versioned by the newest ``updated_at`` (or
+``joined_at``) watermark they contain, so devices can ask for only what changed
+since the version they already hold.
+
+Deleting a membership or a mark leaves no watermark behind, so the pack's ETag
+also carries the number of members and marks, and delta packs list the ids
+still present (``roster_ids``, ``marked_ids``) for devices to drop the rest.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from app.models import GroupMembership, Participant, PresenceRecord, PresenceState
+
+PackVersion = namedtuple('PackVersion', 'version members marks')
+
+
+def to_version(value):
+    """Convert a watermark timestamp to an integer version (microseconds since epoch)."""
+    if value is None:
+        return 0
+    return int(value.timestamp() * 1_000_000)
+
+
+def from_version(version):
+    """Convert an integer version back to a UTC timestamp."""
+    return datetime.fromtimestamp(version / 1_000_000, tz=dt_timezone.utc)
+
+
+class SessionPackService:
+    """Builds compact full and delta roster snapshots for a session."""
+
+    PARTICIPANT_COLUMNS = ('id', 'identifier', 'first_name', 'last_name', 'is_active')
+    STATE_COLUMNS = ('id', 'code', 'label', 'color', 'sort_order')
+    MARK_COLUMNS = ('participant_id', 'presence_state_id', 'recorded_at', 'recorded_by_id')
+
+    def __init__(self, session):
+        self.session = session
+
+    def _roster(self):
+        return Participant.objects.filter(memberships__group_id=self.session.group_id)
+
+    def _states(self):
+        return PresenceState.scoped.for_organization(self.session.organization_id).filter(
+            domain=self.session.organization.domain_type,
+        )
+
+    def _marks(self):
+        return PresenceRecord.objects.filter(session_id=self.session.id)
+
+    def get_version(self):
+        """
+        Current pack version: the newest change watermark across all pack contents.
+
+        Cheap enough to answer ``If-None-Match`` without building the payload.
+
+        Returns:
+            PackVersion of the watermark ``version`` (what devices pass as ``since``)
+            and the ``members``/``marks`` counts, which change when rows are deleted
+        """
+        memberships = GroupMembership.objects.filter(
+            group_id=self.session.group_id
+        ).aggregate(value=Max('joined_at'), count=Count('id'))
+        marks = self._marks().aggregate(value=Max('updated_at'), count=Count('id'))
+        watermarks = [
+            self._roster().aggregate(value=Max('updated_at'))['value'],
+            memberships['value'],
+            self._states().aggregate(value=Max('updated_at'))['value'],
+            marks['value'],
+        ]
+        return PackVersion(
+            version=max(to_version(value) for value in watermarks),
+            members=memberships['count'],
+            marks=marks['count'],
+        )
+
+    @staticmethod
+    def _table(queryset, columns):
+        return {
+            'columns': list(columns),
+            'rows': [list(row) for row in queryset.values_list(*columns)],
+        }
+
+    def build(self, version, since=None):
+        """
+        Build the pack payload.
+
+        Args:
+            version: Version returned by get_version()
+            since: Version the device already holds; only changes after it are returned
+
+        Returns:
+            Dict with column/row tables for participants, presence states and marks.
+            Delta packs also carry ``roster_ids`` and ``marked_ids`` (participants
+            with a mark) so devices can drop removed members and deleted marks.
+        """
+        participants = self._roster()
+        states = self._states()
+        marks = self._marks()
+
+        if since is not None:
+            # Overlap the window so rows committed slightly out of timestamp order
+            # are not skipped; devices apply pack rows idempotently.
+            overlap = timedelta(seconds=getattr(settings, 'SESSION_PACK_DELTA_OVERLAP_SECONDS', 5))
+            watermark = from_version(since) - overlap
+            joined_ids = GroupMembership.objects.filter(
+                group_id=self.session.group_id,
+                joined_at__gt=watermark,
+            ).values('participant_id')
+            participants = participants.filter(updated_at__gt=watermark) | participants.filter(
+                id__in=joined_ids
+            )
+            states = states.filter(updated_at__gt=watermark)
+            marks = marks.filter(updated_at__gt=watermark)
+
+        pack = {
+            'session': {
+                'id': self.session.id,
+                'name': self.session.name,
+                'group_id': self.session.group_id,
+                'scheduled_start_at': self.session.scheduled_start_at,
+                'scheduled_end_at': self.session.scheduled_end_at,
+            },
+            'version': version,
+            'since': since,
+            'participants': self._table(participants.distinct(), self.PARTICIPANT_COLUMNS),
+            'presence_states': self._table(states.order_by('sort_order'), self.STATE_COLUMNS),
+            'marks': self._table(marks, self.MARK_COLUMNS),
+        }
+        if since is not None:
+            pack['roster_ids'] = list(
+                GroupMembership.objects.filter(
+                    group_id=self.session.group_id
+                ).values_list('participant_id', flat=True)
+            )
+            pack['marked_ids'] = list(self._marks().values_list('participant_id', flat=True))
+        return pack
@@ -0,0 +1,136 @@
+"""
+Participant search for roster screens and kiosks.
+
+Identifiers are matched by prefix against ``Participant.identifier_folded``;
+names against ``ParticipantSearchToken`` rows, one per accent- and case-folded
+word of the first or last name. Each lookup is a bounded range scan on an
+``(organization, <folded column>)`` index, so response time does not grow with
+the size of the organization.
+"""
+from django.db.models import Exists, OuterRef
+
+from app.core.text import fold
+from app.models import Participant, ParticipantSearchToken
+
+RESULT_FIELDS = ('id', 'identifier', 'first_name', 'last_name', 'is_active', 'identifier_folded')
+
+
+class ParticipantSearchService:
+    """Ranked prefix search over participant names and identifiers."""
+
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+    # Token rows read for the first word; several words of one name can match
+    CANDIDATE_FACTOR = 5
+
+    # Name matches score below identifier matches: exact word, then word prefix
+    LAST_NAME_WEIGHTS = (30, 20)
+    FIRST_NAME_WEIGHTS = (25, 15)
+    IDENTIFIER_EXACT = 100
+    IDENTIFIER_PREFIX = 80
+
+    def __init__(self, organization):
+        self.organization = organization
+
+    def search(self, query, limit=None, group_id=None, include_inactive=False):
+        """
+        Find participants by identifier or name.
+
+        The whole query must prefix the identifier, or every word must prefix
+        some word of the first or last name.
+
+        Args:
+            query: Free text, e.g. ``"smi jo"`` or ``"2024-00"``
+            limit: Maximum number of results
+            group_id: Only members of this group
+            include_inactive: Also return inactive participants
+
+        Returns:
+            List of result dicts, best match first
+        """
+        terms = fold(query).split()
+        if not terms:
+            return []
+        limit = min(limit or self.DEFAULT_LIMIT, self.MAX_LIMIT)
+        folded_query = ' '.join(terms)
+
+        base = Participant.scoped.for_organization(self.organization)
+        if not include_inactive:
+            base = base.filter(is_active=True)
+        if group_id is not None:
+            base = base.filter(memberships__group_id=group_id)
+
+        candidates = {
+            row['id']: row
+            for row in base.filter(identifier_folded__istartswith=folded_query)
+            .order_by('identifier_folded').values(*RESULT_FIELDS)[:limit]
+        }
+
+        # Every filter applies before the slice, so participants excluded later
+        # (inactive, other groups, missing a later term) cannot use up the limit.
+        # Evaluated separately: MySQL does not support LIMIT in IN subqueries.
+        tokens = ParticipantSearchToken.scoped.for_organization(self.organization)
+        name_tokens = tokens.filter(token__istartswith=terms[0])
+        if not include_inactive:
+            name_tokens = name_tokens.filter(participant__is_active=True)
+        if group_id is not None:
+            name_tokens = name_tokens.filter(participant__memberships__group_id=group_id)
+        for term in terms[1:]:
+            name_tokens = name_tokens.filter(Exists(
+                tokens.filter(participant_id=OuterRef('participant_id'), token__istartswith=term)
+            ))
+        name_ids = list(
+            name_tokens.order_by('token', 'participant_id')
+            .values_list('participant_id', flat=True)[:limit * self.CANDIDATE_FACTOR]
+        )
+        if name_ids:
+            for row in base.filter(id__in=set(name_ids) - set(candidates)).values(*RESULT_FIELDS):
+                candidates.setdefault(row['id'], row)
+
+        ranked = []
+        for row in candidates.values():
+            row['first_name_folded'] = fold(row['first_name'])
+            row['last_name_folded'] = fold(row['last_name'])
+            score = self._score(row, terms, folded_query)
+            if score:
+                ranked.append((
+                    -score, row['last_name_folded'], row['first_name_folded'], row['id'], row,
+                ))
+        ranked.sort(key=lambda entry: entry[:4])
+
+        return [
+            {
+                'id': row['id'],
+                'identifier': row['identifier'],
+                'first_name': row['first_name'],
+                'last_name': row['last_name'],
+                'is_active': row['is_active'],
+                'score': -negative_score,
+            }
+            for negative_score, _, _, _, row in ranked[:limit]
+        ]
+
+    def _score(self, row, terms, folded_query):
+        if row['identifier_folded'] == folded_query:
+            return self.IDENTIFIER_EXACT
+        if row['identifier_folded'].startswith(folded_query):
+            return self.IDENTIFIER_PREFIX
+
+        names = (
+            (row['last_name_folded'].split(), self.LAST_NAME_WEIGHTS),
+            (row['first_name_folded'].split(), self.FIRST_NAME_WEIGHTS),
+        )
+        total = 0
+        for term in terms:
+            best = 0
+            for words, (exact, prefix) in names:
+                for word in words:
+                    if word == term:
+                        best = max(best, exact)
+                    elif word.startswith(term):
+                        best = max(best, prefix)
+            if not best:
+                return 0
+            total += best
+        # Average, so longer queries do not outrank identifier matches
+        return round(total / len(terms))
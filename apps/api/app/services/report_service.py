@@ -0,0 +1,186 @@
+"""
+Attendance reports.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, F, FilteredRelation, Q
+from django.utils import timezone
+
+from app.core.caching import get_versions
+from app.core.report_cache import presence_scope, report_cache
+from app.models import Group, GroupMembership, Participant, PresenceRecord, PresenceState, Session
+
+ABSENTEE_FIELDS = ('id', 'identifier', 'first_name', 'last_name')
+
+# Data an attendance report is computed from, besides the group's marks
+ATTENDANCE_SCOPES = ('groups', 'participants', 'presence_states', 'sessions')
+
+
+def group_subtree_ids(organization_id, group_id):
+    """
+    Ids of a group and all its active descendants, root first.
+
+    The organization's group tree is read in one query and cached until a
+    group changes (``groups`` version); cycles in ``parent`` are ignored.
+    """
+    versions, _ = get_versions(organization_id, ['groups'])
+    key = f'group_tree_{organization_id}_{versions[0]}'
+    children = cache.get(key)
+    if children is None:
+        children = defaultdict(list)
+        for pk, parent_id in (
+            Group.scoped.for_organization(organization_id)
+            .filter(is_active=True, parent__isnull=False)
+            .values_list('id', 'parent_id')
+        ):
+            children[parent_id].append(pk)
+        children = dict(children)
+        cache.set(key, children, timeout=3600)
+
+    ids = [group_id]
+    seen = {group_id}
+    for parent_id in ids:
+        for child_id in children.get(parent_id, ()):
+            if child_id not in seen:
+                seen.add(child_id)
+                ids.append(child_id)
+    return ids
+
+
+class AbsenteeReportService:
+    """Participants of a session's group tree who are marked absent or not marked at all."""
+
+    def __init__(self, organization):
+        self.organization = organization
+
+    def absentees(self, session):
+        """
+        Absentees of a session as one set-based query.
+
+        Members of the session's group and its descendant groups are anti-joined
+        with the session's presence records (``LEFT JOIN ... IS NULL``) and
+        combined with the members marked with an absent state. Rows are
+        ``ABSENTEE_FIELDS`` plus ``state`` (``None`` when unmarked), ordered by
+        name; iterate with ``.iterator()`` to stream them.
+        """
+        group_ids = group_subtree_ids(self.organization.id, session.group_id)
+        return (
+            Participant.scoped.for_organization(self.organization)
+            # A semi-join driven by the roster, not by every participant of the organization
+            .filter(
+                id__in=GroupMembership.objects.filter(group_id__in=group_ids)
+                .values('participant_id'),
+                is_active=True,
+            )
+            .annotate(mark=FilteredRelation(
+                'presence_records', condition=Q(presence_records__session_id=session.id),
+            ))
+            .filter(
+                Q(mark__isnull=True)
+                | Q(mark__presence_state__code__in=PresenceState.ABSENT_CODES)
+            )
+            .values(*ABSENTEE_FIELDS, state=F('mark__presence_state__code'))
+            .order_by('last_name', 'first_name', 'id')
+        )
+
+
+class AttendanceReportService:
+    """Per-participant attendance of one group over a period, cached in ``report_cache``."""
+
+    def __init__(self, organization):
+        self.organization = organization
+
+    def attendance(self, group, date_from, date_to):
+        """
+        Attendance report of a group for sessions scheduled between two dates (inclusive).
+
+        The key includes the group's presence version, so a new or changed mark
+        in the group recomputes the report on the next request while every
+        other group's reports stay cached.
+
+        Returns:
+            Dict with ``group``, ``period``, ``summary`` and ``by_participant``
+            (shared with other callers: do not mutate it)
+        """
+        versions, _ = get_versions(
+            self.organization.id, [presence_scope(group.id), *ATTENDANCE_SCOPES],
+        )
+        key = ('attendance', self.organization.id, group.id, date_from, date_to, *versions)
+        return report_cache.get_or_compute(
+            key,
+            lambda: self.compute(group, date_from, date_to),
+            report='attendance',
+        )
+
+    def compute(self, group, date_from, date_to):
+        """Build the attendance report from one aggregate query over the group's marks."""
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime.combine(date_from, time.min), tz)
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min), tz)
+        sessions = Session.scoped.for_organization(self.organization).filter(
+            group_id=group.id,
+            scheduled_start_at__gte=start,
+            scheduled_start_at__lt=end,
+        )
+        records = (
+            PresenceRecord.scoped.for_organization(self.organization).filter(session__in=sessions)
+        )
+
+        codes = list(dict.fromkeys(
+            PresenceState.scoped.for_organization(self.organization)
+            .order_by('sort_order', 'code').values_list('code', flat=True)
+        ))
+        counts = defaultdict(dict)
+        for participant_id, code, count in (
+            records.values('participant_id', 'presence_state__code')
+            .annotate(count=Count('id'))
+            .values_list('participant_id', 'presence_state__code', 'count')
+        ):
+            counts[participant_id][code] = count
+
+        # Current members, plus former ones who were marked in the period
+        participants = (
+            Participant.scoped.for_organization(self.organization)
+            .filter(
+                Q(
+                    id__in=GroupMembership.objects.filter(group_id=group.id)
+                    .values('participant_id'),
+                    is_active=True,
+                )
+                | Q(id__in=records.values('participant_id'))
+            )
+            .order_by('last_name', 'first_name', 'id')
+            .values_list('id', 'first_name', 'last_name')
+        )
+
+        by_participant = []
+        total_marks = total_attended = 0
+        for participant_id, first_name, last_name in participants:
+            marks = counts.get(participant_id, {})
+            marked = sum(marks.values())
+            attended = sum(
+                count for code, count in marks.items() if code not in PresenceState.ABSENT_CODES
+            )
+            total_marks += marked
+            total_attended += attended
+            by_participant.append({
+                'participant_id': participant_id,
+                'participant_name': f"{first_name} {last_name}".strip(),
+                **{code: marks.get(code, 0) for code in codes},
+                'attendance_rate': round(attended / marked, 4) if marked else None,
+            })
+
+        return {
+            'group': {'id': group.id, 'name': group.name},
+            'period': {'from': date_from.isoformat(), 'to': date_to.isoformat()},
+            'summary': {
+                'total_sessions': sessions.count(),
+                'total_participants': len(by_participant),
+                'overall_attendance_rate': (
+                    round(total_attended / total_marks, 4) if total_marks else None
+                ),
+            },
+            'by_participant': by_participant,
+        }
@@ -0,0 +1,443 @@
+"""
+Data retention and removal of deleted organizations.
+
+Two jobs, both deleting in primary-key ordered chunks of ``chunk_size`` rows
+(one DELETE each, without cascades or signals) and pausing between chunks
+and while database replicas lag:
+
+- ``apply()`` deletes rows past an organization's retention windows: presence
+  records, notifications and audit rows. Audit rows are only deleted as whole
+  sealed segments of the audit chain. Before a segment goes, every session
+  and participant with history in it gets an as-of snapshot at the cutoff,
+  and its ``AuditCheckpoint`` stays (with ``pruned_at`` set) so the chain
+  still verifies.
+- ``purge()`` deletes every tenant row of an organization whose deletion was
+  requested ``RETENTION_DELETION_GRACE_DAYS`` ago, then its users, and
+  anonymizes the organization row, which stays as a tombstone.
+
+Progress (job kind, cutoffs, current table, last primary key, rows deleted)
+is checkpointed in ``organization.settings['retention_job']`` after every
+chunk. A run stopped by its time budget or an error resumes from there with
+the same cutoffs.
+"""
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from app.core.caching import bump_version
+from app.core.report_cache import bump_presence_versions
+from app.core.routers import lag_monitor, replica_aliases
+from app.models import (
+    AuditCheckpoint,
+    AuditLog,
+    AuditSnapshot,
+    Group,
+    Notification,
+    Organization,
+    PresenceRecord,
+    Session,
+    User,
+)
+from app.services.audit_service import SCOPE_COLUMNS, AuditReplayService
+from app.services.shard_service import TENANT_MODELS, tenant_rows
+
+RetentionResult = namedtuple('RetentionResult', 'finished deleted')
+
+# Shortest windows the specification allows; organizations may only configure longer ones
+MINIMUM_YEARS = {'presence_records_years': 3, 'audit_logs_years': 1}
+
+
+class RetentionError(Exception):
+    pass
+
+
+def _years_before(moment, years):
+    try:
+        return moment.replace(year=moment.year - years)
+    except ValueError:
+        # 29 February
+        return moment.replace(year=moment.year - years, day=28)
+
+
+def retention_cutoffs(organization, now=None):
+    """
+    Oldest timestamp each table keeps for an organization.
+
+    Windows come from settings, overridden per organization by
+    ``organization.settings['retention']`` (e.g. ``{"presence_records_years": 5}``).
+    """
+    now = now or timezone.now()
+    overrides = (organization.settings or {}).get('retention', {})
+    presence_years = max(
+        int(overrides.get(
+            'presence_records_years', getattr(settings, 'RETENTION_PRESENCE_RECORDS_YEARS', 3),
+        )),
+        MINIMUM_YEARS['presence_records_years'],
+    )
+    audit_years = max(
+        int(overrides.get('audit_logs_years', getattr(settings, 'RETENTION_AUDIT_LOGS_YEARS', 1))),
+        MINIMUM_YEARS['audit_logs_years'],
+    )
+    notification_days = int(
+        overrides.get('notifications_days', getattr(settings, 'RETENTION_NOTIFICATIONS_DAYS', 180))
+    )
+    return {
+        'notifications': now - timedelta(days=notification_days),
+        'presence_records': _years_before(now, presence_years),
+        'audit_logs': _years_before(now, audit_years),
+    }
+
+
+def organizations_due_for_purge(now=None):
+    """Organizations whose deletion grace period is over."""
+    grace = timedelta(days=getattr(settings, 'RETENTION_DELETION_GRACE_DAYS', 30))
+    due_before = (now or timezone.now()) - grace
+    return Organization.objects.filter(deleted_at__lte=due_before).order_by('deleted_at')
+
+
+class RetentionService:
+    """Chunked, resumable retention and purge jobs for one organization."""
+
+    SETTINGS_KEY = 'retention_job'
+    # Longest pause per chunk while replicas catch up; an unreachable replica must not stall the job
+    MAX_LAG_WAIT_SECONDS = 60
+
+    def __init__(self, organization, chunk_size=1000, sleep=0.0, deadline=None, log=None):
+        """
+        Args:
+            organization: Organization to work on
+            chunk_size: Rows per DELETE
+            sleep: Seconds to pause after each chunk
+            deadline: ``time.monotonic()`` value after which a run stops at the next chunk
+            log: Callable receiving progress messages
+        """
+        self.organization = organization
+        self.alias = organization.shard or DEFAULT_DB_ALIAS
+        self.chunk_size = chunk_size
+        self.sleep = sleep
+        self.deadline = deadline
+        self.log = log or (lambda message: None)
+
+    # Retention windows
+
+    def preview(self):
+        """Rows ``apply()`` would delete now, per table."""
+        cutoffs = retention_cutoffs(self.organization)
+        counts = {
+            'notifications': self._expired_notifications(cutoffs['notifications']).count(),
+            'presence_records': self._expired_presence_records(cutoffs['presence_records']).count(),
+            'audit_logs': 0,
+        }
+        for checkpoint in self._unpruned_checkpoints():
+            if not self._segment_expired(checkpoint, cutoffs['audit_logs']):
+                break
+            counts['audit_logs'] += checkpoint.row_count
+        return counts
+
+    def apply(self):
+        """
+        Delete rows past the retention windows.
+
+        Returns:
+            RetentionResult; an unfinished run resumes on the next call
+        """
+        job = self._start('retention', retention_cutoffs(self.organization))
+        result = self._run(job, [
+            ('notifications', lambda job: self._delete_rows(
+                job, Notification, self._expired_notifications(self._cutoff(job, 'notifications')),
+            )),
+            ('presence_records', lambda job: self._delete_rows(
+                job, PresenceRecord,
+                self._expired_presence_records(self._cutoff(job, 'presence_records')),
+                before_chunk=self._bump_presence_versions,
+            )),
+            ('audit_logs', self._prune_audit),
+            ('audit_snapshots', self._delete_superseded_snapshots),
+        ])
+        if result.finished:
+            self._store(**{
+                self.SETTINGS_KEY: None,
+                'retention_last_run': {
+                    'finished_at': timezone.now().isoformat(),
+                    'deleted': result.deleted,
+                },
+            })
+        return result
+
+    def _expired_notifications(self, cutoff):
+        return Notification._base_manager.using(self.alias).filter(
+            organization_id=self.organization.id, created_at__lt=cutoff,
+        )
+
+    def _expired_presence_records(self, cutoff):
+        return PresenceRecord._base_manager.using(self.alias).filter(
+            organization_id=self.organization.id, recorded_at__lt=cutoff,
+        )
+
+    def _bump_presence_versions(self, pks):
+        # Cached attendance reports of these groups include the deleted marks
+        group_ids = Session._base_manager.using(self.alias).filter(
+            presence_records__pk__in=pks,
+        ).values_list('group_id', flat=True).distinct()
+        bump_presence_versions(self.organization.id, list(group_ids))
+
+    def _unpruned_checkpoints(self):
+        return list(
+            AuditCheckpoint._base_manager.using(self.alias)
+            .filter(organization_id=self.organization.id, pruned_at__isnull=True)
+            .order_by('last_audit_id')
+        )
+
+    def _segment_rows(self, checkpoint):
+        return AuditLog._base_manager.using(self.alias).filter(
+            organization_id=self.organization.id,
+            id__gte=checkpoint.first_audit_id,
+            id__lte=checkpoint.last_audit_id,
+        )
+
+    def _segment_expired(self, checkpoint, cutoff):
+        newest = self._segment_rows(checkpoint).aggregate(newest=Max('changed_at'))['newest']
+        return newest is None or newest < cutoff
+
+    def _prune_audit(self, job):
+        """
+        Delete the rows of the oldest sealed segments that are entirely past the window.
+
+        Only a prefix of the chain is pruned, so every remaining row is newer
+        than every deleted one and the snapshots taken at the cutoff cover
+        exactly the deleted history. Rows not yet sealed by
+        ``verify_audit_chain`` are never deleted.
+        """
+        cutoff = self._cutoff(job, 'audit_logs')
+        replay = AuditReplayService(self.organization)
+        for checkpoint in self._unpruned_checkpoints():
+            started = job['last_pk'] >= checkpoint.first_audit_id
+            if not started:
+                if not self._segment_expired(checkpoint, cutoff):
+                    break
+                # As-of queries after the cutoff start from these snapshots instead of the
+                # deleted rows
+                for scope, (column, _) in SCOPE_COLUMNS.items():
+                    scope_ids = (
+                        self._segment_rows(checkpoint).filter(**{f'{column}__isnull': False})
+                        .order_by(column).values_list(column, flat=True).distinct()
+                    )
+                    for scope_id in scope_ids:
+                        if self._out_of_time():
+                            return False
+                        replay.take_snapshot(scope, scope_id, min_rows=1, settled_before=cutoff)
+
+            if not self._delete_rows(job, AuditLog, self._segment_rows(checkpoint)):
+                return False
+            AuditCheckpoint._base_manager.using(self.alias).filter(pk=checkpoint.pk).update(
+                pruned_at=timezone.now(),
+            )
+            self.log(f"audit rows {checkpoint.first_audit_id}-{checkpoint.last_audit_id} pruned")
+        return True
+
+    def _delete_superseded_snapshots(self, job):
+        """Snapshots older than the window with a newer one of the same scope also older than it."""
+        cutoff = self._cutoff(job, 'audit_logs')
+        snapshots = AuditSnapshot._base_manager.using(self.alias).filter(
+            organization_id=self.organization.id,
+        )
+        newer = snapshots.filter(
+            scope=OuterRef('scope'),
+            scope_id=OuterRef('scope_id'),
+            audit_id__gt=OuterRef('audit_id'),
+            taken_at__lt=cutoff,
+        )
+        superseded = snapshots.filter(taken_at__lt=cutoff).filter(Exists(newer))
+        return self._delete_rows(job, AuditSnapshot, superseded)
+
+    # Deleted organizations
+
+    def request_deletion(self):
+        """
+        Mark the organization deleted and deactivate its users.
+
+        ``purge()`` removes the data later.
+        """
+        if self.organization.deleted_at is not None:
+            raise RetentionError(f"Organization {self.organization.id} is already deleted")
+        now = timezone.now()
+        user_ids = list(
+            User.objects.filter(organization_id=self.organization.id, is_active=True)
+            .values_list('id', flat=True)
+        )
+        User.objects.filter(pk__in=user_ids).update(is_active=False)
+        bump_version(self.organization.id, 'users')
+        self._store(deletion={'requested_at': now.isoformat(), 'deactivated_user_ids': user_ids})
+        Organization.objects.using(DEFAULT_DB_ALIAS).filter(pk=self.organization.id).update(
+            deleted_at=now,
+        )
+        self.organization.deleted_at = now
+
+    def cancel_deletion(self):
+        """Undo ``request_deletion()`` while the purge has not started."""
+        org_settings = self._current_settings()
+        if self.organization.deleted_at is None:
+            raise RetentionError(f"Organization {self.organization.id} is not deleted")
+        if (org_settings.get(self.SETTINGS_KEY) or {}).get('kind') == 'purge':
+            raise RetentionError(f"Organization {self.organization.id} is already being purged")
+        user_ids = (org_settings.get('deletion') or {}).get('deactivated_user_ids', [])
+        User.objects.filter(pk__in=user_ids).update(is_active=True)
+        bump_version(self.organization.id, 'users')
+        self._store(deletion=None)
+        Organization.objects.using(DEFAULT_DB_ALIAS).filter(pk=self.organization.id).update(
+            deleted_at=None,
+        )
+        self.organization.deleted_at = None
+
+    def preview_purge(self):
+        """Rows ``purge()`` would delete, per table."""
+        counts = {
+            model._meta.db_table: tenant_rows(model, self.organization.id, self.alias).count()
+            for model in reversed(TENANT_MODELS)
+        }
+        counts['users'] = User.objects.filter(organization_id=self.organization.id).count()
+        return counts
+
+    def purge(self):
+        """
+        Delete all data of a deleted organization and anonymize its row.
+
+        Returns:
+            RetentionResult; an unfinished purge resumes on the next call
+        """
+        if self.organization.deleted_at is None:
+            raise RetentionError(f"Organization {self.organization.id} is not deleted")
+        steps = [
+            (model._meta.db_table, lambda job, model=model: self._delete_rows(
+                job, model, tenant_rows(model, self.organization.id, self.alias),
+                before=self._detach_groups if model is Group else None,
+            ))
+            for model in reversed(TENANT_MODELS)
+        ]
+        steps.append(('users', lambda job: self._delete_rows(
+            job, User, User.objects.filter(organization_id=self.organization.id), cascade=True,
+        )))
+        job = self._start('purge', {})
+        result = self._run(job, steps)
+        if result.finished:
+            self._tombstone(job)
+        return result
+
+    def _detach_groups(self):
+        # Child groups may sort before their parent; drop the self-references first
+        groups = tenant_rows(Group, self.organization.id, self.alias)
+        groups.exclude(parent=None).update(parent=None)
+
+    def _tombstone(self, job):
+        organization_id = self.organization.id
+        deletion = self._current_settings().get('deletion') or {}
+        Organization.objects.using(DEFAULT_DB_ALIAS).filter(pk=organization_id).update(
+            name=f'Deleted organization {organization_id}',
+            slug=f'deleted-{organization_id}',
+            domain=f'deleted-{organization_id}.invalid',
+            settings={'deletion': {
+                'requested_at': deletion.get('requested_at'),
+                'purged_at': timezone.now().isoformat(),
+                'deleted': job['deleted'],
+            }},
+        )
+        self.log(f"organization {organization_id} purged")
+
+    # Chunked execution and checkpoints
+
+    def _start(self, kind, cutoffs):
+        org_settings = self._current_settings()
+        if 'shard_move' in org_settings:
+            raise RetentionError(
+                f"Organization {self.organization.id} is being moved between shards"
+            )
+        job = org_settings.get(self.SETTINGS_KEY)
+        if job and job['kind'] == kind:
+            self.log(f"resuming {kind} at {job['step']} after id {job['last_pk']}")
+            return job
+        return {
+            'kind': kind,
+            'cutoffs': {table: cutoff.isoformat() for table, cutoff in cutoffs.items()},
+            'step': None,
+            'last_pk': 0,
+            'deleted': {},
+            'started_at': timezone.now().isoformat(),
+        }
+
+    def _run(self, job, steps):
+        names = [name for name, _ in steps]
+        start = names.index(job['step']) if job['step'] in names else 0
+        for name, step in steps[start:]:
+            if job['step'] != name:
+                job['step'], job['last_pk'] = name, 0
+            if not step(job):
+                self._store(**{self.SETTINGS_KEY: job})
+                self.log(f"stopped at {name} after id {job['last_pk']}; the next run resumes there")
+                return RetentionResult(False, job['deleted'])
+        return RetentionResult(True, job['deleted'])
+
+    @staticmethod
+    def _cutoff(job, table):
+        return datetime.fromisoformat(job['cutoffs'][table])
+
+    def _delete_rows(self, job, model, queryset, before=None, before_chunk=None, cascade=False):
+        """
+        Delete ``queryset`` in primary-key order from the job's checkpoint.
+
+        Args:
+            before: Called once before the first chunk
+            before_chunk: Called with the primary keys of each chunk before it is deleted
+            cascade: Delete through the ORM (signals, cascades) instead of one raw DELETE
+
+        Returns:
+            True when done, False when the time budget ran out
+        """
+        table = model._meta.db_table
+        if before is not None:
+            before()
+        while not self._out_of_time():
+            pks = list(
+                queryset.filter(pk__gt=job['last_pk']).order_by('pk')
+                .values_list('pk', flat=True)[:self.chunk_size]
+            )
+            if not pks:
+                return True
+            if before_chunk is not None:
+                before_chunk(pks)
+            if cascade:
+                model.objects.filter(pk__in=pks).delete()
+            else:
+                model._base_manager.using(self.alias).filter(pk__in=pks)._raw_delete(self.alias)
+            job['last_pk'] = pks[-1]
+            job['deleted'][table] = job['deleted'].get(table, 0) + len(pks)
+            self._store(**{self.SETTINGS_KEY: job})
+            self.log(f"{table}: {job['deleted'][table]} deleted, up to id {pks[-1]}")
+            self._throttle()
+        return False
+
+    def _out_of_time(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def _throttle(self):
+        if self.sleep:
+            time.sleep(self.sleep)
+        # Deletes replicate too; give lagging replicas time to catch up
+        waited = 0
+        while waited < self.MAX_LAG_WAIT_SECONDS and not self._out_of_time() and not all(
+            lag_monitor.is_healthy(alias) for alias in replica_aliases()
+        ):
+            time.sleep(1)
+            waited += 1
+
+    def _current_settings(self):
+        organization = Organization.objects.using(DEFAULT_DB_ALIAS).get(pk=self.organization.id)
+        return dict(organization.settings or {})
+
+    def _store(self, **values):
+        """Write keys of ``organization.settings`` (None removes a key), keeping other keys."""
+        self.organization.update_settings(**values)
@@ -0,0 +1,256 @@
+"""
+Synthetic tenant datasets.
+
+Seeds an organization with an administrator, groups, rosters, a schedule of
+sessions around the current time and recorded marks (with their audit
+entries), using bulk inserts. Used by the query-budget checks and benchmarks,
+which need data volumes close to production rather than a handful of rows.
+"""
+import random
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from app.models import (
+    AuditLog,
+    Group,
+    GroupMembership,
+    Organization,
+    Participant,
+    PresenceRecord,
+    PresenceState,
+    Session,
+)
+
+# groups, participants per group, sessions per group, marked sessions per group
+DATASET_SIZES = {
+    'small': (2, 10, 4, 2),
+    'medium': (20, 30, 10, 5),
+    'large': (100, 40, 30, 20),
+    # Largest rosters the spec targets (500-member groups)
+    'xlarge': (20, 500, 40, 30),
+    # Institution scale for analytics: 1M presence records
+    'institution': (50, 500, 50, 40),
+}
+
+SeededDataset = namedtuple('SeededDataset', [
+    'organization',
+    'user',
+    'password',
+    'groups',
+    'sessions',
+    'current_sessions',
+])
+
+
+class DatasetSeeder:
+    """Creates one organization's worth of realistic data."""
+
+    BATCH_SIZE = 1000
+    SESSION_CHUNK = 50  # Sessions whose marks are built and inserted at once
+    CHANGE_DELAY = timedelta(minutes=10)  # Between a mark and its later correction
+    PASSWORD = 'seeded-password'
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def seed(self, size='medium', domain_type='education', changed_fraction=0.1):
+        """
+        Seed a new organization.
+
+        Args:
+            size: Key of DATASET_SIZES or a (groups, participants per group,
+                sessions per group, marked sessions per group) tuple
+            domain_type: Domain type of the new organization
+            changed_fraction: Share of marks that were corrected after being recorded
+
+        Returns:
+            SeededDataset; ``current_sessions`` holds one in-progress session per group
+        """
+        groups, roster_size, sessions_per_group, marked_per_group = (
+            DATASET_SIZES[size] if isinstance(size, str) else size
+        )
+        suffix = uuid.uuid4().hex[:8]
+        organization = Organization.objects.create(
+            name=f'Seeded {suffix}',
+            slug=f'seeded-{suffix}',
+            domain=f'seeded-{suffix}.invalid',
+            domain_type=domain_type,
+        )
+
+        email = f'admin-{suffix}@seeded.invalid'
+        # Login authenticates with the email as username
+        user = get_user_model().objects.create_user(
+            username=email,
+            email=email,
+            password=self.PASSWORD,
+            role='administrator',
+            organization=organization,
+        )
+        states = PresenceState.get_default_states(organization, organization.domain_type)
+
+        group_rows = self._bulk(Group, [
+            Group(organization=organization, name=f'Group {number}', group_type='class')
+            for number in range(groups)
+        ], organization=organization)
+        participants = self._bulk(Participant, [
+            Participant(
+                organization=organization,
+                first_name=f'First{number}',
+                last_name=f'Last{number}',
+                identifier=f'P-{suffix}-{number:07d}',
+            )
+            for number in range(groups * roster_size)
+        ], organization=organization)
+        rosters = {
+            group.id: participants[position * roster_size:(position + 1) * roster_size]
+            for position, group in enumerate(group_rows)
+        }
+        self._bulk(GroupMembership, [
+            GroupMembership(group_id=group_id, participant=participant)
+            for group_id, roster in rosters.items()
+            for participant in roster
+        ])
+
+        # One session per day per group; earlier ones held, the last one in progress now
+        now = timezone.now()
+        sessions = []
+        for group in group_rows:
+            for day in range(sessions_per_group):
+                days_ago = timedelta(days=sessions_per_group - 1 - day)
+                start = now - days_ago - timedelta(minutes=30)
+                end = now - days_ago + timedelta(hours=1)
+                sessions.append(Session(
+                    organization=organization,
+                    group=group,
+                    name=f'{group.name} day {day}',
+                    scheduled_start_at=start,
+                    scheduled_end_at=end,
+                    actual_start_at=start,
+                    actual_end_at=end if days_ago else None,
+                ))
+        sessions = self._bulk(Session, sessions, organization=organization)
+        current_sessions = sessions[sessions_per_group - 1::sessions_per_group]
+
+        # Marks on the oldest sessions of each group, some changed after the fact
+        marked = [
+            session for position, session in enumerate(sessions)
+            if position % sessions_per_group < min(marked_per_group, sessions_per_group - 1)
+        ]
+        state_codes = {state.id: state.code for state in states}
+        for offset in range(0, len(marked), self.SESSION_CHUNK):
+            chunk = marked[offset:offset + self.SESSION_CHUNK]
+            self._seed_marks(
+                organization, user, chunk, rosters, states, state_codes, changed_fraction,
+            )
+
+        # auto_now_add ignores explicit values: date marks back to their sessions, and
+        # out of the change feed's visibility delay (audit entries are dated on creation)
+        PresenceRecord.objects.filter(organization=organization).update(
+            recorded_at=Subquery(
+                Session.objects.filter(pk=OuterRef('session_id')).values('scheduled_start_at')[:1]
+            ),
+        )
+
+        return SeededDataset(
+            organization=organization,
+            user=user,
+            password=self.PASSWORD,
+            groups=group_rows,
+            sessions=sessions,
+            current_sessions=current_sessions,
+        )
+
+    def _seed_marks(
+        self, organization, user, sessions, rosters, states, state_codes, changed_fraction,
+    ):
+        """Presence records of some sessions with their create (and update) audit entries."""
+        initial_states = {}
+        records = []
+        for session in sessions:
+            for participant in rosters[session.group_id]:
+                state = self.random.choice(states)
+                if self.random.random() < changed_fraction:
+                    initial_states[(session.id, participant.id)] = self.random.choice(states)
+                records.append(PresenceRecord(
+                    organization=organization,
+                    session=session,
+                    participant=participant,
+                    presence_state=state,
+                    recorded_by=user,
+                    source_device_id='seed',
+                ))
+        records = self._bulk(
+            PresenceRecord, records,
+            organization=organization, session_id__in=[session.id for session in sessions],
+        )
+
+        started = {session.id: session.scheduled_start_at for session in sessions}
+        audit_logs = []
+        for record in records:
+            code = state_codes[record.presence_state_id]
+            initial = initial_states.get((record.session_id, record.participant_id))
+            audit_logs.append(AuditLog(
+                organization=organization,
+                table_name='presence_records',
+                record_id=record.id,
+                action='create',
+                changed_by=user,
+                session_id=record.session_id,
+                participant_id=record.participant_id,
+                new_values={'presence_state': initial.code if initial else code},
+                changed_at=started[record.session_id],
+                source_device='seed',
+            ))
+            if initial is not None:
+                audit_logs.append(AuditLog(
+                    organization=organization,
+                    table_name='presence_records',
+                    record_id=record.id,
+                    action='update',
+                    changed_by=user,
+                    session_id=record.session_id,
+                    participant_id=record.participant_id,
+                    old_values={'presence_state': initial.code},
+                    new_values={'presence_state': code},
+                    changed_at=started[record.session_id] + self.CHANGE_DELAY,
+                    source_device='seed',
+                ))
+        self._bulk(AuditLog, audit_logs)
+
+    def _bulk(self, model, objects, **lookup):
+        """bulk_create, returning the rows with primary keys even where the backend sets none."""
+        created = model.objects.bulk_create(objects, batch_size=self.BATCH_SIZE)
+        if not lookup or not created or created[0].pk is not None:
+            return created
+        # MySQL does not return ids from bulk inserts: re-read the new rows in insert order
+        return list(model.objects.filter(**lookup).order_by('pk'))
+
+
+def load_dataset(organization):
+    """SeededDataset view of an existing organization (password unknown)."""
+    user = get_user_model().objects.filter(
+        organization=organization, role='administrator', is_active=True,
+    ).order_by('id').first()
+    if user is None:
+        raise ValueError(f"Organization {organization.id} has no active administrator")
+    now = timezone.now()
+    sessions = list(
+        Session.scoped.for_organization(organization).order_by('group_id', 'scheduled_start_at')
+    )
+    return SeededDataset(
+        organization=organization,
+        user=user,
+        password=None,
+        groups=list(Group.scoped.for_organization(organization).order_by('id')),
+        sessions=sessions,
+        current_sessions=[
+            session for session in sessions
+            if session.scheduled_start_at <= now < session.scheduled_end_at
+            and not session.actual_end_at
+        ],
+    )
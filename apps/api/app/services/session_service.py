@@ -0,0 +1,83 @@
+"""
+Session lookup services.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from app.core.caching import get_versions
+from app.models import Session
+
+
+class SessionService:
+    """Business logic for finding sessions by time window."""
+
+    SCHEDULE_CACHE_TIMEOUT = 300  # 5 minutes
+
+    SCHEDULE_FIELDS = (
+        'id',
+        'name',
+        'group_id',
+        'scheduled_start_at',
+        'scheduled_end_at',
+        'actual_start_at',
+        'actual_end_at',
+        'location',
+    )
+
+    def get_day_schedule(self, organization, day):
+        """
+        Get all sessions of an organization that overlap a calendar day.
+
+        The schedule is built with a single indexed range query and cached per
+        organization and day, so repeated "what's on now" lookups from every
+        device in an organization share one bucket.
+        """
+        (version,), _ = get_versions(organization.id, ['sessions'])
+        cache_key = f"session_schedule_{organization.id}_{version}_{day.isoformat()}"
+        schedule = cache.get(cache_key)
+        if schedule is not None:
+            return schedule
+
+        day_start = timezone.make_aware(datetime.combine(day, time.min))
+        day_end = day_start + timedelta(days=1)
+
+        schedule = list(
+            Session.scoped.overlapping(organization, day_start, day_end)
+            .order_by('scheduled_start_at', 'id')
+            .values(*self.SCHEDULE_FIELDS)
+        )
+        cache.set(cache_key, schedule, timeout=self.SCHEDULE_CACHE_TIMEOUT)
+        return schedule
+
+    def get_current_and_upcoming(self, organization, group_ids=None, now=None):
+        """
+        Split today's schedule into sessions in progress and sessions still to come.
+
+        Args:
+            organization: Organization to look up sessions for
+            group_ids: Optional collection of group IDs to restrict the result to
+            now: Reference time (defaults to the current time)
+
+        Returns:
+            Dict with ``current`` and ``upcoming`` lists of session dicts
+        """
+        now = now or timezone.now()
+        schedule = self.get_day_schedule(organization, timezone.localdate(now))
+
+        if group_ids:
+            group_ids = set(group_ids)
+            schedule = [s for s in schedule if s['group_id'] in group_ids]
+
+        current = []
+        upcoming = []
+        for session in schedule:
+            if session['actual_end_at']:
+                continue
+            if session['scheduled_start_at'] > now:
+                upcoming.append(session)
+            elif session['scheduled_end_at'] > now or session['actual_start_at']:
+                current.append(session)
+
+        return {'current': current, 'upcoming': upcoming}
@@ -0,0 +1,296 @@
+"""
+Online move of an organization between database shards.
+
+The move copies the organization's tenant rows to the target shard in
+primary-key ordered chunks while the organization stays writable, then
+repeatedly copies rows changed since the previous pass (catch-up). Once the
+remaining delta is small the organization is frozen for writes, a final
+catch-up and delete reconciliation run, and the shard map is flipped.
+
+Rows keep their primary keys on the target, which is only safe because every
+database allocates ids from its own interleaved sequence (``SHARD_ID_INCREMENT``);
+a row is never written over another organization's row with the same id.
+
+Catch-up finds changed rows by ``updated_at`` or, for append-only tables, by
+the primary-key high-water mark. Audit checkpoints are changed in place
+without ``updated_at`` (``verified_at``, ``pruned_at``) and are recopied on
+every pass; the jobs rewriting audit rows in place skip organizations that
+are being moved (``organizations_being_moved()``).
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from app.core.sharding import shard_aliases, shard_map
+from app.models import (
+    AuditCheckpoint,
+    AuditLog,
+    AuditSnapshot,
+    Group,
+    GroupMembership,
+    Notification,
+    Organization,
+    Participant,
+    ParticipantSearchToken,
+    PresenceRecord,
+    PresenceState,
+    Session,
+    SyncConflict,
+)
+
+# Parents before children so foreign keys resolve on the target
+TENANT_MODELS = [
+    Group,
+    Participant,
+    ParticipantSearchToken,
+    GroupMembership,
+    PresenceState,
+    Session,
+    PresenceRecord,
+    SyncConflict,
+    Notification,
+    AuditLog,
+    AuditSnapshot,
+    AuditCheckpoint,
+]
+
+# Small tables changed in place without updated_at: recopied in full on every catch-up pass
+RECOPIED_MODELS = (AuditCheckpoint,)
+
+
+def tenant_rows(model, organization_id, alias):
+    """All rows of a tenant model belonging to one organization on one database."""
+    queryset = model._base_manager.using(alias)
+    if model is GroupMembership:
+        return queryset.filter(group__organization_id=organization_id)
+    return queryset.filter(organization_id=organization_id)
+
+
+class ShardMoveError(Exception):
+    pass
+
+
+class ShardMoveService:
+    """Moves one organization's tenant data to another shard."""
+
+    def __init__(self, organization, target, chunk_size=1000, sleep=0.0,
+                 max_catchup_passes=10, freeze_threshold=500, log=None):
+        self.organization = organization
+        self.source = organization.shard or DEFAULT_DB_ALIAS
+        self.target = target
+        self.chunk_size = chunk_size
+        self.sleep = sleep
+        self.max_catchup_passes = max_catchup_passes
+        self.freeze_threshold = freeze_threshold
+        self.log = log or (lambda message: None)
+
+    def _queryset(self, model, alias):
+        return tenant_rows(model, self.organization.id, alias)
+
+    @staticmethod
+    def _has_updated_at(model):
+        return any(field.name == 'updated_at' for field in model._meta.concrete_fields)
+
+    @contextmanager
+    def _foreign_key_checks_disabled(self):
+        # Self-referencing rows (Group.parent) may arrive before their parent
+        connection = connections[self.target]
+        if connection.vendor != 'mysql':
+            yield
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('SET FOREIGN_KEY_CHECKS=0')
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SET FOREIGN_KEY_CHECKS=1')
+
+    def _check_id_sequences(self):
+        """Refuse to move between MySQL databases whose id sequences can collide."""
+        sequences = {}
+        for alias in (self.source, self.target):
+            connection = connections[alias]
+            if connection.vendor != 'mysql':
+                # Other backends cannot interleave; _upsert() still refuses to overwrite rows
+                return
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT @@auto_increment_increment, @@auto_increment_offset')
+                sequences[alias] = cursor.fetchone()
+        (source_step, source_offset), (target_step, target_offset) = (
+            sequences[self.source], sequences[self.target]
+        )
+        if source_step != target_step or source_step <= 1 or source_offset == target_offset:
+            raise ShardMoveError(
+                f"Shards '{self.source}' and '{self.target}' do not allocate ids from disjoint "
+                f"sequences (increment {source_step}/{target_step}, offset "
+                f"{source_offset}/{target_offset}); see SHARD_ID_INCREMENT"
+            )
+
+    def _check_no_clash(self, model, rows):
+        """Refuse to overwrite a target row of another organization that has the same id."""
+        pks = [row.pk for row in rows]
+        own = self._queryset(model, self.target).filter(pk__in=pks)
+        clash = (
+            model._base_manager.using(self.target)
+            .filter(pk__in=pks)
+            .exclude(pk__in=own.values('pk'))
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if clash is not None:
+            raise ShardMoveError(
+                f"{model._meta.db_table} id {clash} on '{self.target}' belongs to another "
+                f"organization; nothing was overwritten and the organization stays on "
+                f"'{self.source}'"
+            )
+
+    def _upsert(self, model, rows):
+        """Insert rows on the target keeping their primary keys, overwriting earlier copies."""
+        self._check_no_clash(model, rows)
+        connection = connections[self.target]
+        update_fields = [
+            field.name for field in model._meta.concrete_fields if not field.primary_key
+        ]
+        unique_fields = None
+        if connection.features.supports_update_conflicts_with_target:
+            unique_fields = [model._meta.pk.name]
+        model._base_manager.using(self.target).bulk_create(
+            rows,
+            update_conflicts=True,
+            update_fields=update_fields,
+            unique_fields=unique_fields,
+        )
+
+    def _copy(self, model, queryset):
+        """Copy a queryset in primary-key ordered chunks. Returns (rows copied, max pk)."""
+        copied = 0
+        last_pk = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:self.chunk_size])
+            if not rows:
+                break
+            with transaction.atomic(using=self.target):
+                self._upsert(model, rows)
+            copied += len(rows)
+            last_pk = rows[-1].pk
+            if self.sleep:
+                time.sleep(self.sleep)
+        return copied, last_pk
+
+    def _catch_up(self, since, high_water, full_models=()):
+        """Copy rows changed since ``since`` or inserted after the high-water marks."""
+        changed = 0
+        for model in TENANT_MODELS:
+            queryset = self._queryset(model, self.source)
+            if model in full_models or model in RECOPIED_MODELS:
+                count, last_pk = self._copy(model, queryset)
+            elif self._has_updated_at(model):
+                count, last_pk = self._copy(model, queryset.filter(updated_at__gte=since))
+            else:
+                count, last_pk = self._copy(model, queryset.filter(pk__gt=high_water[model]))
+            high_water[model] = max(high_water[model], last_pk)
+            changed += count
+        return changed
+
+    def _reconcile_deletes(self):
+        """Remove rows from the target that were deleted on the source during the move."""
+        removed = 0
+        for model in reversed(TENANT_MODELS):
+            target_pks = self._queryset(model, self.target).values_list('pk', flat=True)
+            last_pk = 0
+            while True:
+                chunk = list(target_pks.filter(pk__gt=last_pk).order_by('pk')[:self.chunk_size])
+                if not chunk:
+                    break
+                present = set(
+                    self._queryset(model, self.source).filter(pk__in=chunk)
+                    .values_list('pk', flat=True)
+                )
+                missing = [pk for pk in chunk if pk not in present]
+                if missing:
+                    model._base_manager.using(self.target).filter(pk__in=missing)._raw_delete(
+                        self.target
+                    )
+                    removed += len(missing)
+                last_pk = chunk[-1]
+        return removed
+
+    def _set_move_state(self, **state):
+        # Only the move itself writes this key, so merging outside the lock is safe
+        organization = Organization.objects.using(DEFAULT_DB_ALIAS).get(pk=self.organization.id)
+        move = {**(organization.settings or {}).get('shard_move', {}), **state} if state else None
+        organization.update_settings(shard_move=move)
+        shard_map.invalidate(self.organization.id)
+
+    def run(self, purge_source=False):
+        """Run the move end to end."""
+        if self.target not in shard_aliases():
+            raise ShardMoveError(f"Unknown shard '{self.target}'")
+        if self.target == self.source:
+            raise ShardMoveError(f"Organization is already on shard '{self.target}'")
+        self._check_id_sequences()
+
+        self._set_move_state(target=self.target, status='copying', frozen=False)
+        try:
+            with self._foreign_key_checks_disabled():
+                since = timezone.now()
+                high_water = {}
+                for model in TENANT_MODELS:
+                    count, last_pk = self._copy(model, self._queryset(model, self.source))
+                    high_water[model] = last_pk
+                    self.log(f"copied {count} {model._meta.db_table}")
+
+                for attempt in range(1, self.max_catchup_passes + 1):
+                    pass_started = timezone.now()
+                    changed = self._catch_up(since, high_water)
+                    since = pass_started
+                    self.log(f"catch-up pass {attempt}: {changed} rows")
+                    if changed <= self.freeze_threshold:
+                        break
+
+                # Freeze writes and wait until every process has seen the freeze
+                self._set_move_state(status='frozen', frozen=True)
+                freeze_wait = getattr(settings, 'SHARD_MAP_CACHE_SECONDS', 5) + 1
+                self.log(f"frozen, waiting {freeze_wait}s for in-flight writes")
+                time.sleep(freeze_wait)
+
+                # Rows without updated_at that can still change are recopied in full
+                changed = self._catch_up(
+                    since, high_water, full_models=(SyncConflict, Notification),
+                )
+                removed = self._reconcile_deletes()
+                self.log(f"final catch-up: {changed} rows copied, {removed} removed")
+
+            Organization.objects.using(DEFAULT_DB_ALIAS).filter(pk=self.organization.id).update(
+                shard=self.target
+            )
+            self._set_move_state()
+            self.log(f"organization {self.organization.id} now on shard '{self.target}'")
+        except Exception:
+            self._set_move_state()
+            raise
+
+        if purge_source:
+            self.purge(self.source)
+
+    def purge(self, alias):
+        """Delete the organization's tenant rows from a shard it no longer lives on."""
+        for model in reversed(TENANT_MODELS):
+            deleted = 0
+            while True:
+                pks = list(
+                    self._queryset(model, alias).order_by('pk').values_list('pk', flat=True)[
+                        :self.chunk_size
+                    ]
+                )
+                if not pks:
+                    break
+                model._base_manager.using(alias).filter(pk__in=pks)._raw_delete(alias)
+                deleted += len(pks)
+                if self.sleep:
+                    time.sleep(self.sleep)
+            self.log(f"purged {deleted} {model._meta.db_table} from '{alias}'")
@@ -0,0 +1,153 @@
+"""
+Server-to-device synchronization services.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from app.core.sharding import get_shard
+from app.models import AuditLog, PresenceRecord
+
+logger = logging.getLogger(__name__)
+
+
+def oldest_write_transaction_age(alias):
+    """
+    Seconds since the oldest open write transaction on a database started.
+
+    Measured on the server's own clock, so app server clock skew does not
+    matter. Returns 0 when nothing is in flight, and on backends that commit
+    writes one at a time (SQLite). Without the PROCESS privilege needed to read
+    ``information_schema.innodb_trx``, assumes ``CHANGE_FEED_MAX_TRANSACTION_SECONDS``.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'mysql':
+        return 0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT TIMESTAMPDIFF(MICROSECOND, MIN(trx_started), NOW()) '
+                'FROM information_schema.innodb_trx WHERE trx_rows_modified > 0'
+            )
+            (age,) = cursor.fetchone()
+    except DatabaseError:
+        logger.warning(
+            "Cannot read open transactions on %s, holding back the change feed", alias,
+            exc_info=True,
+        )
+        return getattr(settings, 'CHANGE_FEED_MAX_TRANSACTION_SECONDS', 60)
+    return (age or 0) / 1_000_000
+
+
+class ChangeFeedService:
+    """
+    Per-organization feed of presence changes, paged by audit log id.
+
+    ``AuditLog`` ids are monotonic, so a device only has to remember the last id
+    it applied. Each poll is one range scan on the
+    ``(organization, table_name, id)`` index.
+
+    Ids are assigned at insert but become visible at commit, so an open
+    transaction can still commit rows below ids already served. The feed stops
+    at the first row stamped after the oldest open write transaction on the
+    organization's primary started (``changed_at`` is set when a row is built,
+    inside its transaction). ``CHANGE_FEED_VISIBILITY_DELAY_SECONDS`` more covers
+    clock skew between app servers and replica lag, so it must stay at least
+    ``DATABASE_REPLICA_MAX_LAG_SECONDS``. Bulk loads that insert rows with
+    historical ``changed_at`` values (``seed_data``) are not covered.
+    """
+
+    TABLE_NAME = 'presence_records'
+    DEFAULT_LIMIT = 500
+    MAX_LIMIT = 1000
+
+    def __init__(self, organization):
+        self.organization = organization
+
+    def get_changes(self, cursor=0, limit=None):
+        """
+        Get presence changes after a cursor.
+
+        Args:
+            cursor: Last audit log id the device has applied (0 for the beginning)
+            limit: Maximum number of changes to return
+
+        Returns:
+            Dict with ``changes``, ``next_cursor`` and ``has_more``
+        """
+        limit = min(limit or self.DEFAULT_LIMIT, self.MAX_LIMIT)
+
+        # Rows of still open transactions may get lower ids than rows already committed;
+        # holding back everything written since the oldest of them started keeps the
+        # cursor from skipping past them.
+        delay = getattr(settings, 'CHANGE_FEED_VISIBILITY_DELAY_SECONDS', 15)
+        in_flight = oldest_write_transaction_age(get_shard(self.organization.id))
+        visible_before = timezone.now() - timedelta(seconds=delay + in_flight)
+
+        rows = list(
+            AuditLog.scoped.for_organization(self.organization).filter(
+                table_name=self.TABLE_NAME,
+                id__gt=cursor,
+            ).order_by('id').values(
+                'id',
+                'record_id',
+                'action',
+                'session_id',
+                'participant_id',
+                'changed_by_id',
+                'new_values',
+                'changed_at',
+                'source_device',
+            )[:limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        for position, row in enumerate(rows):
+            if row['changed_at'] > visible_before:
+                rows = rows[:position]
+                has_more = False
+                break
+
+        # Older update entries carry neither key columns nor keys in their values;
+        # look up the records they belong to
+        missing = {
+            row['record_id'] for row in rows
+            if row['session_id'] is None and 'session_id' not in (row['new_values'] or {})
+        }
+        keys = {
+            record_id: (session_id, participant_id)
+            for record_id, session_id, participant_id in PresenceRecord.objects.filter(
+                id__in=missing
+            ).values_list('id', 'session_id', 'participant_id')
+        } if missing else {}
+
+        changes = []
+        for row in rows:
+            values = row['new_values'] or {}
+            if row['session_id'] is not None:
+                session_id, participant_id = row['session_id'], row['participant_id']
+            else:
+                session_id, participant_id = keys.get(
+                    row['record_id'],
+                    (values.get('session_id'), values.get('participant_id')),
+                )
+            changes.append({
+                'id': row['id'],
+                'action': row['action'],
+                'record_id': row['record_id'],
+                'session_id': session_id,
+                'participant_id': participant_id,
+                'presence_state': values.get('presence_state'),
+                'changed_by_id': row['changed_by_id'],
+                'changed_at': row['changed_at'],
+                'source_device': row['source_device'],
+            })
+
+        return {
+            'changes': changes,
+            'next_cursor': rows[-1]['id'] if rows else cursor,
+            'has_more': has_more,
+        }
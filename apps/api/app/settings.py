@@ -39,11 +39,14 @@ INSTALLED_APPS = [
     'drf_spectacular',
 
     # Local apps
+    'app.core.apps.AppConfig',  # Models and signal receivers (cache invalidation)
     'app.api',
 ]
 
 MIDDLEWARE = [
+    'app.core.instrumentation.InstrumentationMiddleware',  # Latency, SQL, cache and size metrics
     'django.middleware.security.SecurityMiddleware',
+    'app.core.middleware.ReadYourWritesMiddleware',  # Read replica stickiness after writes
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +55,9 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'app.core.middleware.OrganizationMiddleware',  # Custom organization middleware
+    'app.core.profiling.ProfilingMiddleware',  # On-demand and slow-request profiles
+    'app.core.ratelimit.RateLimitMiddleware',  # Per-user / per-organization token buckets
+    'app.core.admission.AdmissionControlMiddleware',  # Concurrency gate for heavy endpoints
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -92,6 +98,97 @@ DATABASES = {
     }
 }
 
+# Connection management
+# By default connections persist for DB_CONN_MAX_AGE seconds and are health-checked before
+# reuse. Setting MYSQL_POOL_SIZE switches to the pooled backend instead: connections go back
+# to a per-process pool at the end of every request, which is also the safe choice under ASGI.
+
+MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', '0'))
+
+if MYSQL_POOL_SIZE:
+    DATABASES['default'].update({
+        'ENGINE': 'app.core.mysql_pool',
+        'CONN_MAX_AGE': 0,
+    })
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'max_size': MYSQL_POOL_SIZE,
+        'timeout': float(os.getenv('MYSQL_POOL_TIMEOUT_SECONDS', '5')),
+        'health_check_after': float(os.getenv('MYSQL_POOL_HEALTH_CHECK_AFTER_SECONDS', '30')),
+        'max_lifetime': float(os.getenv('MYSQL_POOL_MAX_LIFETIME_SECONDS', '3600')),
+    }
+else:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+    })
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'app.core.instrumentation.InstrumentedRedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'app.core.instrumentation.InstrumentedLocMemCache',
+        }
+    }
+
+# Read replicas
+# Comma-separated replica hosts; each becomes a "replica_N" alias sharing the primary's credentials.
+# Reads of views marked @replica_reads (reports, lists, exports) go to a healthy replica unless the
+# user wrote recently or every replica is lagging; all other reads stay on the primary.
+
+for _index, _host in enumerate(filter(None, os.getenv('MYSQL_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica_{_index}'] = {
+        **DATABASES['default'],
+        'HOST': _host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['app.core.routers.ShardRouter', 'app.core.routers.ReplicaRouter']
+DATABASE_REPLICA_MAX_LAG_SECONDS = int(os.getenv('DATABASE_REPLICA_MAX_LAG_SECONDS', '10'))
+DATABASE_REPLICA_CHECK_INTERVAL_SECONDS = int(
+    os.getenv('DATABASE_REPLICA_CHECK_INTERVAL_SECONDS', '5')
+)
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv('DATABASE_REPLICA_STICKY_SECONDS', '5'))
+
+# Organization shards
+# Comma-separated "alias=host" pairs; organizations are mapped to an alias by Organization.shard
+# and moved between shards with "manage.py move_organization". Rows keep their primary keys when
+# they move, so with shards configured every database allocates ids from its own interleaved
+# sequence (auto_increment_increment/offset): default uses offset 1, the Nth shard N + 1.
+# Only append shards to the list; reordering would reuse another shard's offsets.
+
+SHARD_ID_INCREMENT = int(os.getenv('SHARD_ID_INCREMENT', '16'))  # Up to 15 shards besides default
+_shards = [('default', None)] + [
+    tuple(part.strip() for part in pair.split('=', 1))
+    for pair in os.getenv('MYSQL_SHARD_HOSTS', '').split(',')
+    if pair.strip()
+]
+if len(_shards) > 1:
+    _primary = DATABASES['default']
+    _init_command = _primary['OPTIONS']['init_command']
+    for _offset, (_alias, _host) in enumerate(_shards, 1):
+        DATABASES[_alias] = {
+            **_primary,
+            'HOST': _host or _primary['HOST'],
+            'OPTIONS': {
+                **_primary['OPTIONS'],
+                'init_command': (
+                    f'{_init_command}, auto_increment_increment={SHARD_ID_INCREMENT}, '
+                    f'auto_increment_offset={_offset}'
+                ),
+            },
+        }
+
+SHARD_MAP_CACHE_SECONDS = int(os.getenv('SHARD_MAP_CACHE_SECONDS', '5'))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -144,6 +241,120 @@ SESSION_COOKIE_AGE = int(os.getenv('SESSION_COOKIE_AGE', '86400'))  # 24 hours d
 SESSION_SAVE_EVERY_REQUEST = False
 SESSION_EXPIRE_AT_BROWSER_CLOSE = os.getenv('SESSION_EXPIRE_AT_BROWSER_CLOSE', 'False').lower() == 'true'
 
+# Bounds the "sessions happening now" range scan; longer sessions store their end in long_end_at on
+# save and are looked up through their own index. After lowering it, re-save longer sessions.
+SESSION_LOOKUP_MAX_DURATION_HOURS = int(os.getenv('SESSION_LOOKUP_MAX_DURATION_HOURS', '24'))
+
+# Badge check-in: scans are buffered and written in micro-batches
+CHECKIN_BATCH_SIZE = int(os.getenv('CHECKIN_BATCH_SIZE', '200'))
+CHECKIN_FLUSH_INTERVAL_SECONDS = float(os.getenv('CHECKIN_FLUSH_INTERVAL_SECONDS', '1.0'))
+CHECKIN_INDEX_TTL_SECONDS = int(os.getenv('CHECKIN_INDEX_TTL_SECONDS', '300'))
+CHECKIN_INDEX_MAX_SESSIONS = int(os.getenv('CHECKIN_INDEX_MAX_SESSIONS', '64'))
+# Largest identifiers list accepted per check-in request
+CHECKIN_MAX_IDENTIFIERS = int(os.getenv('CHECKIN_MAX_IDENTIFIERS', '500'))
+# Failed flushes of a session's scans before they are moved to the dead-letter store
+CHECKIN_FLUSH_MAX_ATTEMPTS = int(os.getenv('CHECKIN_FLUSH_MAX_ATTEMPTS', '5'))
+
+# Offline session packs: delta windows overlap by this much to tolerate commit-order skew
+SESSION_PACK_DELTA_OVERLAP_SECONDS = int(os.getenv('SESSION_PACK_DELTA_OVERLAP_SECONDS', '5'))
+
+# Presence change feed: entries written since the oldest open write transaction started are held
+# back, plus this delay for app server clock skew and replica lag
+# (keep it >= DATABASE_REPLICA_MAX_LAG_SECONDS)
+CHANGE_FEED_VISIBILITY_DELAY_SECONDS = int(os.getenv('CHANGE_FEED_VISIBILITY_DELAY_SECONDS', '15'))
+# Assumed age of the oldest open transaction when the database does not expose it
+CHANGE_FEED_MAX_TRANSACTION_SECONDS = int(os.getenv('CHANGE_FEED_MAX_TRANSACTION_SECONDS', '60'))
+
+# Attendance analytics results are cached this long; roster and state changes invalidate them sooner
+ANALYTICS_CACHE_SECONDS = int(os.getenv('ANALYTICS_CACHE_SECONDS', '300'))
+
+# In-process cache of attendance reports (per worker); entries are dropped as soon as a mark in
+# their group changes
+REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# How long identical concurrent report requests wait for the first one before computing themselves
+REPORT_CACHE_WAIT_SECONDS = float(os.getenv('REPORT_CACHE_WAIT_SECONDS', '30'))
+
+# Audit rows replayed at most before the next as-of snapshot of a session or participant
+# (snapshot_audit)
+AUDIT_SNAPSHOT_INTERVAL = int(os.getenv('AUDIT_SNAPSHOT_INTERVAL', '500'))
+
+# Audit rows are hashed with this key (default SECRET_KEY); changing it invalidates every stored
+# row hash
+AUDIT_HASH_KEY = os.getenv('AUDIT_HASH_KEY', '')
+# Rows per sealed segment of an organization's audit chain (verify_audit_chain)
+AUDIT_CHECKPOINT_ROWS = int(os.getenv('AUDIT_CHECKPOINT_ROWS', '10000'))
+# Seconds past the oldest open write transaction before new audit rows are sealed
+# (app server clock skew)
+AUDIT_SETTLE_SECONDS = int(os.getenv('AUDIT_SETTLE_SECONDS', '60'))
+
+# Data retention (retention command); organizations may configure longer windows in
+# settings['retention']
+RETENTION_PRESENCE_RECORDS_YEARS = int(os.getenv('RETENTION_PRESENCE_RECORDS_YEARS', '3'))
+RETENTION_AUDIT_LOGS_YEARS = int(os.getenv('RETENTION_AUDIT_LOGS_YEARS', '1'))
+RETENTION_NOTIFICATIONS_DAYS = int(os.getenv('RETENTION_NOTIFICATIONS_DAYS', '180'))
+# Days between an organization's deletion request and the purge of its data
+# (the spec allows at most 90)
+RETENTION_DELETION_GRACE_DAYS = int(os.getenv('RETENTION_DELETION_GRACE_DAYS', '30'))
+
+# Reverse proxies in front of the API that append to X-Forwarded-For (nginx in docker-compose: 1).
+# Anonymous clients are rate limited by the address found that many entries from the right;
+# 0 uses REMOTE_ADDR.
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+
+# Rate limiting: {endpoint class: {scope: (requests, period in seconds)}}
+# Heavy endpoints get their own budgets so a device re-syncing in a loop cannot starve the rest
+# of the API.
+RATE_LIMITS = {
+    'default': {'user': (100, 60), 'organization': (1000, 60)},
+    'sync': {'user': (30, 60), 'organization': (300, 60)},
+    'export': {'user': (5, 60), 'organization': (30, 60)},
+}
+
+# Heavy endpoint classes, shared by rate limiting and admission control
+ENDPOINT_CLASSES = [
+    (r'^/api/presence/(sync|changes)/', 'sync'),
+    (r'^/api/sessions/\d+/pack/', 'sync'),
+    (r'/export/', 'export'),
+]
+
+# Admission control for heavy endpoint classes, per worker process:
+# concurrency (all organizations), per_organization, max_queue (waiting requests),
+# queue_timeout (seconds)
+ADMISSION_LIMITS = {
+    'sync': {
+        'concurrency': int(os.getenv('ADMISSION_SYNC_CONCURRENCY', '4')),
+        'per_organization': int(os.getenv('ADMISSION_SYNC_PER_ORGANIZATION', '2')),
+        'max_queue': int(os.getenv('ADMISSION_SYNC_MAX_QUEUE', '32')),
+        'queue_timeout': float(os.getenv('ADMISSION_SYNC_QUEUE_TIMEOUT_SECONDS', '5')),
+    },
+    'export': {
+        'concurrency': int(os.getenv('ADMISSION_EXPORT_CONCURRENCY', '1')),
+        'per_organization': 1,
+        'max_queue': 4,
+        'queue_timeout': float(os.getenv('ADMISSION_EXPORT_QUEUE_TIMEOUT_SECONDS', '10')),
+    },
+}
+
+# Metrics: /metrics serves this worker's metrics in the Prometheus text format.
+# Lower the sample rate to measure latency/SQL/size on a fraction of requests only.
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '1.0'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# Profiling: administrators can send "X-Profile: 1"; requests running longer than
+# PROFILING_SLOW_REQUEST_SECONDS are captured automatically (0 disables). Caps keep the overhead
+# bounded.
+PROFILING_SLOW_REQUEST_SECONDS = float(os.getenv('PROFILING_SLOW_REQUEST_SECONDS', '0'))
+PROFILING_SLOW_CAPTURE_COOLDOWN_SECONDS = int(
+    os.getenv('PROFILING_SLOW_CAPTURE_COOLDOWN_SECONDS', '60')
+)
+PROFILING_SAMPLE_INTERVAL_SECONDS = 0.005
+PROFILING_MAX_SAMPLES = 2000
+PROFILING_MAX_DURATION_SECONDS = 30
+PROFILING_MAX_CONCURRENT = 1
+PROFILING_MAX_SQL = 500
+PROFILING_MAX_ARTIFACTS = 100
+
 # Django REST Framework settings
 
 REST_FRAMEWORK = {
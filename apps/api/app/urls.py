@@ -4,7 +4,10 @@ URL configuration for Omnipresence project.
 from django.contrib import admin
 from django.urls import path, include
 
+from app.api.views.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('app.api.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -2,11 +2,20 @@
 Pytest configuration and fixtures for Omnipresence tests.
 """
 import pytest
+from django.core.cache import cache
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from app.models import Organization
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Version counters and cached results must not leak between tests."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.fixture
 def db_setup(db):
     """Set up test database with organization and user."""
@@ -15,10 +24,12 @@ def db_setup(db):
     org = Organization.objects.create(
         name='Test Organization',
         slug='test-org',
+        domain='test-org.test',
         domain_type='education',
     )
 
     user = User.objects.create_user(
+        username='admin',
         email='admin@test.com',
         password='testpass123',
         role='administrator',
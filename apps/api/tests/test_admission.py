@@ -0,0 +1,68 @@
+"""
+Tests for admission control of heavy endpoints, in the async handler mode.
+"""
+import asyncio
+import threading
+
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from app.core.admission import AdmissionControlMiddleware, AdmissionGate
+
+SINGLE_SLOT = {
+    'sync': {'concurrency': 1, 'per_organization': 1, 'max_queue': 1, 'queue_timeout': 2.0},
+}
+
+
+def test_async_waiter_is_woken_by_a_release_from_another_thread():
+    gate = AdmissionGate('sync', concurrency=1, max_queue=1, queue_timeout=2.0)
+
+    async def scenario():
+        assert await gate.aacquire(1) == 'admitted'
+        waiter = asyncio.ensure_future(gate.aacquire(2))
+        await asyncio.sleep(0.05)
+        assert await gate.aacquire(3) == 'queue_full'
+
+        # Streaming responses release their slot from the thread that closes the body
+        threading.Thread(target=gate.release, args=(1,)).start()
+        return await asyncio.wait_for(waiter, 1.0)
+
+    assert asyncio.run(scenario()) == 'queued'
+
+
+def test_async_waiter_times_out():
+    gate = AdmissionGate('sync', concurrency=1, max_queue=1, queue_timeout=0.1)
+
+    async def scenario():
+        await gate.aacquire(1)
+        return await gate.aacquire(2)
+
+    assert asyncio.run(scenario()) == 'timeout'
+    assert gate._waiting == 0
+
+
+@override_settings(ADMISSION_LIMITS=SINGLE_SLOT)
+def test_middleware_queues_concurrent_async_requests():
+    running = []
+
+    async def view(request):
+        running.append(request.path)
+        await asyncio.sleep(0.05)
+        assert len(running) == 1  # The second request waits for the slot
+        running.remove(request.path)
+        return HttpResponse('ok')
+
+    middleware = AdmissionControlMiddleware(view)
+    assert middleware.async_mode
+    assert asyncio.iscoroutinefunction(middleware)
+
+    factory = RequestFactory()
+
+    async def scenario():
+        return await asyncio.gather(*(
+            middleware(factory.get(f'/api/presence/changes/?client={n}')) for n in range(3)
+        ))
+
+    # One runs, one waits for the slot, the third finds the queue full
+    statuses = sorted(response.status_code for response in asyncio.run(scenario()))
+    assert statuses == [200, 200, 503]
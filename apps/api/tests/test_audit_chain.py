@@ -0,0 +1,121 @@
+"""
+Tests for sealing and verifying the tamper-evident audit chain.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from app.models import AuditCheckpoint, AuditLog, Notification, Organization
+from app.services.audit_chain_service import AuditChainService
+
+
+def _audit_rows(org, count, age=timedelta(hours=2)):
+    changed_at = timezone.now() - age  # Settled, so sealable
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            organization=org,
+            table_name='presence_records',
+            record_id=n,
+            action='create',
+            new_values={'presence_state': 'present'},
+            changed_at=changed_at,
+        )
+        for n in range(1, count + 1)
+    ])
+    return list(AuditLog.objects.filter(organization=org).order_by('id'))
+
+
+def _verify(org, **options):
+    return AuditChainService([org], workers=1, segment_rows=2).run(**options)
+
+
+def test_rows_are_sealed_into_linked_segments(db_setup):
+    org = db_setup['org']
+    _audit_rows(org, 5)
+
+    result = _verify(org)
+
+    assert (result.sealed, result.failures) == (3, [])
+    checkpoints = list(AuditCheckpoint.objects.filter(organization=org).order_by('first_audit_id'))
+    assert [checkpoint.row_count for checkpoint in checkpoints] == [2, 2, 1]
+    assert [checkpoint.prev_hash for checkpoint in checkpoints[1:]] == [
+        checkpoint.chain_hash for checkpoint in checkpoints[:-1]
+    ]
+    assert _verify(org, full=True).failures == []
+
+
+def test_edited_row_is_detected_and_reported(db_setup):
+    org, admin = db_setup['org'], db_setup['user']
+    rows = _audit_rows(org, 4)
+    _verify(org)
+
+    # A direct UPDATE, bypassing the model, as an attacker with database access would
+    AuditLog.objects.filter(pk=rows[2].pk).update(new_values={'presence_state': 'absent'})
+    result = _verify(org, full=True)
+
+    failed = [(failure.first_id, failure.last_id) for failure in result.failures]
+    assert failed == [(rows[2].id, rows[3].id)]
+    assert 'do not match their hash' in result.failures[0].reason
+    notification = Notification.objects.get(notification_type='system')
+    assert notification.user_id == admin.id
+
+
+def test_deleted_row_and_broken_link_are_detected(db_setup):
+    org = db_setup['org']
+    rows = _audit_rows(org, 4)
+    _verify(org)
+
+    AuditLog.objects.filter(pk=rows[0].pk).delete()
+    AuditCheckpoint.objects.filter(first_audit_id=rows[2].id).update(prev_hash='0' * 64)
+    reasons = [failure.reason for failure in _verify(org, full=True).failures]
+
+    assert 'checkpoint does not link to the previous one' in reasons
+    assert any(reason.startswith('segment changed') for reason in reasons)
+
+
+def test_organizations_being_moved_are_not_sealed(db_setup):
+    org = db_setup['org']
+    _audit_rows(org, 2)
+    Organization.objects.filter(pk=org.pk).update(settings={'shard_move': {'target': 'shard_1'}})
+
+    # Sealing fills row hashes in place, which the move's catch-up would miss
+    assert _verify(org).sealed == 0
+    assert not AuditCheckpoint.objects.filter(organization=org).exists()
+
+
+def test_recent_rows_are_sealed_once_no_transaction_is_open(db_setup):
+    org = db_setup['org']
+    rows = _audit_rows(org, 2, age=timedelta(minutes=5))
+
+    assert _verify(org).sealed == 1
+    assert AuditCheckpoint.objects.get(organization=org).last_audit_id == rows[-1].id
+
+
+def test_only_rows_written_before_hashing_get_their_hash_filled(db_setup):
+    org = db_setup['org']
+    legacy, hashed = _audit_rows(org, 2), _audit_rows(org, 2)[2:]
+    AuditLog.objects.filter(pk__in=[legacy[0].pk, legacy[1].pk, hashed[1].pk]).update(row_hash='')
+
+    result = _verify(org)
+
+    # A blank hash after the first hashed row would accept whatever the row now says
+    failed = [(failure.first_id, failure.last_id) for failure in result.failures]
+    assert failed == [(hashed[0].id, hashed[1].id)]
+    assert result.sealed == 0
+    assert AuditLog.objects.filter(pk__in=[legacy[0].pk, legacy[1].pk], row_hash='').count() == 0
+
+
+def test_blank_hash_after_the_first_seal_is_reported(db_setup):
+    org = db_setup['org']
+    _audit_rows(org, 2)
+    _verify(org)
+    new = _audit_rows(org, 2)[2:]
+
+    AuditLog.objects.filter(pk=new[0].pk).update(
+        row_hash='', new_values={'presence_state': 'absent'},
+    )
+    result = _verify(org)
+
+    assert [failure.first_id for failure in result.failures] == [new[0].id]
+    assert AuditLog.objects.get(pk=new[0].pk).row_hash == ''
+    assert AuditCheckpoint.objects.filter(organization=org).count() == 1
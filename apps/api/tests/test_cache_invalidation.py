@@ -0,0 +1,115 @@
+"""
+Tests for the cache version bumps on writes that send no per-row signals.
+"""
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from app.core.caching import get_versions
+from app.core.report_cache import presence_scope
+from app.models import Group, GroupMembership, Participant, PresenceRecord, PresenceState, Session
+
+
+@pytest.fixture
+def roster(db_setup):
+    """A group with a session and three marked members."""
+    org, user = db_setup['org'], db_setup['user']
+    group = Group.objects.create(organization=org, name='Class A')
+    now = timezone.now()
+    session = Session.objects.create(
+        organization=org, group=group, name='Maths',
+        scheduled_start_at=now, scheduled_end_at=now + timedelta(hours=1),
+    )
+    present = PresenceState.get_default_states(org, org.domain_type)[0]
+    for number in range(3):
+        participant = Participant.objects.create(
+            organization=org, first_name=f'P{number}', last_name='Test', identifier=f'P-{number}',
+        )
+        GroupMembership.objects.create(group=group, participant=participant)
+        PresenceRecord.objects.create(
+            organization=org, session=session, participant=participant,
+            presence_state=present, recorded_by=user,
+        )
+    return {'org': org, 'group': group, 'session': session}
+
+
+def _versions(org, *scopes):
+    versions, _ = get_versions(org.id, scopes)
+    return versions
+
+
+def _queries_reading(queries, table):
+    return [
+        query['sql'] for query in queries
+        if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']
+    ]
+
+
+def test_cascades_delete_children_without_loading_them(roster):
+    with CaptureQueriesContext(connection) as queries:
+        roster['session'].delete()
+        Participant.objects.filter(organization=roster['org']).delete()
+
+    assert not _queries_reading(queries.captured_queries, 'presence_records')
+    assert not _queries_reading(queries.captured_queries, 'group_memberships')
+    assert not PresenceRecord.objects.exists() and not GroupMembership.objects.exists()
+
+
+def test_session_delete_bumps_its_group_presence(roster):
+    org, scope = roster['org'], presence_scope(roster['group'].id)
+    before = _versions(org, scope)
+
+    roster['session'].delete()
+
+    assert _versions(org, scope) != before
+
+
+def test_record_deletes_bump_presence(roster):
+    org, scope = roster['org'], presence_scope(roster['group'].id)
+
+    before = _versions(org, scope)
+    PresenceRecord.objects.first().delete()
+    after_one = _versions(org, scope)
+    PresenceRecord.objects.filter(session=roster['session']).delete()
+
+    assert before != after_one != _versions(org, scope)
+
+
+def test_membership_bulk_writes_and_deletes_bump_rosters(roster):
+    org = roster['org']
+    other = Group.objects.create(organization=org, name='Class B')
+    participants = list(Participant.objects.all())
+
+    before = _versions(org, 'groups', 'participants')
+    GroupMembership.objects.bulk_create([
+        GroupMembership(group=other, participant=p) for p in participants
+    ])
+    after_create = _versions(org, 'groups', 'participants')
+    GroupMembership.objects.filter(group=other).delete()
+
+    assert before != after_create != _versions(org, 'groups', 'participants')
+
+
+def test_participant_bulk_writes_bump_rosters(roster):
+    org = roster['org']
+
+    before = _versions(org, 'participants')
+    Participant.objects.bulk_create([
+        Participant(organization=org, first_name='New', last_name='Member', identifier='P-new'),
+    ])
+
+    assert _versions(org, 'participants') != before
+
+
+def test_mark_saved_with_its_session_needs_no_session_lookup(roster):
+    record = PresenceRecord.objects.select_related('session').first()
+    states = PresenceState.get_default_states(roster['org'], roster['org'].domain_type)
+    record.presence_state = states[1]
+
+    with CaptureQueriesContext(connection) as queries:
+        record.save()
+
+    assert not _queries_reading(queries.captured_queries, 'sessions')
@@ -0,0 +1,58 @@
+"""
+Tests for the presence change feed cursor.
+"""
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from app.models import AuditLog
+from app.services import sync_service
+from app.services.sync_service import ChangeFeedService
+
+
+@pytest.fixture
+def changes(db_setup):
+    """Five presence changes, a minute apart, the last one just now."""
+    org = db_setup['org']
+    now = timezone.now()
+    return [
+        AuditLog.objects.create(
+            organization=org,
+            table_name='presence_records',
+            record_id=number,
+            action='create',
+            session_id=1,
+            participant_id=number,
+            new_values={'presence_state': 'present'},
+            changed_at=now - timedelta(minutes=4 - number),
+        )
+        for number in range(5)
+    ]
+
+
+def test_cursor_pages_through_settled_changes(db_setup, changes, settings):
+    settings.CHANGE_FEED_VISIBILITY_DELAY_SECONDS = 15
+    service = ChangeFeedService(db_setup['org'])
+
+    page = service.get_changes(cursor=0, limit=2)
+    assert [change['id'] for change in page['changes']] == [row.id for row in changes[:2]]
+    assert page['has_more']
+
+    # The newest change is within the delay: held back, and the cursor stops before it
+    page = service.get_changes(cursor=page['next_cursor'], limit=10)
+    assert [change['id'] for change in page['changes']] == [row.id for row in changes[2:4]]
+    assert (page['next_cursor'], page['has_more']) == (changes[3].id, False)
+
+    assert service.get_changes(cursor=page['next_cursor'])['changes'] == []
+
+
+def test_open_transactions_hold_back_the_cursor(db_setup, changes, settings, monkeypatch):
+    settings.CHANGE_FEED_VISIBILITY_DELAY_SECONDS = 0
+    # A write transaction started 150s ago may still commit rows with lower ids than these
+    monkeypatch.setattr(sync_service, 'oldest_write_transaction_age', lambda alias: 150)
+
+    page = ChangeFeedService(db_setup['org']).get_changes(cursor=0)
+
+    assert [change['id'] for change in page['changes']] == [row.id for row in changes[:2]]
+    assert page['next_cursor'] == changes[1].id
@@ -0,0 +1,183 @@
+"""
+Tests for badge check-in and the scan log flush.
+"""
+import json
+import signal
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import Client
+from django.utils import timezone
+
+from app.models import (
+    AuditLog, Group, GroupMembership, Organization, Participant, PresenceRecord, Session,
+)
+from app.services import checkin_service
+from app.services.checkin_service import DEAD_LETTER_DIR, CheckinService, ScanLog, exit_on_sigterm
+
+
+@pytest.fixture
+def sessions(db_setup):
+    """Two open sessions of one group with three members."""
+    org = db_setup['org']
+    group = Group.objects.create(organization=org, name='Class A')
+    for number in range(3):
+        participant = Participant.objects.create(
+            organization=org, first_name=f'P{number}', last_name='Test',
+            identifier=f'BADGE-{number}',
+        )
+        GroupMembership.objects.create(group=group, participant=participant)
+    now = timezone.now()
+    return [
+        Session.objects.create(
+            organization=org, group=group, name=name,
+            scheduled_start_at=now, scheduled_end_at=now + timedelta(hours=1),
+        )
+        for name in ('Morning', 'Afternoon')
+    ]
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+
+def _check_in(log, session, identifiers, user):
+    index = CheckinService.get_index(session.id, session.organization_id)
+    try:
+        return CheckinService(log=log).check_in(index, identifiers, user=user)
+    finally:
+        CheckinService.drop_index(session.id)
+
+
+def test_flush_writes_records_and_audit_logs(db_setup, sessions):
+    log = ScanLog(batch_size=100, flush_interval=60)
+    identifiers = ['BADGE-0', 'BADGE-1', 'BADGE-0', 'NOPE']
+    results = _check_in(log, sessions[0], identifiers, db_setup['user'])
+
+    assert [result['status'] for result in results] == [
+        'checked_in', 'checked_in', 'duplicate', 'unknown',
+    ]
+    assert not PresenceRecord.objects.exists()  # Buffered until the batch is due
+
+    assert log.flush() == 2
+    present = PresenceRecord.objects.filter(session=sessions[0], presence_state__code='present')
+    assert present.count() == 2
+    assert AuditLog.objects.filter(session_id=sessions[0].id, action='create').count() == 2
+    assert len(log) == 0
+
+
+def test_failing_session_is_retried_then_dead_lettered(db_setup, sessions, media_root, monkeypatch):
+    failing, healthy = sessions
+    log = ScanLog(batch_size=100, flush_interval=60)
+    log.max_attempts = 2
+    write = log._write_session_batch
+
+    def write_or_fail(scans):
+        if next(iter(scans.values())).session_id == failing.id:
+            raise RuntimeError('deadlock')
+        write(scans)
+
+    monkeypatch.setattr(log, '_write_session_batch', write_or_fail)
+    _check_in(log, failing, ['BADGE-0'], db_setup['user'])
+    _check_in(log, healthy, ['BADGE-1'], db_setup['user'])
+
+    # The healthy session is written, the failing one kept for the next flush; nothing raises
+    assert log.flush() == 1
+    assert list(PresenceRecord.objects.values_list('session_id', flat=True)) == [healthy.id]
+    assert [scan.session_id for scan in log._scans] == [failing.id]
+
+    assert log.flush() == 0
+    assert len(log) == 0
+    _, files = default_storage.listdir(DEAD_LETTER_DIR)
+    assert len(files) == 1
+    with default_storage.open(f'{DEAD_LETTER_DIR}/{files[0]}') as stored:
+        [scan] = json.load(stored)
+    assert (scan['session_id'], scan['recorded_by_id']) == (failing.id, db_setup['user'].id)
+
+
+@pytest.mark.parametrize('identifiers', ['BADGE-0', {'id': 'BADGE-0'}, [['BADGE-0']], [True]])
+def test_checkin_rejects_malformed_identifiers(api_client, sessions, identifiers):
+    response = api_client.post(
+        '/api/presence/checkin/',
+        {'session_id': sessions[0].id, 'identifiers': identifiers},
+        content_type='application/json',
+    )
+    assert response.status_code == 400
+
+
+def test_checkin_caps_identifiers_per_request(api_client, sessions, settings):
+    settings.CHECKIN_MAX_IDENTIFIERS = 2
+    response = api_client.post(
+        '/api/presence/checkin/',
+        {'session_id': sessions[0].id, 'identifiers': ['BADGE-0', 'BADGE-1', 'BADGE-2']},
+        content_type='application/json',
+    )
+    assert response.status_code == 400
+    assert not PresenceRecord.objects.exists()
+
+
+def _client(organization, role):
+    user = get_user_model().objects.create_user(
+        username=f'{role}-user', email=f'{role}@other.test', password='x', role=role,
+        organization=organization,
+    )
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def _post_checkin(client, session):
+    return client.post(
+        '/api/presence/checkin/',
+        {'session_id': session.id, 'identifiers': ['BADGE-0']},
+        content_type='application/json',
+    )
+
+
+def test_other_organizations_session_is_not_indexed(sessions):
+    other = Organization.objects.create(
+        name='Other', slug='other', domain='other.test', domain_type='education',
+    )
+
+    response = _post_checkin(_client(other, 'frontline'), sessions[0])
+
+    assert response.status_code == 404
+    assert sessions[0].id not in CheckinService._indexes
+
+
+@pytest.mark.parametrize('role, with_organization', [('manager', True), ('administrator', False)])
+def test_checkin_requires_a_recording_user_of_an_organization(
+    db_setup, sessions, role, with_organization,
+):
+    client = _client(db_setup['org'] if with_organization else None, role)
+
+    assert _post_checkin(client, sessions[0]).status_code == 403
+    assert sessions[0].id not in CheckinService._indexes
+
+
+def test_buffered_scans_are_flushed_at_exit(db_setup, sessions, monkeypatch):
+    exit_hooks = []
+    monkeypatch.setattr(checkin_service.atexit, 'register', exit_hooks.append)
+    log = ScanLog(batch_size=100, flush_interval=60)
+    log.ensure_flusher()
+    _check_in(log, sessions[0], ['BADGE-0', 'BADGE-1'], db_setup['user'])
+
+    for hook in exit_hooks:
+        hook()
+
+    assert PresenceRecord.objects.filter(session=sessions[0]).count() == 2
+
+
+def test_sigterm_exits_through_exit_hooks():
+    previous = signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        exit_on_sigterm()
+        handler = signal.getsignal(signal.SIGTERM)
+        with pytest.raises(SystemExit):
+            handler(signal.SIGTERM, None)
+    finally:
+        signal.signal(signal.SIGTERM, previous)
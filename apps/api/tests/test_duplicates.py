@@ -0,0 +1,52 @@
+"""
+Tests for duplicate participant detection.
+"""
+from datetime import date
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from app.models import Notification, Participant
+from app.services.duplicate_service import DuplicateDetectionService
+
+
+def _participant(org, first_name, last_name, identifier, date_of_birth=None):
+    return Participant.objects.create(
+        organization=org,
+        first_name=first_name,
+        last_name=last_name,
+        identifier=identifier,
+        date_of_birth=date_of_birth,
+    )
+
+
+def test_run_notifies_administrators_once_per_pair(db_setup):
+    org, admin = db_setup['org'], db_setup['user']
+    first = _participant(org, 'Jonathan', 'Smith', 'S-1', date(2010, 5, 1))
+    second = _participant(org, 'Jonathon', 'Smith', 'S-2', date(2010, 5, 1))
+    _participant(org, 'Maria', 'Garcia', 'S-3', date(2011, 2, 3))
+
+    result = DuplicateDetectionService(org).run()
+
+    assert (result.pairs, result.notified) == (1, 1)
+    notification = Notification.objects.get(notification_type='data_quality')
+    assert notification.user_id == admin.id
+    assert notification.link == DuplicateDetectionService.link(first.id, second.id)
+
+    # Nothing changed since the watermark, and a full rescan does not repeat the pair
+    assert DuplicateDetectionService(org).run().notified == 0
+    assert DuplicateDetectionService(org).run(full=True).notified == 0
+    assert Notification.objects.filter(notification_type='data_quality').count() == 1
+
+
+def test_run_without_pairs_skips_recipients(db_setup):
+    org = db_setup['org']
+    _participant(org, 'Jonathan', 'Smith', 'S-1')
+    _participant(org, 'Maria', 'Garcia', 'S-2')
+
+    with CaptureQueriesContext(connection) as queries:
+        result = DuplicateDetectionService(org).run()
+
+    assert (result.pairs, result.notified) == (0, 0)
+    assert not any('"users"' in query['sql'] for query in queries.captured_queries)
+    assert not Notification.objects.exists()
@@ -0,0 +1,105 @@
+"""
+Tests for the request-scoped routing state set by middleware.
+"""
+import json
+import logging
+import re
+
+from asgiref.sync import async_to_sync
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncClient, override_settings
+
+from app.core.profiling import PROFILE_DIR
+from app.core import routers
+from app.core.routers import (
+    ReplicaRouter, is_pinned_to_primary, replica_reads_allowed, use_primary, use_replicas,
+)
+from app.core.sharding import current_organization_id
+from app.models import Group, Participant, User
+
+
+def test_state_is_reset_after_a_request(api_client):
+    assert api_client.post('/api/auth/logout/').status_code in (200, 204)
+
+    assert current_organization_id() is None
+    assert not is_pinned_to_primary()
+
+
+def test_requests_under_asgi(db_setup):
+    client = AsyncClient()
+    client.force_login(db_setup['user'])
+
+    # Reads and writes, so both middlewares set and reset their state in the ASGI handler
+    assert async_to_sync(client.get)('/api/sessions/now/').status_code == 200
+    assert async_to_sync(client.post)('/api/auth/logout/').status_code in (200, 204)
+
+    assert current_organization_id() is None
+    assert not is_pinned_to_primary()
+
+
+@override_settings(DEBUG=True)
+def test_middleware_chain_stays_async_under_asgi(caplog):
+    caplog.set_level(logging.DEBUG, logger='django.request')
+
+    # Django logs every middleware it has to wrap in a sync/async adapter
+    ASGIHandler()
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert [message for message in messages if 'adapted for' in message] == []
+
+
+def test_queries_are_measured_under_asgi(db_setup):
+    client = AsyncClient()
+    client.force_login(db_setup['user'])
+
+    response = async_to_sync(client.get)('/api/sessions/now/')
+
+    # The view's queries run in a worker thread, on connections wrapped by the middleware
+    assert int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1)) > 0
+    assert 'X-RateLimit-Remaining' in response
+
+
+def test_requested_profile_records_the_views_queries_under_asgi(db_setup, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    client = AsyncClient()
+    client.force_login(db_setup['user'])
+
+    response = async_to_sync(client.get)('/api/sessions/now/', headers={'X-Profile': '1'})
+
+    with default_storage.open(f"{PROFILE_DIR}/{response['X-Profile-Id']}.json") as stored:
+        assert json.load(stored)['sql']['total'] > 0
+
+
+def test_writes_outside_requests_do_not_pin(db_setup):
+    Group.objects.create(organization=db_setup['org'], name='Class A')
+
+    assert not is_pinned_to_primary()
+
+
+def test_only_marked_reads_go_to_replicas(settings, monkeypatch):
+    settings.DATABASE_REPLICAS = ['replica_1']
+    monkeypatch.setattr(routers.lag_monitor, 'is_healthy', lambda alias: True)
+    router = ReplicaRouter()
+
+    assert router.db_for_read(Participant) == 'default'
+    with use_replicas():
+        assert router.db_for_read(Participant) == 'replica_1'
+        with use_primary():
+            assert router.db_for_read(Participant) == 'default'
+
+
+def test_report_views_read_from_replicas_but_authentication_does_not(api_client, monkeypatch):
+    reads = []
+    db_for_read = ReplicaRouter.db_for_read
+
+    def recording(self, model, **hints):
+        reads.append((model, replica_reads_allowed()))
+        return db_for_read(self, model, **hints)
+
+    monkeypatch.setattr(ReplicaRouter, 'db_for_read', recording)
+    assert api_client.get('/api/participants/search/', {'q': 'ada'}).status_code == 200
+
+    assert (User, False) in reads and (User, True) not in reads
+    assert (Participant, True) in reads and (Participant, False) not in reads
+    assert not replica_reads_allowed()
@@ -0,0 +1,59 @@
+"""
+Tests for participant search.
+"""
+import pytest
+
+from app.models import Group, GroupMembership, Participant
+from app.services.participant_search_service import ParticipantSearchService
+
+
+@pytest.fixture
+def org(db_setup):
+    return db_setup['org']
+
+
+def _participant(org, number, first_name, last_name, is_active=True, group=None):
+    participant = Participant.objects.create(
+        organization=org, first_name=first_name, last_name=last_name,
+        identifier=f'P-{number}', is_active=is_active,
+    )
+    if group is not None:
+        GroupMembership.objects.create(group=group, participant=participant)
+    return participant
+
+
+def _names(results):
+    return [f"{row['first_name']} {row['last_name']}" for row in results]
+
+
+def test_filters_apply_before_candidates_are_limited(org):
+    group = Group.objects.create(organization=org, name='Class A')
+    other = Group.objects.create(organization=org, name='Class B')
+    # More earlier-sorted matches than the candidate window, all filtered out
+    for number in range(8):
+        _participant(org, number, 'Ann', 'Smith', is_active=False, group=group)
+    for number in range(8, 16):
+        _participant(org, number, 'Bea', 'Smith', group=other)
+    _participant(org, 16, 'Cem', 'Smith', group=group)
+
+    results = ParticipantSearchService(org).search('smi', limit=1, group_id=group.id)
+
+    assert _names(results) == ['Cem Smith']
+
+
+def test_later_terms_apply_before_candidates_are_limited(org):
+    for number in range(8):
+        _participant(org, number, 'Ann', 'Smith')
+    _participant(org, 8, 'John', 'Smith')
+
+    assert _names(ParticipantSearchService(org).search('smith jo', limit=1)) == ['John Smith']
+
+
+def test_non_latin_names_are_searchable(org):
+    _participant(org, 1, 'Иван', 'Петров')
+    _participant(org, 2, 'Zoë', "O'Brien-Núñez")
+
+    service = ParticipantSearchService(org)
+    assert _names(service.search('пет')) == ['Иван Петров']
+    assert _names(service.search('ИВАН')) == ['Иван Петров']
+    assert _names(service.search('nunez')) == ["Zoë O'Brien-Núñez"]
@@ -0,0 +1,11 @@
+"""
+Query budget regression test: every endpoint within its declared budget on seeded data.
+"""
+import pytest
+from django.core.management import call_command
+
+
+@pytest.mark.django_db
+def test_endpoints_within_query_budgets():
+    # Raises CommandError on an overrun, a missing budget or a query count growing with data
+    call_command('check_query_budgets', '--repeat', '1')
@@ -0,0 +1,9 @@
+"""
+Query plan regression test: hot tenant queries use their composite indexes.
+"""
+from django.core.management import call_command
+
+
+def test_hot_queries_use_their_composite_indexes(db_setup):
+    # Raises CommandError when the planner picks another index, or none
+    call_command('check_query_plans', '--organization', str(db_setup['org'].id))
@@ -0,0 +1,36 @@
+"""
+Tests for rate limiting of anonymous clients.
+"""
+import pytest
+from django.test import RequestFactory
+
+from app.core.ratelimit import client_ip
+
+
+@pytest.mark.parametrize('hops, headers, expected', [
+    (0, {'HTTP_X_FORWARDED_FOR': '203.0.113.7'}, '10.0.0.2'),
+    (1, {'HTTP_X_FORWARDED_FOR': '203.0.113.7'}, '203.0.113.7'),
+    # A client-supplied entry on the left is ignored
+    (1, {'HTTP_X_FORWARDED_FOR': '1.2.3.4, 203.0.113.7'}, '203.0.113.7'),
+    (2, {'HTTP_X_FORWARDED_FOR': '1.2.3.4, 203.0.113.7, 10.0.0.9'}, '203.0.113.7'),
+    (1, {'HTTP_X_REAL_IP': '203.0.113.7'}, '203.0.113.7'),
+    (1, {}, '10.0.0.2'),
+])
+def test_client_ip_behind_proxies(settings, hops, headers, expected):
+    settings.TRUSTED_PROXY_HOPS = hops
+    request = RequestFactory().get('/api/auth/login/', REMOTE_ADDR='10.0.0.2', **headers)
+
+    assert client_ip(request) == expected
+
+
+@pytest.mark.django_db
+def test_anonymous_clients_behind_a_proxy_get_their_own_bucket(client, settings):
+    settings.TRUSTED_PROXY_HOPS = 1
+    settings.RATE_LIMITS = {'default': {'user': (2, 60)}}
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+    def status(address):
+        return client.get('/api/auth/me/', HTTP_X_FORWARDED_FOR=address).status_code
+
+    assert [status('203.0.113.7') for _ in range(3)][-1] == 429
+    assert status('203.0.113.8') != 429
@@ -0,0 +1,79 @@
+"""
+Tests for the in-process report cache.
+"""
+import threading
+
+import pytest
+
+from app.core.report_cache import ReportCache
+
+
+def _concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_concurrent_misses_compute_once():
+    cache = ReportCache(max_bytes=1024 * 1024)
+    computing, finish = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        computing.set()
+        finish.wait(5)
+        return {'present': 3}
+
+    leader = _concurrently(1, lambda: results.append(cache.get_or_compute('key', compute)))
+    assert computing.wait(5)
+    followers = _concurrently(5, lambda: results.append(cache.get_or_compute('key', compute)))
+    finish.set()
+    for thread in leader + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{'present': 3}] * 6
+    assert cache.get_or_compute('key', compute) == {'present': 3}
+    assert len(calls) == 1
+
+
+def test_waiters_get_the_leaders_error():
+    cache = ReportCache(max_bytes=1024 * 1024)
+    computing, finish = threading.Event(), threading.Event()
+    errors = []
+
+    def compute():
+        computing.set()
+        finish.wait(5)
+        raise ValueError('report failed')
+
+    def request():
+        try:
+            cache.get_or_compute('key', compute)
+        except ValueError as exc:
+            errors.append(exc)
+
+    leader = _concurrently(1, request)
+    assert computing.wait(5)
+    followers = _concurrently(3, request)
+    finish.set()
+    for thread in leader + followers:
+        thread.join(5)
+
+    assert len(errors) == 4
+    # Failures are not cached
+    assert cache.get_or_compute('key', lambda: 'ok') == 'ok'
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ReportCache(max_bytes=3000, max_entry_bytes=2000)
+    for key in ('a', 'b'):
+        cache.get_or_compute(key, lambda: 'x' * 1000)
+    cache.get_or_compute('a', pytest.fail)  # Hit: 'a' is now the most recently used
+    cache.get_or_compute('c', lambda: 'x' * 1000)
+
+    assert cache.size <= 3000
+    assert cache.get_or_compute('a', pytest.fail) == 'x' * 1000
+    assert cache.get_or_compute('b', lambda: 'recomputed') == 'recomputed'
@@ -0,0 +1,87 @@
+"""
+Tests for chunked, resumable retention.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from app.models import Notification, Organization
+from app.services.retention_service import RetentionService
+
+
+def _notifications(org, user, count, age):
+    ids = [
+        Notification.objects.create(
+            organization=org, user=user, notification_type='system', title=f'Notice {n}',
+            message='',
+        ).id
+        for n in range(count)
+    ]
+    Notification.objects.filter(id__in=ids).update(created_at=timezone.now() - age)
+
+
+def test_stopped_run_resumes_where_it_left_off(db_setup):
+    org, user = db_setup['org'], db_setup['user']
+    _notifications(org, user, 5, timedelta(days=400))
+    _notifications(org, user, 2, timedelta(days=1))
+
+    # Run out of time right after the first chunk
+    service = RetentionService(org, chunk_size=2)
+    service.log = lambda message: setattr(service, 'deadline', 0)
+    result = service.apply()
+
+    assert not result.finished
+    assert result.deleted == {'notifications': 2}
+    job = Organization.objects.get(pk=org.pk).settings[RetentionService.SETTINGS_KEY]
+    assert job['step'] == 'notifications'
+    assert Notification.objects.count() == 5
+
+    result = RetentionService(Organization.objects.get(pk=org.pk), chunk_size=2).apply()
+
+    assert result.finished
+    assert result.deleted == {'notifications': 5}
+    assert Notification.objects.count() == 2
+    org_settings = Organization.objects.get(pk=org.pk).settings
+    assert RetentionService.SETTINGS_KEY not in org_settings
+    assert org_settings['retention_last_run']['deleted'] == {'notifications': 5}
+
+
+def test_resumed_run_keeps_its_cutoffs(db_setup):
+    org, user = db_setup['org'], db_setup['user']
+    _notifications(org, user, 3, timedelta(days=400))
+
+    service = RetentionService(org, chunk_size=1)
+    service.log = lambda message: setattr(service, 'deadline', 0)
+    service.apply()
+    job = Organization.objects.get(pk=org.pk).settings[RetentionService.SETTINGS_KEY]
+
+    # A shorter window configured mid-run applies from the next run on
+    _notifications(org, user, 1, timedelta(days=100))
+    org.settings = dict(org.settings, retention={'notifications_days': 30})
+    Organization.objects.filter(pk=org.pk).update(settings=org.settings)
+    resumed = RetentionService(Organization.objects.get(pk=org.pk), chunk_size=1)
+    resumed.apply()
+
+    assert resumed.organization.settings.get(RetentionService.SETTINGS_KEY) is None
+    assert Notification.objects.count() == 1
+    assert resumed.organization.settings['retention_last_run']['deleted'] == {'notifications': 3}
+    assert job['cutoffs']['notifications'] < (timezone.now() - timedelta(days=100)).isoformat()
+
+
+def test_checkpoints_keep_keys_written_by_other_jobs(db_setup):
+    org, user = db_setup['org'], db_setup['user']
+    _notifications(org, user, 2, timedelta(days=400))
+    service = RetentionService(org, chunk_size=1)
+
+    def other_job_writes(message):
+        # E.g. duplicate detection storing its watermark through a stale instance of its own
+        Organization.objects.get(pk=org.pk).update_settings(
+            duplicate_detection={'checked_until': message},
+        )
+
+    service.log = other_job_writes
+    service.apply()
+
+    org_settings = Organization.objects.get(pk=org.pk).settings
+    assert 'duplicate_detection' in org_settings and 'retention_last_run' in org_settings
+    assert org.update_settings(duplicate_detection=None).keys() == {'retention_last_run'}
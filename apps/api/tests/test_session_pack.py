@@ -0,0 +1,74 @@
+"""
+Tests for offline session packs.
+"""
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from app.models import Group, GroupMembership, Participant, PresenceRecord, PresenceState, Session
+
+
+@pytest.fixture
+def session(db_setup):
+    """A session with two members, both marked present."""
+    org, user = db_setup['org'], db_setup['user']
+    group = Group.objects.create(organization=org, name='Class A')
+    now = timezone.now()
+    session = Session.objects.create(
+        organization=org, group=group, name='Maths',
+        scheduled_start_at=now, scheduled_end_at=now + timedelta(hours=1),
+    )
+    states = PresenceState.get_default_states(org, org.domain_type)
+    present = next(state for state in states if state.code == 'present')
+    for number in range(2):
+        participant = Participant.objects.create(
+            organization=org, first_name=f'P{number}', last_name='Test', identifier=f'P-{number}',
+        )
+        GroupMembership.objects.create(group=group, participant=participant)
+        PresenceRecord.objects.create(
+            organization=org, session=session, participant=participant,
+            presence_state=present, recorded_by=user,
+        )
+    return session
+
+
+def _pack(client, session, etag=None, since=None):
+    params = {} if since is None else {'since': since}
+    headers = {} if etag is None else {'HTTP_IF_NONE_MATCH': etag}
+    return client.get(f'/api/sessions/{session.id}/pack/', params, **headers)
+
+
+def test_unchanged_pack_is_not_modified(api_client, session):
+    response = _pack(api_client, session)
+    assert response.status_code == 200
+    assert len(response.json()['data']['marks']['rows']) == 2
+
+    assert _pack(api_client, session, etag=response['ETag']).status_code == 304
+
+
+def test_deleted_mark_changes_etag_and_delta(api_client, session):
+    full = _pack(api_client, session)
+    version = full.json()['data']['version']
+    delta = _pack(api_client, session, since=version)
+    record = PresenceRecord.objects.filter(session=session).first()
+
+    record.delete()
+
+    assert _pack(api_client, session, etag=full['ETag']).status_code == 200
+    response = _pack(api_client, session, etag=delta['ETag'], since=version)
+    assert response.status_code == 200
+    assert record.participant_id not in response.json()['data']['marked_ids']
+    assert len(response.json()['data']['marked_ids']) == 1
+
+
+def test_removed_member_changes_etag_and_delta(api_client, session):
+    version = _pack(api_client, session).json()['data']['version']
+    delta = _pack(api_client, session, since=version)
+    membership = GroupMembership.objects.filter(group_id=session.group_id).first()
+
+    membership.delete()
+
+    response = _pack(api_client, session, etag=delta['ETag'], since=version)
+    assert response.status_code == 200
+    assert membership.participant_id not in response.json()['data']['roster_ids']
@@ -0,0 +1,94 @@
+"""
+Tests for the cached day schedule.
+"""
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from app.models import Group, Organization, Session
+from app.services.session_service import SessionService
+
+
+@pytest.fixture
+def group(db):
+    org = Organization.objects.create(name='Org', slug='org', domain='org.test')
+    return Group.objects.create(organization=org, name='Class A')
+
+
+def _session(group, name, start):
+    return Session.objects.create(
+        organization=group.organization,
+        group=group,
+        name=name,
+        scheduled_start_at=start,
+        scheduled_end_at=start + timedelta(hours=1),
+    )
+
+
+def test_session_save_invalidates_day_schedule(group):
+    now = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0)
+    service = SessionService()
+    first = _session(group, 'Maths', now)
+
+    schedule = service.get_day_schedule(group.organization, now.date())
+    assert [row['name'] for row in schedule] == ['Maths']
+
+    _session(group, 'Physics', now + timedelta(hours=2))
+    first.name = 'Algebra'
+    first.save()
+
+    schedule = service.get_day_schedule(group.organization, now.date())
+    assert [row['name'] for row in schedule] == ['Algebra', 'Physics']
+
+
+def test_session_delete_invalidates_day_schedule(group):
+    now = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0)
+    service = SessionService()
+    session = _session(group, 'Maths', now)
+    assert len(service.get_day_schedule(group.organization, now.date())) == 1
+
+    session.delete()
+
+    assert service.get_day_schedule(group.organization, now.date()) == []
+
+
+def test_multi_day_session_is_in_every_days_schedule(group):
+    start = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=2)
+    conference = Session.objects.create(
+        organization=group.organization,
+        group=group,
+        name='Conference',
+        scheduled_start_at=start,
+        scheduled_end_at=start + timedelta(days=4),
+    )
+    _session(group, 'Maths', start + timedelta(days=2))
+    service = SessionService()
+
+    assert conference.long_end_at == conference.scheduled_end_at
+    for offset in range(4):
+        day = (start + timedelta(days=offset)).date()
+        schedule = service.get_day_schedule(group.organization, day)
+        assert 'Conference' in [row['name'] for row in schedule]
+    now = start + timedelta(days=2, minutes=30)
+    overlapping = Session.scoped.overlapping(group.organization, now, now + timedelta(minutes=1))
+    assert sorted(overlapping.values_list('name', flat=True)) == ['Conference', 'Maths']
+
+
+def test_long_end_at_follows_schedule_changes(group):
+    start = timezone.now() - timedelta(days=3)
+    session = Session.objects.create(
+        organization=group.organization, group=group, name='Retreat',
+        scheduled_start_at=start, scheduled_end_at=start + timedelta(days=2),
+    )
+    assert session.long_end_at is not None
+
+    session.scheduled_end_at = start + timedelta(hours=2)
+    session.save(update_fields=['scheduled_end_at'])
+    session.refresh_from_db()
+    assert session.long_end_at is None
+
+    session.scheduled_start_at = start - timedelta(days=1)
+    Session.objects.bulk_update([session], ['scheduled_start_at'])
+    session.refresh_from_db()
+    assert session.long_end_at is not None
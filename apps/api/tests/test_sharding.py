@@ -0,0 +1,127 @@
+"""
+Tests for organization-based sharding.
+"""
+import json
+
+import pytest
+from django.test import Client
+from django.utils import timezone
+
+from app.core.sharding import organization_context, shard_aliases, shard_map
+from app.models import (
+    AuditCheckpoint, AuditLog, Group, GroupMembership, Organization, Participant, PresenceRecord,
+    PresenceState, Session, User,
+)
+from app.services.shard_service import TENANT_MODELS, ShardMoveError, ShardMoveService
+
+pytestmark = [
+    pytest.mark.skipif(len(shard_aliases()) < 2, reason='No shard databases configured'),
+    pytest.mark.django_db(databases='__all__'),
+]
+
+
+@pytest.fixture
+def sharded():
+    """An organization on the first shard with one session and two members."""
+    shard = shard_aliases()[1]
+    org = Organization.objects.create(
+        name='Sharded', slug='sharded', domain='sharded.test', shard=shard,
+    )
+    user = User.objects.create_user(
+        username='teacher', password='x', role='administrator', organization=org,
+    )
+    shard_map.invalidate(org.id)
+
+    with organization_context(org.id):
+        group = Group.objects.create(organization=org, name='Class A')
+        participants = [
+            Participant.objects.create(
+                organization=org, first_name=first_name, last_name='Lovelace',
+                identifier=identifier,
+            )
+            for first_name, identifier in (('Ada', 'P-1'), ('Byron', 'P-2'))
+        ]
+        for participant in participants:
+            GroupMembership.objects.create(group=group, participant=participant)
+        now = timezone.now()
+        session = Session.objects.create(
+            organization=org, group=group, name='Maths',
+            scheduled_start_at=now, scheduled_end_at=now,
+        )
+    return {
+        'shard': shard, 'org': org, 'user': user, 'session': session, 'participants': participants,
+    }
+
+
+def _mark(sharded, participant):
+    org = sharded['org']
+    with organization_context(org.id):
+        states = PresenceState.get_default_states(org, org.domain_type)
+        present = next(state for state in states if state.code == 'present')
+        return PresenceRecord.objects.create(
+            organization=org, session=sharded['session'], participant=participant,
+            presence_state=present, recorded_by=sharded['user'],
+        )
+
+
+def test_mark_saved_for_sharded_organization(sharded):
+    shard = sharded['shard']
+    record = _mark(sharded, sharded['participants'][0])
+
+    assert record._state.db == shard
+    assert PresenceRecord.objects.using(shard).filter(pk=record.pk).exists()
+    assert AuditLog.objects.using(shard).filter(
+        table_name='presence_records', record_id=record.pk,
+    ).exists()
+    assert not PresenceRecord.objects.using('default').filter(pk=record.pk).exists()
+
+
+def test_absentees_streamed_from_the_shard(sharded):
+    _mark(sharded, sharded['participants'][0])
+    client = Client()
+    client.force_login(sharded['user'])
+
+    response = client.get('/api/reports/absentees/', {'session_id': sharded['session'].id})
+
+    # The body is produced after the middleware has reset the organization context
+    body = json.loads(b''.join(response.streaming_content))
+    assert response.status_code == 200
+    assert [row['first_name'] for row in body['data']['absentees']] == ['Byron']
+
+
+def test_move_never_overwrites_rows_with_colliding_ids(sharded):
+    shard = sharded['shard']
+    org = Organization.objects.create(name='Unsharded', slug='unsharded', domain='unsharded.test')
+    moved = Participant.objects.create(
+        organization=org, first_name='Alice', last_name='A', identifier='P-1',
+    )
+    # Both databases allocated this id on their own
+    assert Participant.objects.using(shard).filter(pk=moved.pk).exists()
+
+    with pytest.raises(ShardMoveError, match='belongs to another organization'):
+        ShardMoveService(org, shard).run()
+
+    assert sorted(
+        Participant.objects.using(shard).values_list('organization_id', 'first_name')
+    ) == [(sharded['org'].id, 'Ada'), (sharded['org'].id, 'Byron')]
+    org.refresh_from_db()
+    assert org.shard != shard and 'shard_move' not in (org.settings or {})
+
+
+def test_catch_up_recopies_checkpoints_changed_in_place(db_setup):
+    org, shard = db_setup['org'], shard_aliases()[1]
+    checkpoint = AuditCheckpoint.objects.create(
+        organization=org, first_audit_id=1, last_audit_id=10, row_count=10,
+        prev_hash='', chain_hash='a' * 64,
+    )
+    service = ShardMoveService(org, shard)
+    since = timezone.now()
+    high_water = {}
+    for model in TENANT_MODELS:
+        high_water[model] = service._copy(model, service._queryset(model, 'default'))[1]
+
+    # Verification stamps checkpoints with an UPDATE that leaves no updated_at behind
+    AuditCheckpoint.objects.filter(pk=checkpoint.pk).update(verified_at=timezone.now())
+    service._catch_up(since, high_water)
+
+    assert AuditCheckpoint.objects.using(shard).get(pk=checkpoint.pk).verified_at is not None